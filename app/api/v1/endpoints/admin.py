@@ -1,10 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse
-from pathlib import Path
-from app.services.oss import upload_file_to_oss
+from typing import Optional
+from app.services import blob_store
+from app.services.oss import delete_file, resolve_path
+from app.services.uploads import save_upload
 import pymysql
 from datetime import datetime
-from app.database import get_db
+from app.database import get_db, pool_stats
+from app.async_database import async_pool_stats
+from app.core.executor import executor_stats, run_blocking
+from app.core.slow_query import slow_query_stats
+from app.core.count_cache import count_cache_stats
+from app.core.dependencies import get_current_user
+from app.core.identity_cache import identity_cache_stats
+from app.core.security import token_cache_stats
+from app.core.shared_cache import shared_cache_stats
+from app.services.paper_acl import paper_acl_cache_stats
+from app.core.pagination import (
+    count_total,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_params,
+    resolve_include_total,
+    split_page,
+    total_fields,
+)
 import uuid
 import json
 from app.middleware.operation_logger import record_operation_log
@@ -12,21 +33,14 @@ from app.middleware.operation_logger import record_operation_log
 router = APIRouter()
 
 
-def admin_only(
-    # 注释掉认证依赖，保留参数行
-    # user=Depends(get_current_user)
-):
-    # 注释掉原有角色校验逻辑
-    # if user.get("role") != "admin":
-    #     raise HTTPException(status_code=403, detail="仅管理员可访问")
-    
-    # 模拟管理员用户
-    mock_admin_user = {
-        "id": "admin_001",
+def admin_only(current_user: dict = Depends(get_current_user)):
+    if current_user["user_type"] != "admin":
+        raise HTTPException(status_code=403, detail="仅管理员可访问")
+    return {
+        "id": current_user["sub"],
         "role": "admin",
-        "username": "test_admin"
+        "username": current_user["username"],
     }
-    return mock_admin_user
 
 
 @router.post(
@@ -39,8 +53,7 @@ async def upload_template(
     user=Depends(admin_only),
     db: pymysql.connections.Connection = Depends(get_db)
 ):
-    content = await file.read()
-    key = upload_file_to_oss(file.filename, content)
+    key = (await save_upload(file, empty_detail=None)).path
     template_id = f"tpl_{uuid.uuid4().hex[:8]}"  
     
     # 定义模板元数据
@@ -52,7 +65,13 @@ async def upload_template(
         "uploader_id": user.get("id"),  
         "upload_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
-    
+    await run_blocking("db", _insert_template, db, template_metadata)
+    return {"template_id": template_id, "oss_key": key, "storage_path": key}
+
+
+def _insert_template(db: pymysql.connections.Connection, template_metadata: dict) -> None:
+    """写入模板元数据"""
+    cursor = None
     try:
         cursor = db.cursor()
         insert_sql = """
@@ -70,6 +89,7 @@ async def upload_template(
                 template_metadata["upload_time"]
             )
         )
+        blob_store.add_refs(cursor, [template_metadata["oss_key"]])
         db.commit()
     except pymysql.MySQLError as e:
         db.rollback()
@@ -78,8 +98,8 @@ async def upload_template(
             detail=f"模板元数据存储失败：{str(e)}"
         )
     finally:
-        cursor.close()
-    return {"template_id": template_id, "oss_key": key, "storage_path": key}
+        if cursor:
+            cursor.close()
 
 
 @router.put(
@@ -93,17 +113,28 @@ async def update_template(
     user=Depends(admin_only),
     db: pymysql.connections.Connection = Depends(get_db)
 ):
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="上传文件为空")
-    key = upload_file_to_oss(file.filename, content)
+    key = (await save_upload(file)).path
     upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return await run_blocking(
+        "db", _update_template_record, db, template_id, key, file.filename, file.content_type, user.get("id"), upload_time
+    )
+
 
+def _update_template_record(
+    db: pymysql.connections.Connection,
+    template_id: str,
+    key: str,
+    filename: str,
+    content_type: Optional[str],
+    uploader_id,
+    upload_time: str,
+) -> dict:
+    """更新模板元数据；旧的路径键文件在成功后删除，失败时删除新文件（blob 由引用计数回收）"""
     cursor = None
     old_key = None
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT id, oss_key FROM templates WHERE template_id = %s", (template_id,))
+        cursor.execute("SELECT id, oss_key FROM templates WHERE template_id = %s FOR UPDATE", (template_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="模板不存在")
@@ -125,31 +156,29 @@ async def update_template(
             update_sql,
             (
                 key,
-                file.filename,
-                file.content_type,
-                user.get("id"),
+                filename,
+                content_type,
+                uploader_id,
                 upload_time,
                 template_id,
             ),
         )
+        blob_store.release_refs(cursor, [old_key])
+        blob_store.add_refs(cursor, [key])
         db.commit()
-        if old_key:
-            old_path = Path(old_key)
-            if old_path.is_file():
-                old_path.unlink(missing_ok=True)
+        if old_key and old_key != key:
+            delete_file(old_key)
         return {
             "template_id": template_id,
             "oss_key": key,
             "storage_path": key,
-            "filename": file.filename,
-            "content_type": file.content_type,
+            "filename": filename,
+            "content_type": content_type,
             "upload_time": upload_time,
         }
     except pymysql.MySQLError as e:
         db.rollback()
-        new_path = Path(key)
-        if new_path.is_file():
-            new_path.unlink(missing_ok=True)
+        delete_file(key)
         raise HTTPException(status_code=500, detail=f"模板更新失败：{str(e)}")
     finally:
         if cursor:
@@ -170,7 +199,7 @@ def delete_template(
     file_path = None
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT id, oss_key FROM templates WHERE template_id = %s", (template_id,))
+        cursor.execute("SELECT id, oss_key FROM templates WHERE template_id = %s FOR UPDATE", (template_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="模板不存在")
@@ -180,11 +209,9 @@ def delete_template(
             file_path = row[1] if len(row) > 1 else None
 
         cursor.execute("DELETE FROM templates WHERE template_id = %s", (template_id,))
+        blob_store.release_refs(cursor, [file_path])
         db.commit()
-        if file_path:
-            path = Path(file_path)
-            if path.is_file():
-                path.unlink(missing_ok=True)
+        delete_file(file_path)
         return {"message": "删除成功", "template_id": template_id}
     except pymysql.MySQLError as e:
         db.rollback()
@@ -227,7 +254,7 @@ def download_template(
         if not oss_key:
             raise HTTPException(status_code=500, detail="模板存储路径缺失")
 
-        file_path = Path(oss_key)
+        file_path = resolve_path(oss_key)
         if not file_path.is_file():
             raise HTTPException(status_code=404, detail="模板文件不存在")
 
@@ -307,16 +334,16 @@ def dashboard_stats(
 @router.get(
     "/audit/logs",
     summary="审计日志查询",
-    description="分页查询操作日志记录"
+    description="分页查询操作日志记录；传 cursor（上一页返回的 next_cursor）时按游标分页，深翻页不随偏移量变慢"
 )
 def audit_logs(
     user=Depends(admin_only),  
     page: int = 1,
     page_size: int = 50,
+    page_cursor: Optional[str] = Query(None, alias="cursor", description="上一页返回的 next_cursor"),
+    include_total: Optional[str] = Query(None, description="总数获取方式：exact（精确）/ approx（允许缓存旧值或估算）/ false（不统计），默认偏移分页 exact、游标分页 false"),
     db: pymysql.connections.Connection = Depends(get_db)  
 ):
-    # 待办：查询操作日志表并返回分页结果
-    # 待办：查询操作日志表并返回分页结果
     cursor = None
     try:
         # 校验分页参数合法性
@@ -324,26 +351,35 @@ def audit_logs(
             page = 1
         if page_size < 1 or page_size > 100:  # 限制单页最大条数，避免性能问题
             page_size = 50
+        keyset = decode_cursor(page_cursor) if page_cursor else None
+        include_total = resolve_include_total(include_total, keyset is not None)
         
         cursor = db.cursor()
-        # 计算分页偏移量
-        offset = (page - 1) * page_size
         
-        # 查询分页数据（按操作时间倒序）
-        select_sql = """
+        # 查询分页数据（按操作时间倒序，id 保证同一时间内顺序稳定），多取一行判断是否有下一页
+        if keyset:
+            where_sql = f"WHERE {keyset_condition('operation_time', 'id')}"
+            params = keyset_params(keyset) + [page_size + 1]
+            limit_sql = "LIMIT %s"
+        else:
+            where_sql = ""
+            params = [page_size + 1, (page - 1) * page_size]
+            limit_sql = "LIMIT %s OFFSET %s"
+        select_sql = f"""
         SELECT id, user_id, username, operation_type, operation_path, 
                operation_params, ip_address, operation_time, status
         FROM operation_logs
-        ORDER BY operation_time DESC
-        LIMIT %s OFFSET %s;
+        {where_sql}
+        ORDER BY operation_time DESC, id DESC
+        {limit_sql};
         """
-        cursor.execute(select_sql, (page_size, offset))
-        log_items = cursor.fetchall()
+        cursor.execute(select_sql, params)
+        log_items, has_more = split_page(cursor.fetchall(), page_size)
         
-        # 查询总条数（用于分页计算）
-        count_sql = "SELECT COUNT(*) FROM operation_logs;"
-        cursor.execute(count_sql)
-        total = cursor.fetchone()[0]
+        # 查询总条数（用于分页计算，结果按 include_total 缓存或估算）
+        total, estimated = count_total(
+            cursor, "SELECT COUNT(*) FROM operation_logs", [], ("operation_logs",), include_total
+        )
         
         # 格式化返回数据（适配前端展示）
         items = []
@@ -360,13 +396,18 @@ def audit_logs(
                 "status": log[8]
             })
         
+        next_cursor = None
+        if has_more and log_items and log_items[-1][7]:
+            next_cursor = encode_cursor(log_items[-1][7], log_items[-1][0])
+        
         # 组装分页返回结果
         return {
             "items": items,
-            "page": page,
+            "page": None if keyset else page,
             "page_size": page_size,
-            "total": total,
-            "total_pages": (total + page_size - 1) // page_size  # 向上取整计算总页数
+            **total_fields(total, estimated, page_size),
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
     
     except pymysql.MySQLError as e:
@@ -379,6 +420,41 @@ def audit_logs(
             cursor.close()
 
 
+@router.get(
+    "/stats/db-pool",
+    summary="数据库连接池状态",
+    description="返回同步/异步连接池的借出数、空闲数、等待数、checkout 耗时、慢查询日志队列以及列表总数/身份/论文归属/token/共享缓存命中情况（仅管理员可访问）"
+)
+def database_pool_stats(
+    user=Depends(admin_only),
+):
+    return {
+        "pool": pool_stats(),
+        "async_pool": async_pool_stats(),
+        "slow_query": slow_query_stats(),
+        "count_cache": count_cache_stats(),
+        "identity_cache": identity_cache_stats(),
+        "paper_acl_cache": paper_acl_cache_stats(),
+        "shared_cache": shared_cache_stats(),
+        "token_cache": token_cache_stats(),
+        "update_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+@router.get(
+    "/stats/executors",
+    summary="阻塞任务线程池状态",
+    description="返回各线程池的活跃数、排队深度与平均等待/执行耗时（仅管理员可访问）"
+)
+def executor_pool_stats(
+    user=Depends(admin_only),
+):
+    return {
+        "executors": executor_stats(),
+        "update_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
 @router.get(
     "/stats/students/total",
     summary="计算学生总数",
@@ -569,7 +645,9 @@ async def record_log(
             params = {}
         
         # 记录操作日志
-        record_operation_log(
+        await run_blocking(
+            "db",
+            record_operation_log,
             user_id=user_id,
             username=username,
             operation_type=method,
@@ -587,7 +665,9 @@ async def record_log(
         # 记录失败日志
         try:
             client_ip = request.client.host if request.client else 'Unknown'
-            record_operation_log(
+            await run_blocking(
+                "db",
+                record_operation_log,
                 user_id=str(user.get("id", "")) if user else "",
                 username=user.get("username", "") if user else "",
                 operation_type=request.method,
@@ -4,10 +4,11 @@ from app.schemas.annotation import AnnotationCreate, AnnotationOut
 import pymysql
 import json
 from app.database import get_db
+from app.async_database import DictCursor, get_async_db
+from app.services import annotation_counts, paper_acl
 from loguru import logger
 from datetime import datetime
 from typing import Optional, Dict, Any, List
-import urllib.parse
 import re 
 from pydantic import BaseModel
 
@@ -26,23 +27,6 @@ class AnnotationOut(BaseModel):
     class Config:
         orm_mode = True
 
-def _parse_current_user(current_user: Optional[str]) -> dict:
-    try:
-        if not current_user:
-            return {"sub": 0, "username": "", "roles": []}
-        raw = urllib.parse.unquote(current_user)
-        if not raw.strip():
-            return {"sub": 0, "username": "", "roles": []}
-        if raw.isdigit():
-            return {"sub": int(raw), "username": f"user{raw}", "roles": ["student"]}
-        data = json.loads(raw)
-        if isinstance(data, dict):
-            return data
-    except Exception:
-        pass
-    return {"sub": 0, "username": "", "roles": []}
-
-
 def _parse_coordinates(coord_str: Optional[str]) -> Optional[Dict[str, float]]:
     if not coord_str:
         return None
@@ -64,13 +48,10 @@ def create_annotation(
     content: str = Query(..., description="标注文本内容，不能为空"),
     coordinates: Optional[str] = Query(None, description="坐标信息（必须为(x,y)格式，x和y为数字）"),
     paragraph_id: Optional[str] = Query(None, description="段落ID（可选参数）"),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
     db: pymysql.connections.Connection = Depends(get_db)
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
     
     if not isinstance(teacher_id, int) or teacher_id <= 0:
         raise HTTPException(status_code=400, detail="teacher_id必须是有效正整数")
@@ -80,24 +61,17 @@ def create_annotation(
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT 1 FROM papers 
-            WHERE id = %s AND teacher_id = %s
-            """,
-            (paper_id, teacher_id)
+        # 论文归属走缓存（app/services/paper_acl.py）
+        acl = paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.TEACHER,),
+            forbidden_detail="无权限创建标注：登录用户ID（{user_id}）必须与论文绑定的教师ID（{teacher_id}）一致",
         )
-        paper_exists = cursor.fetchone()
-        if not paper_exists:
+        if acl.teacher_id != teacher_id:
             raise HTTPException(
                 status_code=404,
                 detail=f"论文不存在或论文绑定的教师ID不匹配（传入teacher_id: {teacher_id}）"
             )
-        if login_user_id != teacher_id:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限创建标注：登录用户ID（{login_user_id}）必须与论文绑定的教师ID（{teacher_id}）一致"
-            )
     except pymysql.MySQLError as e:
         logger.error(f"论文信息校验数据库异常: {str(e)}")
         raise HTTPException(
@@ -143,9 +117,10 @@ def create_annotation(
                 now
             )
         )
+        annotation_id = cursor.lastrowid
+        annotation_counts.adjust(cursor, paper_id, 1)
         db.commit()
         
-        annotation_id = cursor.lastrowid
         cursor.execute(
             """
             SELECT id, paper_id, author_id, paragraph_id, coordinates, content, created_at, updated_at
@@ -196,32 +171,22 @@ def update_annotation(
     content: Optional[str] = Query(None, description="标注文本内容（为空则不更新）"),
     coordinates: Optional[str] = Query(None, description="坐标信息（必须为(x,y)格式，x和y为数字，为空则不更新）"),
     paragraph_id: Optional[str] = Query(None, description="段落ID（可选参数，为空则不更新）"),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
     db: pymysql.connections.Connection = Depends(get_db)
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
     if not isinstance(teacher_id, int) or teacher_id <= 0:
         raise HTTPException(status_code=400, detail="teacher_id必须是有效正整数")
-    if login_user_id != teacher_id:
-        raise HTTPException(
-            status_code=403,
-            detail=f"无权限更新标注：登录用户ID（{login_user_id}）必须与论文绑定的教师ID（{teacher_id}）一致"
-        )
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT 1 FROM papers 
-            WHERE id = %s AND teacher_id = %s
-            """,
-            (paper_id, teacher_id)
+        # 论文归属走缓存（app/services/paper_acl.py）
+        acl = paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.TEACHER,),
+            forbidden_detail="无权限更新标注：登录用户ID（{user_id}）必须与论文绑定的教师ID（{teacher_id}）一致",
         )
-        paper_exists = cursor.fetchone()
-        if not paper_exists:
+        if acl.teacher_id != teacher_id:
             raise HTTPException(
                 status_code=404,
                 detail=f"论文不存在或论文绑定的教师ID不匹配（传入teacher_id: {teacher_id}）"
@@ -351,33 +316,29 @@ def update_annotation(
     summary="获取论文标注",
     description="根据论文所属用户ID与论文ID查询该论文的所有批注"
 )
-def list_annotations_by_paper(
+async def list_annotations_by_paper(
     owner_id: int = Query(..., description="论文所属用户ID（papers.owner_id）"),
     paper_id: int = Query(..., description="论文ID"),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
-    db: pymysql.connections.Connection = Depends(get_db)
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_async_db)
 ):
-    _ = _parse_current_user(current_user)
     if not isinstance(owner_id, int) or owner_id <= 0:
         raise HTTPException(status_code=400, detail="owner_id必须是有效正整数")
 
     cursor = None
     try:
-        cursor = db.cursor(pymysql.cursors.DictCursor)
-        cursor.execute(
-            """
-            SELECT 1 FROM papers
-            WHERE id = %s AND owner_id = %s
-            """,
-            (paper_id, owner_id)
+        cursor = await db.cursor(DictCursor)
+        acl = await paper_acl.authorize_paper_async(
+            cursor, paper_id, current_user,
+            forbidden_detail="无权限查看标注：仅论文归属学生、关联老师或管理员可查看",
         )
-        if not cursor.fetchone():
+        if acl.owner_id != owner_id:
             raise HTTPException(
                 status_code=404,
                 detail="论文不存在或论文所属用户ID不匹配"
             )
 
-        cursor.execute(
+        await cursor.execute(
             """
             SELECT id, paper_id, author_id, paragraph_id, coordinates, content, created_at, updated_at
             FROM annotations
@@ -386,7 +347,7 @@ def list_annotations_by_paper(
             """,
             (paper_id,)
         )
-        rows = cursor.fetchall() or []
+        rows = await cursor.fetchall() or []
 
         return [
             AnnotationOut(
@@ -408,7 +369,7 @@ def list_annotations_by_paper(
         raise HTTPException(status_code=500, detail="标注查询失败，请稍后重试")
     finally:
         if cursor:
-            cursor.close()
+            await cursor.close()
 
 
 @router.delete(
@@ -420,32 +381,22 @@ def delete_annotation(
     annotation_id: int,
     paper_id: int = Query(..., description="所属论文ID，必须传入且为有效整数"),
     teacher_id: int = Query(..., description="论文绑定的教师ID，必须传入且为有效正整数"),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
     db: pymysql.connections.Connection = Depends(get_db)
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
     if not isinstance(teacher_id, int) or teacher_id <= 0:
         raise HTTPException(status_code=400, detail="teacher_id必须是有效正整数")
-    if login_user_id != teacher_id:
-        raise HTTPException(
-            status_code=403,
-            detail=f"无权限删除标注：登录用户ID（{login_user_id}）必须与论文绑定的教师ID（{teacher_id}）一致"
-        )
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            """
-            SELECT 1 FROM papers 
-            WHERE id = %s AND teacher_id = %s
-            """,
-            (paper_id, teacher_id)
+        # 论文归属走缓存（app/services/paper_acl.py）
+        acl = paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.TEACHER,),
+            forbidden_detail="无权限删除标注：登录用户ID（{user_id}）必须与论文绑定的教师ID（{teacher_id}）一致",
         )
-        paper_exists = cursor.fetchone()
-        if not paper_exists:
+        if acl.teacher_id != teacher_id:
             raise HTTPException(
                 status_code=404,
                 detail=f"论文不存在或论文绑定的教师ID不匹配（传入teacher_id: {teacher_id}）"
@@ -469,9 +420,12 @@ def delete_annotation(
         WHERE id = %s AND paper_id = %s
         """
         cursor.execute(delete_sql, (annotation_id, paper_id))
+        deleted = cursor.rowcount
+        if deleted:
+            annotation_counts.adjust(cursor, paper_id, -deleted)
         db.commit()
 
-        if cursor.rowcount == 0:
+        if deleted == 0:
             raise HTTPException(status_code=404, detail="标注删除失败：标注不存在")
 
         logger.info(
@@ -2,38 +2,16 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
 import pymysql
 from app.database import get_db
+from app.core.dependencies import get_current_user
+from app.core.executor import run_blocking
 from app.schemas.document import MaterialResponse
-from app.services.oss import upload_attachment_to_storage
-import json
+from app.services import blob_store
+from app.services.uploads import save_upload
 from datetime import datetime
 from typing import Optional
 
 router = APIRouter()
 
-def _parse_current_user(current_user: Optional[str]) -> dict:
-    try:
-        if not current_user:
-            return {"sub": 0, "username": "", "roles": []}
-        import urllib.parse
-        raw = urllib.parse.unquote(current_user)
-        if not raw.strip():
-            return {"sub": 0, "username": "", "roles": []}
-        if raw.isdigit():
-            return {"sub": int(raw), "username": f"user{raw}", "roles": ["student"]}
-        data = json.loads(raw)
-        if isinstance(data, dict):
-            sub_value = data.get("sub", 0)
-            if isinstance(sub_value, str) and sub_value.isdigit():
-                data["sub"] = int(sub_value)
-            elif isinstance(sub_value, int):
-                data["sub"] = sub_value
-            else:
-                data["sub"] = 0
-            return data
-    except Exception:
-        pass
-    return {"sub": 0, "username": "", "roles": []}
-
 
 @router.post(
     "/upload",
@@ -52,31 +30,39 @@ async def upload_material(
     version: int = Query(1, description="版本号，默认1，最小值1", ge=1),
     remark: str = Query(None, description="备注信息"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    # 解析当前用户信息
-    current_user = _parse_current_user(current_user)
-    login_username = current_user.get("username", "")
+    login_username = current_user["username"]
     # 基础参数校验
     if not file.filename:
         raise HTTPException(status_code=400, detail="文件名不能为空")
     if not name:
         raise HTTPException(status_code=400, detail="作者/上传者姓名不能为空")
     # 校验登录用户名与传入的name一致
-    if not login_username:
-        raise HTTPException(status_code=401, detail="未获取到有效登录用户信息，请先登录")
     if login_username != name:
         raise HTTPException(
             status_code=403, 
             detail=f"无权限上传：登录用户名[{login_username}]与传入的username[{name}]不一致"
         )
-    # 读取文件内容
-    try:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="上传的文件内容不能为空")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"读取文件失败：{str(e)}")
+    # 流式写入 blob 存储
+    stored = await save_upload(file, empty_detail="上传的文件内容不能为空")
+    storage_path = stored.path
+    return await run_blocking(
+        "db", _insert_material, db, name, file.filename, storage_path, file_type, version, remark, file.content_type
+    )
+
+
+def _insert_material(
+    db: pymysql.connections.Connection,
+    name: str,
+    filename: str,
+    storage_path: str,
+    file_type: str,
+    version: int,
+    remark: Optional[str],
+    content_type: Optional[str],
+) -> dict:
+    """写入材料记录并返回新增记录"""
     # 数据库操作
     cursor = None
     try:
@@ -90,13 +76,12 @@ async def upload_material(
             )
             VALUES (%s, %s, NOW(), %s, %s, %s, %s, NOW(), NOW())
         """
-        storage_path = upload_attachment_to_storage(file.filename, content)
         # 执行插入
         cursor.execute(
             insert_sql,
             (
                 name,
-                file.filename,
+                filename,
                 storage_path,
                 file_type,
                 version,
@@ -105,6 +90,7 @@ async def upload_material(
         )
         # 获取新增记录ID
         material_id = cursor.lastrowid
+        blob_store.add_refs(cursor, [storage_path])
         # 提交事务
         db.commit()
         # 查询新增记录并返回
@@ -121,7 +107,7 @@ async def upload_material(
             raise HTTPException(status_code=500, detail="文件上传成功，但查询不到新增记录")
         # 将上传文件的 content_type 加入返回记录
         try:
-            new_record["content_type"] = file.content_type
+            new_record["content_type"] = content_type
         except Exception:
             new_record["content_type"] = None
         # 返回结果
@@ -150,33 +136,31 @@ async def update_material(
     version: int = Query(None, description="版本号", ge=1),
     remark: str = Query(None, description="备注"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    # 解析当前用户信息
-    current_user = _parse_current_user(current_user)
-    login_username = current_user.get("username", "")
+    login_username = current_user["username"]
     # 基础文件参数校验
     if not file.filename:
         raise HTTPException(status_code=400, detail="上传的文件必须包含文件名")
     if not name:
         raise HTTPException(status_code=400, detail="作者/上传者姓名不能为空")
-    # 校验登录用户信息
-    if not login_username:
-        raise HTTPException(status_code=401, detail="未获取到有效登录用户信息，请先登录")
     # 校验传入的name与登录用户名一致
     if login_username != name:
         raise HTTPException(
             status_code=403, 
             detail=f"无权限更新：登录用户名[{login_username}]与传入的username[{name}]不一致"
         )
-    # 读取文件内容
-    try:
-        content = await file.read()
-        if not content:
-            raise HTTPException(status_code=400, detail="上传的文件内容不能为空")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"读取上传文件失败：{str(e)}")
-    
+    await run_blocking("db", _check_material_owner, db, material_id, name)
+    stored = await save_upload(file, empty_detail="上传的文件内容不能为空")
+    storage_path = stored.path
+    return await run_blocking(
+        "db", _update_material_record, db, material_id, name, file.filename, storage_path,
+        file_type, version, file.content_type,
+    )
+
+
+def _check_material_owner(db: pymysql.connections.Connection, material_id: int, name: str) -> None:
+    """检查指定ID的材料是否存在，且传入的name与原记录一致"""
     cursor = None
     try:
         cursor = db.cursor(pymysql.cursors.DictCursor)
@@ -192,15 +176,36 @@ async def update_material(
                 status_code=400, 
                 detail=f"传入的作者姓名与原记录不一致，原姓名：{original_name}，传入姓名：{name}"
             )
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"数据库错误：{str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
+
+
+def _update_material_record(
+    db: pymysql.connections.Connection,
+    material_id: int,
+    name: str,
+    filename: str,
+    storage_path: str,
+    file_type: Optional[str],
+    version: Optional[int],
+    content_type: Optional[str],
+) -> MaterialResponse:
+    """更新材料记录并返回更新后的完整记录"""
+    cursor = None
+    try:
+        cursor = db.cursor(pymysql.cursors.DictCursor)
         # 构建动态更新SQL
         update_fields = []
         update_params = []
         # 必更新字段：文件名、上传时间、storage_path
         update_fields.append("filename = %s")
-        update_params.append(file.filename)
+        update_params.append(filename)
         update_fields.append("upload_time = NOW()")
         update_fields.append("storage_path = %s")
-        update_params.append(upload_attachment_to_storage(file.filename, content))
+        update_params.append(storage_path)
         # 可选更新字段
         update_fields.append("name = %s")
         update_params.append(name)
@@ -221,8 +226,14 @@ async def update_material(
         """
         # 添加material_id到参数列表末尾
         update_params.append(material_id)
+        # 加行锁读取原文件，并发更新不会重复释放同一个旧文件的引用
+        cursor.execute("SELECT storage_path FROM file_records WHERE id = %s FOR UPDATE", (material_id,))
+        previous = cursor.fetchone()
         # 执行更新
         cursor.execute(update_sql, tuple(update_params))
+        if previous:
+            blob_store.release_refs(cursor, [previous["storage_path"]])
+        blob_store.add_refs(cursor, [storage_path])
         db.commit()
         # 查询更新后的完整记录并返回
         cursor.execute(
@@ -239,7 +250,7 @@ async def update_material(
             raise HTTPException(status_code=500, detail="更新成功但查询不到记录")
         # 将上传文件的 content_type 加入返回数据
         try:
-            row["content_type"] = file.content_type
+            row["content_type"] = content_type
         except Exception:
             row["content_type"] = None
         return MaterialResponse(**row)
@@ -260,17 +271,12 @@ def delete_material(
     material_id: int,
     name: str = Query(..., description="username"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    # 解析当前用户信息
-    current_user = _parse_current_user(current_user)
-    login_username = current_user.get("username", "")
+    login_username = current_user["username"]
     # 基础参数校验
     if not name:
         raise HTTPException(status_code=400, detail="作者/上传者姓名不能为空")
-    # 登录状态和用户名校验
-    if not login_username:
-        raise HTTPException(status_code=401, detail="未获取到有效登录用户信息，请先登录")
     if login_username != name:
         raise HTTPException(
             status_code=403, 
@@ -281,7 +287,7 @@ def delete_material(
         # 创建游标
         cursor = db.cursor(pymysql.cursors.DictCursor)
         # 检查指定ID的材料是否存在，并获取原记录的name
-        check_sql = "SELECT id, name FROM file_records WHERE id = %s"
+        check_sql = "SELECT id, name, storage_path FROM file_records WHERE id = %s FOR UPDATE"
         cursor.execute(check_sql, (material_id,))
         existing_record = cursor.fetchone()
         if not existing_record:
@@ -296,6 +302,7 @@ def delete_material(
         # 执行删除操作
         delete_sql = "DELETE FROM file_records WHERE id = %s"
         cursor.execute(delete_sql, (material_id,))
+        blob_store.release_refs(cursor, [existing_record["storage_path"]])
         # 提交事务
         db.commit()
         # 返回友好的删除成功响应
@@ -1,34 +1,35 @@
-from fastapi import APIRouter, UploadFile, File,  HTTPException, Query, Header
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, UploadFile, File,  HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional, List
 from pydantic import BaseModel  
-import json
 import pymysql
 from datetime import datetime  
 from loguru import logger  
 from app.database import get_connection
+from app.core.executor import offload, run_blocking
+from app.core import count_cache, identity_cache
+from app.core.dependencies import get_current_user
+from app.core.pagination import (
+    count_total,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_params,
+    resolve_include_total,
+    split_page,
+    total_fields,
+)
+import csv
 import io
 import zipfile
 from app.services.oss import get_file_from_oss
+from app.services import group_stats, import_jobs
+from app.services.oss import FileTooLarge
+from app.services.uploads import read_upload, upload_too_large
 
 router = APIRouter()
 
 
-class CurrentUser(BaseModel):
-    """当前用户信息"""
-    sub: int
-    username: str
-    roles: list[str]
-
-
-class RequestWithCurrentUser(BaseModel):
-    """包含current_user的通用请求体"""
-    current_user: CurrentUser
-
-
-
-
-
 class GroupMember(BaseModel):
     """群组成员增删请求体"""
 
@@ -36,7 +37,6 @@ class GroupMember(BaseModel):
     member_type: str = "student"  # 学生 student / 教师 teacher / 管理员 admin
     action: str = "add"  # add: 添加成员, list_students: 获取教师负责的学生列表
     student_ids: list[int] | None = None  # 批量添加时的学生ID列表
-    current_user: CurrentUser
 
 
 class GroupUpdate(BaseModel):
@@ -45,28 +45,6 @@ class GroupUpdate(BaseModel):
     description: str | None = None
 
 
-
-
-
-def _parse_current_user(current_user: Optional[dict|str]) -> dict:
-    """Normalize current_user input to dict with keys: sub, username, roles"""
-    try:
-        if isinstance(current_user, dict):
-            return current_user
-        if isinstance(current_user, str):
-            import urllib.parse
-            cu = urllib.parse.unquote(current_user)
-            if cu.strip():
-                current_user = json.loads(cu)
-            else:
-                current_user = None
-        if not isinstance(current_user, dict):
-            return {"sub": 0, "username": "", "roles": []}
-        return current_user
-    except Exception:
-        return {"sub": 0, "username": "", "roles": []}
-
-
 def _normalize_roles(roles: Optional[list]) -> set:
     if not roles:
         return set()
@@ -84,37 +62,8 @@ def _normalize_roles(roles: Optional[list]) -> set:
 
 
 def member_exists(cursor, member_type: str, member_id: int) -> bool:
-    table_map = {"student": "students", "teacher": "teachers", "admin": "admins"}
-    if member_type not in table_map:
-        return False
-    table = table_map[member_type]
-    cursor.execute(f"SELECT 1 FROM `{table}` WHERE `id` = %s", (member_id,))
-    return bool(cursor.fetchone())
-
-
-def _ensure_caller_identity(cursor, cu: dict) -> None:
-    """Ensure current_user exists in DB according to one of their declared roles.
-
-    Raises HTTPException(403) when no matching record found.
-    """
-    sub = cu.get("sub", 0)
-    if not sub:
-        raise HTTPException(status_code=403, detail="无效的调用者身份")
-    roles = _normalize_roles(cu.get("roles", []))
-    # If roles list is empty, still try to find user in any table
-    if not roles:
-        for t in ("students", "teachers", "admins"):
-            cursor.execute(f"SELECT 1 FROM `{t}` WHERE `id` = %s", (sub,))
-            if cursor.fetchone():
-                return
-        raise HTTPException(status_code=403, detail="当前用户在系统中不存在或无效")
-
-    for r in roles:
-        if r in ("teacher", "student", "admin"):
-            if member_exists(cursor, r, sub):
-                return
-
-    raise HTTPException(status_code=403, detail="当前用户在系统中不存在或其身份与数据库不符")
+    # 走进程内身份缓存，命中时不查库
+    return identity_cache.lookup(cursor, member_type, member_id) is not None
 
 
 def _validate_teacher_exists(cursor, teacher_id: int) -> None:
@@ -126,27 +75,28 @@ def _validate_teacher_exists(cursor, teacher_id: int) -> None:
 @router.get(
     "/",
     summary="获取群组列表",
-    description="分页查询群组列表，支持关键词与教师工号筛选。管理员可不填教师工号获取所有群组，教师必须使用自身身份或指定教师工号"
+    description="分页查询群组列表，支持关键词与教师工号筛选。管理员可不填教师工号获取所有群组，教师必须使用自身身份或指定教师工号；传 cursor 时按游标分页"
 )
 def list_groups(
     keyword: str | None = Query(None, description="群组编号/名称关键词"),
     teacher_id: str | None = Query(None, description="按教师工号筛选（管理员可空获取所有群组；教师可空使用自身）"),
     page: int = Query(1, ge=1, description="页码（从1开始）"),
     page_size: int = Query(20, ge=1, le=100, description="每页条数（1-100）"),
-    current_user: Optional[str] = Header(None, alias="X-Current-User", description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}"),
+    page_cursor: Optional[str] = Query(None, alias="cursor", description="上一页返回的 next_cursor，传入时按游标分页（忽略 page）"),
+    include_total: Optional[str] = Query(None, description="总数获取方式：exact（精确）/ approx（允许缓存旧值或估算）/ false（不统计），默认偏移分页 exact、游标分页 false"),
+    cu: dict = Depends(get_current_user),
 ):
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     # only teachers or admins can call this endpoint
     if not ("admin" in roles_norm or "teacher" in roles_norm):
         raise HTTPException(status_code=403, detail="仅管理员或教师可查询教师所属群组")
+    keyset = decode_cursor(page_cursor) if page_cursor else None
+    include_total = resolve_include_total(include_total, keyset is not None)
 
     conn = get_connection()
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        # 确保用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
         # resolve teacher internal id: only allow passing teacher.teacher_id (工号)
         teacher_internal_id = None
         if teacher_id:
@@ -166,50 +116,11 @@ def list_groups(
         if "teacher" in roles_norm and (not teacher_internal_id or teacher_internal_id == 0):
             raise HTTPException(status_code=400, detail="教师必须提供有效的教师ID或使用自身身份")
 
+        like_value = f"%{keyword}%" if keyword else "%"
         # For admins, if no teacher_id provided, return all groups
         if "admin" in roles_norm and not teacher_internal_id:
-            # Query all groups for admins
-            list_sql = """
-            SELECT
-                g.group_id,
-                g.group_name,
-                g.description,
-                g.created_at,
-                g.updated_at,
-                (
-                    SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.group_id AND gm.member_type='student' AND gm.is_active=1
-                ) AS student_count,
-                (SELECT COUNT(DISTINCT p.id)
-                    FROM papers p
-                    WHERE p.owner_id IN (
-                        SELECT member_id FROM group_members WHERE group_id = g.group_id AND member_type='student' AND is_active=1
-                    ) AND p.status = '待审阅'
-                ) AS pending_papers,
-                (
-                    SELECT COUNT(DISTINCT p2.id)
-                    FROM papers p2
-                    WHERE p2.owner_id IN (
-                        SELECT member_id FROM group_members WHERE group_id = g.group_id AND member_type='student' AND is_active=1
-                    ) AND p2.status = '已审阅'
-                ) AS reviewed_papers
-            FROM `groups` g
-            WHERE (g.group_id LIKE %s OR g.group_name LIKE %s)
-            ORDER BY g.created_at DESC
-            LIMIT %s OFFSET %s
-            """
-
-            like_value = f"%{keyword}%" if keyword else "%"
-            offset = (page - 1) * page_size
-            cursor.execute(list_sql, (like_value, like_value, page_size, offset))
-            rows = cursor.fetchall()
-
-            # count total matching groups for pagination
-            count_sql = """
-            SELECT COUNT(*) AS total
-            FROM `groups` g
-            WHERE (g.group_id LIKE %s OR g.group_name LIKE %s)
-            """
-            cursor.execute(count_sql, (like_value, like_value))
+            where_sql = "(g.group_id LIKE %s OR g.group_name LIKE %s)"
+            where_params = [like_value, like_value]
         else:
             # For teachers or admins with teacher_id provided
             if not teacher_internal_id or teacher_internal_id == 0:
@@ -221,56 +132,52 @@ def list_groups(
             if not trow:
                 raise HTTPException(status_code=404, detail="指定教师不存在")
 
-            # Query groups where this teacher is a (active) member
-            list_sql = """
-            SELECT
-                g.group_id,
-                g.group_name,
-                g.description,
-                g.created_at,
-                g.updated_at,
-                (
-                    SELECT COUNT(*) FROM group_members gm WHERE gm.group_id = g.group_id AND gm.member_type='student' AND gm.is_active=1
-                ) AS student_count,
-                (SELECT COUNT(DISTINCT p.id)
-                    FROM papers p
-                    WHERE p.owner_id IN (
-                        SELECT member_id FROM group_members WHERE group_id = g.group_id AND member_type='student' AND is_active=1
-                    ) AND p.status = '待审阅'
-                ) AS pending_papers,
-                (
-                    SELECT COUNT(DISTINCT p2.id)
-                    FROM papers p2
-                    WHERE p2.owner_id IN (
-                        SELECT member_id FROM group_members WHERE group_id = g.group_id AND member_type='student' AND is_active=1
-                    ) AND p2.status = '已审阅'
-                ) AS reviewed_papers
-            FROM `groups` g
-            WHERE EXISTS (
+            # groups where this teacher is a (active) member
+            where_sql = """EXISTS (
                 SELECT 1 FROM group_members gm2 WHERE gm2.group_id = g.group_id AND gm2.member_id = %s AND gm2.is_active=1
             )
-            AND (g.group_id LIKE %s OR g.group_name LIKE %s)
-            ORDER BY g.created_at DESC
-            LIMIT %s OFFSET %s
-            """
-
-            like_value = f"%{keyword}%" if keyword else "%"
-            offset = (page - 1) * page_size
-            cursor.execute(list_sql, (teacher_internal_id, like_value, like_value, page_size, offset))
-            rows = cursor.fetchall()
+            AND (g.group_id LIKE %s OR g.group_name LIKE %s)"""
+            where_params = [teacher_internal_id, like_value, like_value]
+
+        # 游标分页从上一页最后一行 (created_at, id) 继续；偏移分页保持兼容。多取一行判断是否有下一页
+        if keyset:
+            page_where = f"{where_sql} AND {keyset_condition('g.created_at', 'g.id')}"
+            page_params = where_params + keyset_params(keyset) + [page_size + 1]
+            limit_sql = "LIMIT %s"
+        else:
+            page_where = where_sql
+            page_params = where_params + [page_size + 1, (page - 1) * page_size]
+            limit_sql = "LIMIT %s OFFSET %s"
 
-            # count total matching groups for pagination
-            count_sql = """
-            SELECT COUNT(*) AS total
-            FROM `groups` g
-            WHERE EXISTS (
-                SELECT 1 FROM group_members gm2 WHERE gm2.group_id = g.group_id AND gm2.member_id = %s AND gm2.is_active=1
-            )
-            AND (g.group_id LIKE %s OR g.group_name LIKE %s)
-            """
-            cursor.execute(count_sql, (teacher_internal_id, like_value, like_value))
-        cnt_row = cursor.fetchone()
-        total = cnt_row["total"] if cnt_row and isinstance(cnt_row, dict) else (cnt_row[0] if cnt_row else 0)
+        # 统计字段读取预汇总的 group_stats（见 app/services/group_stats.py）
+        list_sql = f"""
+        SELECT
+            g.id,
+            g.group_id,
+            g.group_name,
+            g.description,
+            g.created_at,
+            g.updated_at,
+            COALESCE(gs.student_count, 0) AS student_count,
+            COALESCE(gs.pending_papers, 0) AS pending_papers,
+            COALESCE(gs.reviewed_papers, 0) AS reviewed_papers
+        FROM `groups` g
+        LEFT JOIN `group_stats` gs ON gs.group_id = g.group_id
+        WHERE {page_where}
+        ORDER BY g.created_at DESC, g.id DESC
+        {limit_sql}
+        """
+        cursor.execute(list_sql, page_params)
+        rows, has_more = split_page(cursor.fetchall(), page_size)
+
+        # count total matching groups for pagination（教师视图依赖 group_members，成员变动同样使缓存失效）
+        total, estimated = count_total(
+            cursor,
+            f"SELECT COUNT(*) AS total FROM `groups` g WHERE {where_sql}",
+            where_params,
+            ("groups", "group_members"),
+            include_total,
+        )
 
         items = []
         for row in rows:
@@ -285,12 +192,17 @@ def list_groups(
                 "updated_at": row["updated_at"].strftime("%Y-%m-%d %H:%M:%S") if row.get("updated_at") else None,
             })
 
+        next_cursor = None
+        if has_more and rows and rows[-1].get("created_at"):
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
         return {
             "items": items,
-            "page": page,
+            "page": None if keyset else page,
             "page_size": page_size,
-            "total": total,
-            "total_pages": (total + page_size - 1) // page_size,
+            **total_fields(total, estimated, page_size),
+            "has_more": has_more,
+            "next_cursor": next_cursor,
         }
     except pymysql.MySQLError as e:
         logger.exception("群组列表查询数据库异常")
@@ -301,32 +213,254 @@ def list_groups(
         conn.close()
 
 
+# 导入文件列名 -> 字段名
+_IMPORT_COLUMNS = {
+    "群组编号": "group_id",
+    "群组名称": "group_name",
+    "教师工号": "teacher_id",
+    "学生学号": "student_id",
+    "学生姓名": "student_name",
+}
+# 批量 IN 查询每次携带的编号数
+_IMPORT_LOOKUP_CHUNK = 1000
+
+_IMPORT_GROUP_UPSERT = """
+    INSERT INTO `groups` (`group_id`, `group_name`, `teacher_id`, `description`)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE `group_name`=VALUES(`group_name`), `teacher_id`=VALUES(`teacher_id`), `description`=VALUES(`description`)
+"""
+_IMPORT_MEMBER_UPSERT = """
+    INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE `is_active`=1
+"""
+
+
+def _import_error(line: int, message: str) -> dict:
+    return {"line": line, "message": message}
+
+
+def _parse_import_file(text: str, delimiter: str) -> tuple[list, list]:
+    """解析导入文件，返回 (有效行, 格式错误)，每行带原文件行号。"""
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+    headers = None
+    rows, errors = [], []
+    for values in reader:
+        values = [v.strip() for v in values]
+        # 表格软件导出时常带尾部空列
+        while values and not values[-1]:
+            values.pop()
+        if not values:
+            continue
+        if headers is None:
+            headers = values
+            logger.info(f"解析到的表头: {headers}")
+            missing_cols = set(_IMPORT_COLUMNS) - set(headers)
+            if missing_cols:
+                raise HTTPException(status_code=400, detail=f"文件缺少必填列：{', '.join(missing_cols)}")
+            continue
+        if len(values) > len(headers):
+            errors.append(_import_error(reader.line_num, f"列数异常（表头{len(headers)}列，当前行{len(values)}列）"))
+            continue
+        row = dict(zip(headers, values))
+        missing = [col for col in _IMPORT_COLUMNS if not row.get(col)]
+        if missing:
+            errors.append(_import_error(reader.line_num, f"缺少必填字段：{', '.join(missing)}"))
+            continue
+        item = {key: row[col] for col, key in _IMPORT_COLUMNS.items()}
+        item["line"] = reader.line_num
+        rows.append(item)
+    if headers is None:
+        raise HTTPException(status_code=400, detail="上传文件为空，无有效数据")
+    return rows, errors
+
+
+def _lookup_by_codes(cursor, table: str, code_col: str, codes: set) -> dict:
+    """按业务编号批量查询，返回 {编号: (自增ID, 姓名)}。"""
+    found = {}
+    codes = sorted(codes)
+    for i in range(0, len(codes), _IMPORT_LOOKUP_CHUNK):
+        chunk = codes[i:i + _IMPORT_LOOKUP_CHUNK]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"SELECT `id`, `{code_col}`, `name` FROM `{table}` WHERE `{code_col}` IN ({placeholders})",
+            chunk,
+        )
+        for row_id, code, name in cursor.fetchall():
+            found[code] = (row_id, name)
+    return found
+
+
+def _plan_import(cursor, rows: list) -> tuple[dict, set, list]:
+    """一次性解析全部教师工号与学生学号并校验每一行，返回 (群组, 成员关系, 错误)。"""
+    teachers = _lookup_by_codes(cursor, "teachers", "teacher_id", {r["teacher_id"] for r in rows})
+    students = _lookup_by_codes(cursor, "students", "student_id", {r["student_id"] for r in rows})
+    groups, members, errors = {}, set(), []
+    for r in rows:
+        line = r["line"]
+        group = groups.setdefault(r["group_id"], {
+            "group_name": r["group_name"],
+            "teacher_id": r["teacher_id"],
+            "line": line,
+        })
+        if (group["group_name"], group["teacher_id"]) != (r["group_name"], r["teacher_id"]):
+            errors.append(_import_error(
+                line, f"群组编号 {r['group_id']} 的群组名称/教师工号与第{group['line']}行不一致"
+            ))
+        teacher = teachers.get(r["teacher_id"])
+        if teacher is None:
+            errors.append(_import_error(line, f"教师工号 {r['teacher_id']} 不存在"))
+        else:
+            members.add((r["group_id"], teacher[0], "teacher"))
+        student = students.get(r["student_id"])
+        if student is None:
+            errors.append(_import_error(line, f"学生学号 {r['student_id']} 不存在"))
+        elif student[1] != r["student_name"]:
+            errors.append(_import_error(
+                line,
+                f"学生学号 {r['student_id']} 与姓名 {r['student_name']} 不匹配，数据库中姓名为 {student[1]}",
+            ))
+        else:
+            members.add((r["group_id"], student[0], "student"))
+    return groups, members, errors
+
+
+def _write_import(cursor, groups: dict, members: set) -> None:
+    cursor.executemany(
+        _IMPORT_GROUP_UPSERT,
+        [(gid, g["group_name"], g["teacher_id"], None) for gid, g in groups.items()],
+    )
+    cursor.executemany(_IMPORT_MEMBER_UPSERT, sorted(members))
+    group_stats.refresh_groups(cursor, groups)
+
+
+def _save_import_rows(import_data: list, parse_errors: list, dry_run: bool = False) -> dict:
+    """校验并写入师生关系（在 db 线程池中执行）。
+
+    先整体校验，任何一行有误都不写入并一次返回全部错误；
+    通过后群组与成员关系各用一次批量 INSERT ... ON DUPLICATE KEY UPDATE 写入。
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        groups, members, errors = _plan_import(cursor, import_data)
+        errors = sorted(parse_errors + errors, key=lambda e: e["line"])
+        summary = {
+            "rows": len(import_data),
+            "groups": len(groups),
+            "student_members": sum(1 for m in members if m[2] == "student"),
+            "teacher_members": sum(1 for m in members if m[2] == "teacher"),
+            "errors": errors,
+        }
+        if dry_run:
+            return summary
+        if errors:
+            raise HTTPException(
+                status_code=400,
+                detail={"message": f"导入文件有{len(errors)}处错误，未写入任何数据", "errors": errors},
+            )
+
+        _write_import(cursor, groups, members)
+        conn.commit()
+        count_cache.invalidate("groups", "group_members")
+        logger.info(f"成功导入{len(import_data)}条师生关系数据")
+        return summary
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"数据库操作失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"数据存储失败：{str(e)}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _decode_import_file(content: bytes) -> str:
+    try:
+        return content.decode('utf-8-sig')  # 自动处理UTF-8 BOM
+    except UnicodeDecodeError:
+        try:
+            return content.decode('gbk')  # 尝试GBK编码
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="文件编码不支持，请使用UTF-8或GBK编码保存文件")
+
+
+def _raw_import_lines(text: str, delimiter: str) -> tuple[list, dict]:
+    """返回 (表头, {行号: 原始行})，用于写出失败行。"""
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+    headers, lines = None, {}
+    for values in reader:
+        values = [v.strip() for v in values]
+        if not any(values):
+            continue
+        if headers is None:
+            headers = values
+            continue
+        lines[reader.line_num] = dict(zip(headers, values))
+    return headers or [], lines
+
+
+def _run_group_import_job(job: import_jobs.JobContext) -> dict:
+    """后台导入师生关系：先整体校验，出错的行记入失败行文件，其余行每 IMPORT_JOB_CHUNK_SIZE 行一个事务写入。"""
+    with open(job.path, "rb") as f:
+        text = _decode_import_file(f.read())
+    delimiter = '\t' if job.filename.lower().endswith('.tsv') else ','
+    rows, parse_errors = _parse_import_file(text, delimiter)
+    headers, raw_lines = _raw_import_lines(text, delimiter)
+    job.set_columns(headers)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    written_groups, written_members = set(), 0
+    try:
+        _, _, errors = _plan_import(cursor, rows)
+        reasons = {}
+        for error in parse_errors + errors:
+            reasons.setdefault(error["line"], []).append(error["message"])
+        for line in sorted(reasons):
+            job.fail_row(line, raw_lines.get(line, {}), "；".join(reasons[line]))
+        job.advance(len(reasons))
+
+        valid = [r for r in rows if r["line"] not in reasons]
+        for i in range(0, len(valid), job.chunk_size):
+            chunk = valid[i:i + job.chunk_size]
+            groups, members, _ = _plan_import(cursor, chunk)
+            try:
+                _write_import(cursor, groups, members)
+                conn.commit()
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                for r in chunk:
+                    job.fail_row(r["line"], raw_lines.get(r["line"], {}), f"写入失败：{e.args[-1] if e.args else e}")
+            else:
+                written_groups.update(groups)
+                written_members += len(members)
+            job.advance(len(chunk))
+    finally:
+        cursor.close()
+        conn.close()
+        count_cache.invalidate("groups", "group_members")
+    return {"groups": len(written_groups), "members": written_members, "failed": job.failed}
+
+
+import_jobs.register("groups", _run_group_import_job)
+
+
 @router.post(
     "/import",
     summary="导入群组与师生关系",
-    description="上传 TSV/CSV 文件批量导入群组及师生关系"
+    description="上传 TSV/CSV 文件批量导入群组及师生关系；整个文件校验通过后才写入，"
+                "否则一次返回全部错误行。dry_run=true 时只校验不写入；"
+                "as_job=true 时提交为后台任务（出错的行跳过并写入失败行文件，其余行照常导入）"
 )
 async def import_groups(
     file: UploadFile = File(...),
-    current_user: Optional[str] = Query(None),
+    dry_run: bool = Query(False, description="只校验文件并返回统计与错误，不写入数据库"),
+    as_job: bool = Query(False, description="提交为后台任务，通过 /jobs/{id} 查询进度"),
+    current_user: dict = Depends(get_current_user),
 ):
-   # 这里只做接收并返回模拟结果；实际应解析 Excel 并写入 db
-    try:
-        if isinstance(current_user, str):
-            # 解码URL编码的字符串
-            import urllib.parse
-            current_user = urllib.parse.unquote(current_user)
-            if current_user.strip():
-                # 解析为字典
-                current_user = json.loads(current_user)
-            else:
-                current_user = None
-        if not isinstance(current_user, dict):
-            current_user = {"sub": 0, "username": "", "roles": []}
-    except (json.JSONDecodeError, Exception) as e:
-        logger.error(f"解析current_user失败: {str(e)}")
-        current_user = {"sub": 0, "username": "", "roles": []}
-
     # 权限校验
     required_roles = {"admin", "manager"}
     user_roles = set(current_user.get("roles", []))  
@@ -334,15 +468,6 @@ async def import_groups(
         logger.warning(f"用户{current_user['username']}无导入权限，当前角色: {user_roles}")
         raise HTTPException(status_code=403, detail="无批量导入师生群组权限，请联系管理员")
 
-    # 确保用户存在且身份正确
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        _ensure_caller_identity(cursor, current_user)
-    finally:
-        cursor.close()
-        conn.close()
-
     # 基础文件格式校验
     supported_formats = ('.tsv', '.csv')
     if not file.filename.lower().endswith(supported_formats):
@@ -351,129 +476,59 @@ async def import_groups(
             status_code=400,
             detail=f"请上传文本表格文件（{', '.join(supported_formats)}）"
         )
-    content = await file.read()
+    if as_job and not dry_run:
+        try:
+            job_id = await run_blocking(
+                "storage", import_jobs.create_job, "groups", file.filename, file.file,
+                f"{current_user['user_type']}:{current_user['sub']}",
+            )
+        except FileTooLarge as e:
+            raise upload_too_large(e.limit)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "导入任务已提交", "job_id": job_id, "status_url": f"/api/v1/jobs/{job_id}"},
+        )
+
+    # 名单需要整体校验，仍然读入内存，但按块读取并受 IMPORT_MAX_BYTES 限制
+    content = await read_upload(file)
     if not content:
         logger.warning(f"用户{current_user['username']}上传空文件：{file.filename}")
         raise HTTPException(status_code=400, detail="上传文件为空，无有效数据")
     
     # 数据解析
     try:
-        import_data = []
-        required_cols = {"群组编号", "群组名称", "教师工号", "学生学号", "学生姓名"}
         delimiter = '\t' if file.filename.lower().endswith('.tsv') else ','  
-        
-        try:
-            text_content = content.decode('utf-8-sig')  # 自动处理UTF-8 BOM
-        except UnicodeDecodeError:
-            try:
-                text_content = content.decode('gbk')  # 尝试GBK编码
-            except UnicodeDecodeError:
-                raise Exception("文件编码不支持，请使用UTF-8或GBK编码保存文件")
-        
-        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-        if not lines:
-            raise Exception("文件无有效文本内容")
-        
-        headers = [h.strip() for h in lines[0].split(delimiter) if h.strip()]
-        logger.info(f"解析到的表头: {headers}")
-        missing_cols = required_cols - set(headers)
-        if missing_cols:
-            logger.error(f"用户{current_user['username']}上传文件缺少必填列：{missing_cols}")
-            raise HTTPException(status_code=400, detail=f"文件缺少必填列：{', '.join(missing_cols)}")
-        
-        for line_num, line in enumerate(lines[1:], start=2):
-            row_values = [v.strip() for v in line.split(delimiter) if v.strip()]
-
-            row_len = len(row_values)
-            header_len = len(headers)
-            if row_len != header_len:
-                logger.warning(f"第{line_num}行列数异常（表头{header_len}列，当前行{row_len}列），跳过该行")
-                continue
-            row_dict = dict(zip(headers, row_values))
-
-            if all([row_dict.get(col) for col in required_cols]):
-                import_data.append({
-                    "group_id": row_dict["群组编号"],
-                    "group_name": row_dict["群组名称"],
-                    "teacher_id": row_dict["教师工号"],
-                    "student_id": row_dict["学生学号"],
-                    "student_name": row_dict["学生姓名"]
-                })
-        
-        # 数据清洗结果校验
-        if not import_data:
+        text_content = _decode_import_file(content)
+
+        import_data, parse_errors = _parse_import_file(text_content, delimiter)
+        if not import_data and not parse_errors:
             logger.warning(f"用户{current_user['username']}上传文件无有效师生关系数据")
             raise HTTPException(status_code=400, detail="文件中无有效师生关系数据")
-        
-        # 数据存储
-        imported_count = len(import_data)
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            # 处理每条数据
-            for item in import_data:
-                # 插入或更新群组
-                cursor.execute("""
-                    INSERT INTO `groups` (`group_id`, `group_name`, `teacher_id`, `description`)
-                    VALUES (%s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE `group_name`=VALUES(`group_name`), `teacher_id`=VALUES(`teacher_id`), `description`=VALUES(`description`)
-                """, (item["group_id"], item["group_name"], item["teacher_id"], None))
-                
-                # 验证教师是否存在
-                cursor.execute("SELECT `id` FROM `teachers` WHERE `teacher_id` = %s", (item["teacher_id"],))
-                teacher_row = cursor.fetchone()
-                if not teacher_row:
-                    raise HTTPException(status_code=404, detail=f"教师工号 {item['teacher_id']} 不存在")
-                teacher_id = teacher_row[0]
-                
-                # 验证学生是否存在并检查姓名是否匹配
-                cursor.execute("SELECT `id`, `name` FROM `students` WHERE `student_id` = %s", (item["student_id"],))
-                student_row = cursor.fetchone()
-                if not student_row:
-                    raise HTTPException(status_code=404, detail=f"学生学号 {item['student_id']} 不存在")
-                student_id = student_row[0]
-                student_name = student_row[1]
-                if student_name != item["student_name"]:
-                    raise HTTPException(status_code=400, detail=f"学生学号 {item['student_id']} 与姓名 {item['student_name']} 不匹配，数据库中姓名为 {student_name}")
-                
-                # 添加学生到群组
-                cursor.execute("""
-                    INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`)
-                    VALUES (%s, %s, 'student')
-                    ON DUPLICATE KEY UPDATE `is_active`=1
-                """, (item["group_id"], student_id))
-                
-                # 添加教师到群组
-                cursor.execute("""
-                    INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`)
-                    VALUES (%s, %s, 'teacher')
-                    ON DUPLICATE KEY UPDATE `is_active`=1
-                """, (item["group_id"], teacher_id))
-            
-            conn.commit()
-            logger.info(f"成功导入{imported_count}条师生关系数据")
-        except HTTPException:
-            conn.rollback()
-            raise
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"数据库操作失败: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"数据存储失败：{str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
-    
+        # 校验与存储
+        summary = await run_blocking("db", _save_import_rows, import_data, parse_errors, dry_run)
+
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"用户{current_user['username']}导入失败：{str(e)}")
         raise HTTPException(status_code=500, detail=f"数据导入失败：{str(e)}")
-    
+
+    imported_count = summary["rows"]
+    if dry_run:
+        message = (
+            f"校验通过，可导入{imported_count}条师生关系" if not summary["errors"]
+            else f"校验发现{len(summary['errors'])}处错误"
+        )
+    else:
+        message = f"成功识别{imported_count}条有效师生关系，上传文件已存档"
     # 返回导入结果
     return {
-        "imported": imported_count,
-        "message": f"成功识别{imported_count}条有效师生关系，上传文件已存档",
+        "imported": 0 if dry_run else imported_count,
+        "dry_run": dry_run,
+        "valid": not summary["errors"],
+        "message": message,
+        **summary,
         "operated_by": current_user["username"],
         "operated_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "uploaded_file": file.filename,
@@ -488,18 +543,17 @@ async def import_groups(
         "新增单个群组记录。\n"
         "必填字段：group_name。\n"
         "可选字段：group_id（不传则自动生成），teacher_id, description。\n"
-        "必填 current_user 字段：sub(数据库用户id), roles(包含 teacher 或 admin), username。\n"
-        "示例 current_user: {\"sub\": 3, \"roles\": [\"teacher\"], \"username\": \"li\"}"
+        "调用者需为教师或管理员（以登录 token 为准）。"
     )
 )
-async def create_group(
+@offload("db")
+def create_group(
     group_name: str,
     group_id: str | None = None,
     teacher_id: str | None = None,
     description: str | None = None,
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
-    cu = _parse_current_user(current_user)
     # Only teachers or admins can create groups
     allowed = {"admin", "teacher"}
 
@@ -510,9 +564,6 @@ async def create_group(
         roles_norm = _normalize_roles(cu.get("roles", []))
         if not allowed & roles_norm:
             raise HTTPException(status_code=403, detail="仅老师或管理员可创建群组")
-        # 确保用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
-
         group_id_value = (group_id or "").strip() or None
         if not group_id_value:
             cursor.execute(
@@ -543,7 +594,7 @@ async def create_group(
         try:
             cursor.execute(
                 "INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`, `is_active`, `joined_at`) VALUES (%s, %s, %s, 1, NOW()) ON DUPLICATE KEY UPDATE is_active=1",
-                (group_id_value, cu.get("sub", 0), creator_member_type),
+                (group_id_value, cu["sub"], creator_member_type),
             )
             
             # if teacher_id is provided, add the teacher as a member
@@ -560,11 +611,13 @@ async def create_group(
                 else:
                     # teacher not found, but continue with group creation
                     logger.warning(f"Teacher with teacher_id {teacher_id} not found, group created without teacher as member")
+            group_stats.refresh_groups(cursor, [group_id_value])
         except Exception:
             # if owner insert fails, rollback group creation as atomic
             conn.rollback()
             raise
         conn.commit()
+        count_cache.invalidate("groups", "group_members")
         return {
             "group_id": group_id_value,
             "group_name": group_name,
@@ -591,16 +644,16 @@ async def create_group(
     summary="绑定群组",
     description="将用户绑定到指定群组"
 )
-async def bind_group(
+@offload("db")
+def bind_group(
     group_id: str,
     group_name: str,
     member_type: str,  # 只能是 teacher 或 student
     student_id: Optional[str] = Query(None, description="学生学号（member_type为student时必填）"),
     teacher_id: Optional[str] = Query(None, description="教师工号（member_type为teacher时必填）"),
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
     """绑定用户到群组的实现"""
-    cu = _parse_current_user(current_user)
     
     try:
         # 验证入群身份
@@ -621,9 +674,6 @@ async def bind_group(
     cursor = None
     try:
         cursor = conn.cursor()
-        # 确保当前用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
-        
         # 验证群组是否存在
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
@@ -653,8 +703,10 @@ async def bind_group(
             VALUES (%s, %s, %s, 1, NOW())
             ON DUPLICATE KEY UPDATE `is_active` = 1, `updated_at` = NOW()
         """, (group_id, member_id, member_type))
+        group_stats.refresh_groups(cursor, [group_id])
         
         conn.commit()
+        count_cache.invalidate("groups", "group_members")
         return {
             "group_id": group_id,
             "group_name": group_name,
@@ -680,18 +732,16 @@ async def bind_group(
     summary="删除群组",
     description="根据群组编号删除群组及其所有成员关系"
 )
-async def delete_group(
+@offload("db")
+def delete_group(
     group_id: str,
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
-    cu = _parse_current_user(current_user)
     # Only group owner can delete (dissolve) the group
 
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        # 确保用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
         cursor.execute("SELECT `id` FROM `groups` WHERE `group_id` = %s", (group_id,))
         row = cursor.fetchone()
         if not row:
@@ -705,7 +755,7 @@ async def delete_group(
             # 教师需要验证是否是该群组的成员
             cursor.execute(
                 "SELECT 1 FROM `group_members` WHERE `group_id`=%s AND `member_id`=%s AND `member_type`='teacher' AND `is_active`=1",
-                (group_id, cu.get("sub", 0)),
+                (group_id, cu["sub"]),
             )
             if not cursor.fetchone():
                 raise HTTPException(status_code=403, detail="只有教师或管理员可解散群组")
@@ -714,7 +764,9 @@ async def delete_group(
         cursor.execute("DELETE FROM `group_members` WHERE `group_id` = %s", (group_id,))
         # 删除群组
         cursor.execute("DELETE FROM `groups` WHERE `group_id` = %s", (group_id,))
+        group_stats.delete_group(cursor, group_id)
         conn.commit()
+        count_cache.invalidate("groups", "group_members")
         return {"group_id": group_id, "message": "群组及其成员关系已删除"}
     except HTTPException:
         raise
@@ -734,20 +786,15 @@ async def delete_group(
     summary="更新群组",
     description="更新群组信息（群名/教师/描述），仅群主或群组管理员可更新"
 )
-async def update_group(
+@offload("db")
+def update_group(
     group_id: str, 
     payload: GroupUpdate,
-    current_user: Optional[str] = Header(None, alias="X-Current-User", description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
-    # 解析并验证当前用户身份
-    cu = _parse_current_user(current_user)
-    
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        # 确保调用者在数据库中存在
-        _ensure_caller_identity(cursor, cu)
-
         # 验证群组是否存在
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
@@ -762,7 +809,7 @@ async def update_group(
             # 教师需要验证是否是该群组的成员
             cursor.execute(
                 "SELECT 1 FROM `group_members` WHERE `group_id`=%s AND `member_id`=%s AND `member_type`='teacher' AND `is_active`=1",
-                (group_id, cu.get("sub", 0)),
+                (group_id, cu["sub"]),
             )
             if not cursor.fetchone():
                 raise HTTPException(status_code=403, detail="只有教师或管理员可更新群组信息")
@@ -795,6 +842,7 @@ async def update_group(
         sql = f"UPDATE `groups` SET {', '.join(updates)} WHERE `group_id` = %s"
         cursor.execute(sql, tuple(params))
         conn.commit()
+        count_cache.invalidate("groups")
         return {"group_id": group_id, "message": "群组更新成功"}
     except HTTPException:
         raise
@@ -814,25 +862,22 @@ async def update_group(
     summary="添加群组成员",
     description="为指定群组添加成员（学生或教师）"
 )
-async def add_group_member(
+@offload("db")
+def add_group_member(
     group_id: str = Query(..., description="群组ID"),
     student_ids: Optional[str] = Query(None, description="邀请学生，填写一个或多个student_id，逗号分隔，例如: 2021001,2021002,2021003"),
     teacher_ids: Optional[str] = Query(None, description="邀请教师，填写一个或多个teacher_id，逗号分隔，例如: 101,102,103"),
-    current_user: str = Query(None, description="当前用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"teacher\"],\"username\":\"teacher1\"}")
+    cu: dict = Depends(get_current_user)
 ):
     # 验证参数：必须提供学生ID或教师ID
     if student_ids is None and teacher_ids is None:
         raise HTTPException(status_code=400, detail="必须提供 student_ids 或 teacher_ids")
     logger.info(f"请求: group_id={group_id}, student_ids={student_ids}, teacher_ids={teacher_ids}")
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     conn = get_connection()
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        # ensure caller identity exists
-        _ensure_caller_identity(cursor, cu)
-        
         # 检查群组是否存在
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
@@ -865,7 +910,7 @@ async def add_group_member(
                     
                     # 检查师生关系：如果是教师操作，确保学生是该教师的学生
                     if "teacher" in roles_norm or "教师" in roles_norm:
-                        teacher_internal_id = cu.get("sub", 0)
+                        teacher_internal_id = cu["sub"]
                         cursor.execute(
                             "SELECT 1 FROM `papers` WHERE `owner_id` = %s AND `teacher_id` = %s",
                             (student_internal_id, teacher_internal_id)
@@ -921,7 +966,10 @@ async def add_group_member(
         if not added_members:
             raise HTTPException(status_code=400, detail="没有有效的成员被添加")
         
+        if any(m["member_type"] == "student" for m in added_members):
+            group_stats.refresh_groups(cursor, [group_id])
         conn.commit()
+        count_cache.invalidate("groups", "group_members")
         return {
             "group_id": group_id,
             "action": "add_members",
@@ -948,15 +996,15 @@ async def add_group_member(
     summary="删除群组成员",
     description="从指定群组移除成员（软删除，设置 is_active=0）"
 )
-async def remove_group_member(
+@offload("db")
+def remove_group_member(
     group_id: str,
     student_id: Optional[str] = Query(None, description="学生学号（member_type为student时必填）"),
     teacher_id: Optional[str] = Query(None, description="教师工号（member_type为teacher时必填）"),
     admin_id: Optional[str] = Query(None, description="管理员账号（member_type为admin时必填）"),
     member_type: str = Query("student", description="成员类型：student / teacher / admin"),
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
-    cu = _parse_current_user(current_user)
     # only owner or group admin can remove members
 
     if member_type not in ["student", "teacher", "admin"]:
@@ -973,9 +1021,6 @@ async def remove_group_member(
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        # ensure caller identity exists
-        _ensure_caller_identity(cursor, cu)
-
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="群组不存在")
@@ -988,7 +1033,7 @@ async def remove_group_member(
             # 教师需要验证是否是该群组的成员
             cursor.execute(
                 "SELECT 1 FROM `group_members` WHERE `group_id`=%s AND `member_id`=%s AND `member_type`='teacher' AND `is_active`=1",
-                (group_id, cu.get("sub", 0)),
+                (group_id, cu["sub"]),
             )
             if not cursor.fetchone():
                 raise HTTPException(status_code=403, detail="只有教师或管理员可移除成员")
@@ -1027,7 +1072,10 @@ async def remove_group_member(
             "UPDATE `group_members` SET `is_active` = 0 WHERE `group_id` = %s AND `member_id` = %s AND `member_type` = %s",
             (group_id, member_id, member_type),
         )
+        if member_type == "student":
+            group_stats.refresh_groups(cursor, [group_id])
         conn.commit()
+        count_cache.invalidate("groups", "group_members")
         return {
             "group_id": group_id,
             "member_id": member_id,
@@ -1055,13 +1103,13 @@ async def remove_group_member(
     summary="获取群组成员信息",
     description="获取指定群组成员列表，可按成员类型筛选"
 )
-async def get_group_members(
+@offload("db")
+def get_group_members(
     group_id: str,
     member_type: Optional[str] = Query(None, description="成员类型筛选：student/teacher/admin"),
     include_inactive: bool = Query(False, description="是否包含已移除成员"),
-    current_user: str = Query('{"sub": 1, "roles": ["admin"], "username": "admin"}', description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
 
     if member_type and member_type not in ["student", "teacher", "admin"]:
@@ -1071,9 +1119,6 @@ async def get_group_members(
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        # 确保用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
-
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="群组不存在")
@@ -1081,7 +1126,7 @@ async def get_group_members(
         if not ("admin" in roles_norm or "teacher" in roles_norm):
             cursor.execute(
                 "SELECT 1 FROM `group_members` WHERE `group_id`=%s AND `member_id`=%s AND `is_active`=1",
-                (group_id, cu.get("sub", 0)),
+                (group_id, cu["sub"]),
             )
             if not cursor.fetchone():
                 raise HTTPException(status_code=403, detail="无权限查看该群组成员")
@@ -1202,17 +1247,91 @@ async def get_group_members(
         conn.close()
 
 
+# 群组内每个有效学生及其最新的一篇论文（按 updated_at 倒序取第一篇，没有论文时论文列为 NULL）。
+# 派生表只对本群组学生的论文开窗，代价与群组规模成正比。
+_STUDENTS_LATEST_PAPER_SQL = """
+SELECT
+    s.id AS student_id,
+    s.name AS student_name,
+    s.student_id AS student_number,
+    lp.id AS paper_id,
+    lp.updated_at AS paper_update_time,
+    lp.oss_key AS paper_oss_key,
+    lp.pdf_oss_key AS paper_pdf_oss_key,
+    COALESCE(lp.annotation_count, 0) AS annotation_count
+FROM group_members gm
+JOIN students s ON s.id = gm.member_id
+LEFT JOIN (
+    SELECT
+        p.id, p.owner_id, p.updated_at, p.oss_key, p.pdf_oss_key, p.annotation_count,
+        ROW_NUMBER() OVER (PARTITION BY p.owner_id ORDER BY p.updated_at DESC, p.id DESC) AS rn
+    FROM papers p
+    JOIN group_members m
+        ON m.member_id = p.owner_id AND m.group_id = %s AND m.member_type = 'student' AND m.is_active = 1
+) lp ON lp.owner_id = s.id AND lp.rn = 1
+WHERE gm.group_id = %s AND gm.member_type = 'student' AND gm.is_active = 1
+ORDER BY s.name ASC, s.id ASC
+"""
+
+
+def _fetch_students_latest_paper(cursor, group_id: str) -> list:
+    cursor.execute(_STUDENTS_LATEST_PAPER_SQL, (group_id, group_id))
+    return cursor.fetchall()
+
+
+def _format_time(value) -> Optional[str]:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def _build_class_students(rows: list) -> list:
+    """每行对应一个学生，一次遍历组装班级学生列表。"""
+    result = []
+    for row in rows:
+        papers = []
+        if row.get('paper_id'):
+            papers.append({
+                "paper_id": row['paper_id'],
+                "paper_update_time": _format_time(row.get('paper_update_time')),
+                "annotation_count": row.get('annotation_count', 0)
+            })
+        result.append({
+            "student_id": row.get('student_id'),
+            "student_name": row.get('student_name'),
+            "student_number": row.get('student_number'),
+            "papers": papers
+        })
+    return result
+
+
+def _build_group_papers(rows: list) -> list:
+    """只保留已提交论文的学生，一次遍历组装群组论文列表。"""
+    return [
+        {
+            "paper_id": row['paper_id'],
+            "student_id": row.get('student_id'),
+            "student_name": row.get('student_name'),
+            "student_number": row.get('student_number'),
+            "paper_update_time": _format_time(row.get('paper_update_time')),
+            "annotation_count": row.get('annotation_count', 0),
+            "oss_key": row.get('paper_oss_key'),
+            "pdf_oss_key": row.get('paper_pdf_oss_key')
+        }
+        for row in rows
+        if row.get('paper_id')
+    ]
+
+
 @router.get(
     "/{group_id}/students",
     summary="获取班级学生列表",
     description="获取指定班级的所有学生及其论文状态"
 )
-async def get_class_students(
+@offload("db")
+def get_class_students(
     group_id: str,
-    current_user: str = Query('{"sub": 1, "roles": ["admin"], "username": "admin"}', description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
     """获取班级学生列表的实现"""
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     # 验证权限：只有管理员或教师可以查看班级学生列表
@@ -1223,73 +1342,14 @@ async def get_class_students(
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        # 确保用户存在且身份正确
-        _ensure_caller_identity(cursor, cu)
-        
         # 验证群组是否存在
         cursor.execute("SELECT 1 FROM `groups` WHERE `group_id` = %s", (group_id,))
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="群组不存在")
         
-        # 获取班级所有学生信息及论文状态
-        sql = """
-        SELECT
-            s.id as student_id,
-            s.name as student_name,
-            s.student_id as student_number,
-            p.id as paper_id,
-            p.updated_at as paper_update_time,
-            (SELECT COUNT(*) FROM annotations WHERE paper_id = p.id) as annotation_count
-        FROM
-            students s
-        JOIN
-            group_members gm ON s.id = gm.member_id AND gm.member_type = 'student' AND gm.is_active = 1
-        LEFT JOIN
-            papers p ON s.id = p.owner_id
-        
-        WHERE
-            gm.group_id = %s
-        ORDER BY
-            s.name ASC,
-            p.updated_at DESC
-        """
-        
-        cursor.execute(sql, (group_id,))
-        rows = cursor.fetchall()
-        
-        # 处理结果，按学生分组，只保留每个学生的最新版本论文
-        students = {}
-        paper_versions = {}
-        
-        for row in rows:
-            student_id = row.get('student_id')
-            paper_id = row.get('paper_id')
-            
-            if student_id not in students:
-                students[student_id] = {
-                    "student_id": student_id,
-                    "student_name": row.get('student_name'),
-                    "student_number": row.get('student_number'),
-                    "papers": []
-                }
-            
-            # 如果有论文信息，记录论文版本，只保留最新版本
-            if paper_id:
-                if paper_id not in paper_versions:
-                    paper_versions[paper_id] = row
-        
-        # 为每个学生添加最新版本的论文
-        for student_id, student_info in students.items():
-            for paper_id, paper_info in paper_versions.items():
-                if paper_info.get('student_id') == student_id:
-                    student_info["papers"].append({
-                        "paper_id": paper_id,
-                        "paper_update_time": paper_info.get('paper_update_time').strftime("%Y-%m-%d %H:%M:%S") if paper_info.get('paper_update_time') else None,
-                        "annotation_count": paper_info.get('annotation_count', 0)
-                    })
-        
-        # 转换为列表格式
-        result = list(students.values())
+        # 获取班级所有学生信息及各自最新的一篇论文
+        rows = _fetch_students_latest_paper(cursor, group_id)
+        result = _build_class_students(rows)
         
         return {
             "group_id": group_id,
@@ -1311,13 +1371,13 @@ async def get_class_students(
     summary="查看群组论文列表",
     description="老师查看指定群组的所有成员提交的论文信息"
 )
-async def get_group_papers(
+@offload("db")
+def get_group_papers(
     teacher_id: str = Query(..., description="教师ID"),
     group_id: str = Query(..., description="群组ID"),
-    current_user: str = Query('{"sub": 1, "roles": ["admin"], "username": "admin"}', description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
     """查看群组论文列表的实现"""
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     # 验证权限：只有管理员或教师可以查看群组论文列表
@@ -1363,57 +1423,9 @@ async def get_group_papers(
         if not cursor.fetchone():
             raise HTTPException(status_code=403, detail="教师不是该群组的成员")
         
-        # 获取群组所有学生的论文信息
-        sql = """
-        SELECT
-            s.id as student_id,
-            s.name as student_name,
-            s.student_id as student_number,
-            p.id as paper_id,
-            p.updated_at as paper_update_time,
-            p.oss_key as paper_oss_key,
-            p.pdf_oss_key as paper_pdf_oss_key,
-            (SELECT COUNT(*) FROM annotations WHERE paper_id = p.id) as annotation_count
-        FROM
-            students s
-        JOIN
-            group_members gm ON s.id = gm.member_id AND gm.member_type = 'student' AND gm.is_active = 1
-        LEFT JOIN
-            papers p ON s.id = p.owner_id
-        
-        WHERE
-            gm.group_id = %s
-        ORDER BY
-            s.name ASC,
-            p.updated_at DESC
-        """
-        
-        cursor.execute(sql, (group_id,))
-        rows = cursor.fetchall()
-        
-        # 处理结果，按学生分组，只保留每个学生的最新版本论文
-        papers = []
-        paper_versions = {}
-        
-        for row in rows:
-            paper_id = row.get('paper_id')
-            
-            if paper_id:
-                if paper_id not in paper_versions:
-                    paper_versions[paper_id] = row
-        
-        # 构建论文列表
-        for paper_id, paper_info in paper_versions.items():
-            papers.append({
-                "paper_id": paper_id,
-                "student_id": paper_info.get('student_id'),
-                "student_name": paper_info.get('student_name'),
-                "student_number": paper_info.get('student_number'),
-                "paper_update_time": paper_info.get('paper_update_time').strftime("%Y-%m-%d %H:%M:%S") if paper_info.get('paper_update_time') else None,
-                "annotation_count": paper_info.get('annotation_count', 0),
-                "oss_key": paper_info.get('paper_oss_key'),
-                "pdf_oss_key": paper_info.get('paper_pdf_oss_key')
-            })
+        # 获取群组所有学生各自最新的一篇论文
+        rows = _fetch_students_latest_paper(cursor, group_id)
+        papers = _build_group_papers(rows)
         
         return {
             "group_id": group_id,
@@ -1436,14 +1448,14 @@ async def get_group_papers(
     summary="批量下载群组论文",
     description="管理员或老师批量下载指定群组的学生论文，支持zip和原格式下载"
 )
-async def batch_download_papers(
+@offload("db")
+def batch_download_papers(
     group_id: str,
     student_ids: List[int] | None = None,
     format: str = "zip",
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
     """批量下载群组论文的实现"""
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     # 验证权限：只有管理员或教师可以批量下载论文
@@ -1543,12 +1555,12 @@ async def batch_download_papers(
     summary="选择下载论文",
     description="管理员或老师通过指定论文ID列表选择下载论文，格式为zip"
 )
-async def selected_download_papers(
+@offload("storage")
+def selected_download_papers(
     paper_ids: str = Query(..., description="论文ID列表，用英文逗号分隔，例如: 1,2,3,4,5"),
-    current_user: Optional[str] = Query(None, description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin\"}")
+    cu: dict = Depends(get_current_user)
 ):
     """选择下载论文的实现"""
-    cu = _parse_current_user(current_user)
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     # 验证权限：只有管理员或教师可以选择下载论文
@@ -1672,17 +1684,15 @@ def _get_papers_by_ids(cursor, paper_ids: list[int]) -> list[dict]:
 )
 def get_reviewed_paper_count(
     group_id: str = Query(..., description="群组ID"),
-    current_user: Optional[str] = Header(None, alias="X-Current-User", description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"teacher\"],\"username\":\"teacher1\"}"),
+    cu: dict = Depends(get_current_user),
 ):
-    cu = _parse_current_user(current_user)
-    caller_id = cu.get("sub", 0)
+    caller_id = cu["sub"]
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     conn = get_connection()
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        _ensure_caller_identity(cursor, cu)
         # 检查权限：教师或管理员可查看已审阅论文数
         roles_norm = _normalize_roles(cu.get("roles", []))
         if "admin" in roles_norm:
@@ -1729,17 +1739,15 @@ def get_reviewed_paper_count(
 )
 def get_uploaded_paper_count(
     group_id: str = Query(..., description="群组ID"),
-    current_user: Optional[str] = Header(None, alias="X-Current-User", description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"teacher\"],\"username\":\"teacher1\"}"),
+    cu: dict = Depends(get_current_user),
 ):
-    cu = _parse_current_user(current_user)
-    caller_id = cu.get("sub", 0)
+    caller_id = cu["sub"]
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     conn = get_connection()
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        _ensure_caller_identity(cursor, cu)
         # 检查权限：教师或管理员可查看已上传论文数
         roles_norm = _normalize_roles(cu.get("roles", []))
         if "admin" in roles_norm:
@@ -1779,24 +1787,28 @@ def get_uploaded_paper_count(
         conn.close()
 
 
+# 视为“已提交”的论文状态
+_UPLOADED_PAPER_STATUSES = ("已上传", "待审阅")
+
+
 @router.get(
     "/paper/unuploaded/members",
     summary="查看未上传论文的成员",
-    description="查询指定群组下未上传论文的学生成员列表，仅群组群主/管理员教师可访问"
+    description="查询指定群组下未上传论文的学生成员列表，仅群组群主/管理员教师可访问；传 page 时分页返回"
 )
 def get_unuploaded_paper_members(
     group_id: str = Query(..., description="群组ID"),
-    current_user: Optional[str] = Header(None, alias="X-Current-User", description="当前登录用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"teacher\"],\"username\":\"teacher1\"}"),
+    page: Optional[int] = Query(None, ge=1, description="页码（从1开始）；不传则返回全部未上传成员"),
+    page_size: int = Query(50, ge=1, le=200, description="每页条数（1-200），仅分页时生效"),
+    cu: dict = Depends(get_current_user),
 ):
-    cu = _parse_current_user(current_user)
-    caller_id = cu.get("sub", 0)
+    caller_id = cu["sub"]
     roles_norm = _normalize_roles(cu.get("roles", []))
     
     conn = get_connection()
     cursor = None
     try:
         cursor = conn.cursor(pymysql.cursors.DictCursor)
-        _ensure_caller_identity(cursor, cu)
         # 检查权限：教师或管理员可查看未上传论文成员
         roles_norm = _normalize_roles(cu.get("roles", []))
         if "admin" in roles_norm:
@@ -1810,52 +1822,64 @@ def get_unuploaded_paper_members(
             )
             if not cursor.fetchone():
                 raise HTTPException(status_code=403, detail="只有教师或管理员可查看未上传论文成员")
-        cursor.execute(
-            """
-            SELECT gm.member_id, s.student_id, s.name 
+        # 反连接：群组有效学生中不存在“已上传/待审阅”论文的，子查询走 idx_papers_owner_status
+        base_sql = f"""
             FROM `group_members` gm
             LEFT JOIN `students` s ON gm.member_id = s.id
-            WHERE gm.group_id = %s 
-            AND gm.member_type = 'student' 
+            WHERE gm.group_id = %s
+            AND gm.member_type = 'student'
             AND gm.is_active = 1
-            """,
-            (group_id,)
-        )
-        all_students = cursor.fetchall()
-        if not all_students:
-            return {
-                "group_id": group_id,
-                "unuploaded_members": [],
-                "message": "该群组暂无学生成员"
-            }
-        cursor.execute(
-            """
-            SELECT DISTINCT p.owner_id 
-            FROM `papers` p
-            WHERE p.owner_id IN (
-                SELECT member_id FROM group_members 
-                WHERE group_id = %s AND member_type='student' AND is_active=1
-            ) 
-            AND p.status IN ('已上传', '待审阅')
-            """,
-            (group_id,)
-        )
-        uploaded_student_ids = [row["owner_id"] for row in cursor.fetchall()]
+            AND NOT EXISTS (
+                SELECT 1 FROM `papers` p
+                WHERE p.owner_id = gm.member_id
+                AND p.status IN ({", ".join(["%s"] * len(_UPLOADED_PAPER_STATUSES))})
+            )
+        """
+        base_args = (group_id, *_UPLOADED_PAPER_STATUSES)
+        list_sql = f"SELECT gm.member_id, s.student_id, s.name {base_sql} ORDER BY gm.member_id"
+        if page is None:
+            cursor.execute(list_sql, base_args)
+            rows = cursor.fetchall()
+            total = len(rows)
+        else:
+            cursor.execute(f"SELECT COUNT(*) AS total {base_sql}", base_args)
+            total = int((cursor.fetchone() or {}).get("total", 0) or 0)
+            cursor.execute(f"{list_sql} LIMIT %s OFFSET %s", (*base_args, page_size, (page - 1) * page_size))
+            rows = cursor.fetchall()
+
+        if total == 0:
+            cursor.execute(
+                "SELECT 1 FROM `group_members` WHERE `group_id`=%s AND `member_type`='student' AND `is_active`=1 LIMIT 1",
+                (group_id,),
+            )
+            if not cursor.fetchone():
+                return {
+                    "group_id": group_id,
+                    "unuploaded_members": [],
+                    "message": "该群组暂无学生成员"
+                }
+
         unuploaded_members = [
             {
-                "student_internal_id": student["member_id"],
-                "student_id": student["student_id"],  # 学生学号
-                "student_name": student["name"]       # 学生姓名
+                "student_internal_id": row["member_id"],
+                "student_id": row["student_id"],  # 学生学号
+                "student_name": row["name"]       # 学生姓名
             }
-            for student in all_students
-            if student["member_id"] not in uploaded_student_ids
+            for row in rows
         ]
-        return {
+        result = {
             "group_id": group_id,
-            "unuploaded_members_count": len(unuploaded_members),
+            "unuploaded_members_count": total,
             "unuploaded_members": unuploaded_members,
             "message": "已成功查询未上传论文的成员列表"
         }
+        if page is not None:
+            result.update({
+                "page": page,
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size,
+            })
+        return result
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"数据库错误：{str(e)}")
     finally:
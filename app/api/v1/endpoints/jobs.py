@@ -0,0 +1,49 @@
+"""
+后台导入任务查询
+"""
+import pymysql
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from loguru import logger
+
+from app.core.dependencies import get_current_user
+from app.services import import_jobs
+
+router = APIRouter()
+
+
+def _get_visible_job(job_id: str, current_user: dict) -> dict:
+    """任务只对提交人与管理员可见。"""
+    try:
+        job = import_jobs.get_job(job_id)
+    except pymysql.MySQLError as e:
+        logger.error(f"查询导入任务数据库错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="查询导入任务失败")
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    owner = f"{current_user['user_type']}:{current_user['sub']}"
+    if current_user["user_type"] != "admin" and job["created_by"] != owner:
+        raise HTTPException(status_code=403, detail="无权查看该任务")
+    return job
+
+
+@router.get(
+    "/{job_id}",
+    summary="查询导入任务进度",
+    description="返回任务状态（queued/running/succeeded/failed）、总行数、已处理行数、失败行数、预计剩余秒数及导入结果",
+)
+def get_import_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return _get_visible_job(job_id, current_user)
+
+
+@router.get(
+    "/{job_id}/failed-rows",
+    summary="下载导入失败行",
+    description="下载失败行 CSV（行号 + 原始列 + 失败原因），任务运行中下载的是截至当前的失败行",
+)
+def download_failed_rows(job_id: str, current_user: dict = Depends(get_current_user)):
+    _get_visible_job(job_id, current_user)
+    path = import_jobs.failed_rows_path(job_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="该任务没有失败行或文件已过期")
+    return FileResponse(path, media_type="text/csv", filename=f"{job_id}_failed_rows.csv")
@@ -6,10 +6,33 @@ import json
 import pymysql
 
 from app.database import get_db
+from app.async_database import get_async_db
+from app.core import count_cache, identity_cache
+from app.core.dependencies import get_current_user
+from app.core.pagination import (
+    count_total_async,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    keyset_params,
+    resolve_include_total,
+    split_page,
+    total_fields,
+)
 from app.schemas.notification import NotificationQueryResponse, NotificationItem, NotificationUpdate
 
 router = APIRouter()
 
+# 发送者 = sender_id + 推送时记录的 sender_role：学生/教师/管理员的自增ID来自不同的表，会互相重叠
+# 旧消息的 sender_role 是客户端传入的角色名，由 database_setup.sync_schema 规范化为 admin/teacher
+_SENDER_SQL = (
+    "SELECT sender_id, JSON_UNQUOTE(metadata->'$.sender_role') FROM user_messages WHERE id = %s"
+)
+
+
+def _is_sender(row: tuple, current_user: dict) -> bool:
+    return row[0] == str(current_user["sub"]) and row[1] == current_user["user_type"]
+
 
 class NotificationContent(BaseModel):
     title: str
@@ -25,7 +48,7 @@ def push_notification(
     payload: NotificationContent,
     student_ids: str | None = Query(None, description="学生ID列表（学生学号），逗号分隔，例如: 1,2,3，管理员和教师都可以使用"),
     teacher_ids: str | None = Query(None, description="教师ID列表（教师工号），逗号分隔，例如: 1001,1002，仅管理员可用"),
-    current_user: str = Query(..., description="当前用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"admin\"],\"username\":\"admin1\"}"),
+    current_user: dict = Depends(get_current_user),
     db: pymysql.connections.Connection = Depends(get_db),
 ):
     cursor = None
@@ -38,33 +61,13 @@ def push_notification(
         if not payload.content:
             raise HTTPException(status_code=400, detail="消息内容（content）不能为空")
         
-        # 2. 解析 current_user 获取发送者信息
-        try:
-            import urllib.parse
-            current_user = urllib.parse.unquote(current_user)
-            current_user_data = json.loads(current_user)
-            sender_id = str(current_user_data.get("sub"))
-            sender_roles = current_user_data.get("roles", [])
-            if not sender_roles:
-                raise HTTPException(status_code=403, detail="无效的用户角色")
-            sender_role = sender_roles[0] if sender_roles else "user"
-        except Exception:
-            raise HTTPException(status_code=403, detail="无效的用户信息格式")
-        
-        # 3. 验证发送者身份是否存在
-        cursor = db.cursor()
-        if "admin" in sender_roles:
-            # 验证管理员是否存在
-            cursor.execute("SELECT id FROM admins WHERE id = %s", (sender_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=403, detail="管理员身份不存在")
-        elif "teacher" in sender_roles:
-            # 验证教师是否存在
-            cursor.execute("SELECT id FROM teachers WHERE id = %s", (sender_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=403, detail="教师身份不存在")
-        else:
+        # 2. 发送者信息（身份已由 get_current_user 校验）
+        sender_id = str(current_user["sub"])
+        sender_roles = current_user["roles"]
+        sender_role = current_user["user_type"]
+        if sender_role not in ("admin", "teacher"):
             raise HTTPException(status_code=403, detail="无权执行此操作")
+        cursor = db.cursor()
         
         now = datetime.now()
         now_str = now.strftime("%Y-%m-%d %H:%M:%S")
@@ -141,6 +144,7 @@ def push_notification(
             inserted_ids.append(cursor.lastrowid)
         
         db.commit()
+        count_cache.invalidate("user_messages")
         
         # 9. 返回推送结果
         # 构建返回的消息列表
@@ -177,53 +181,47 @@ def push_notification(
     "/query",
     response_model=NotificationQueryResponse,
     summary="查看已推送消息",
-    description="查看自己发送的消息，支持三种查询方式：1.按目标id查找 2.管理员查找 3.教师查找（三选一）"
+    description="查看自己发送的消息，支持三种查询方式：1.按目标id查找 2.管理员查找 3.教师查找（三选一）；传 cursor 时按游标分页"
 )
-def query_notifications(
+async def query_notifications(
     target_id: Optional[str] = Query(None, description="目标对象的ID（学生学号或教师工号）"),
     admin_id: Optional[str] = Query(None, description="管理员ID（自增id，仅管理员可用）"),
     teacher_id: Optional[str] = Query(None, description="教师工号（仅教师可用）"),
     status: Optional[str] = Query(None, description="按状态筛选：unread, read, retracted"),
     page: int = 1,
     page_size: int = 20,
-    current_user: str = Query(..., description="当前用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"teacher\"],\"username\":\"teacher1\"}"),
-    db: pymysql.connections.Connection = Depends(get_db),
+    page_cursor: Optional[str] = Query(None, alias="cursor", description="上一页返回的 next_cursor，传入时按游标分页"),
+    include_total: Optional[str] = Query(None, description="总数获取方式：exact（精确）/ approx（允许缓存旧值或估算）/ false（不统计），默认偏移分页 exact、游标分页 false"),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_async_db),
 ):
     # 1. 权限校验
-    try:
-        import urllib.parse
-        current_user = urllib.parse.unquote(current_user)
-        current_user_data = json.loads(current_user)
-        user_roles = current_user_data.get("roles", [])
-        user_sub = str(current_user_data.get("sub"))
-        
-        # 检查是否提供了有效的查询参数（三选一）
-        query_params = [target_id, admin_id, teacher_id]
-        if sum(1 for p in query_params if p) != 1:
-            raise HTTPException(status_code=400, detail="必须提供且仅提供一个查询参数：target_id、admin_id或teacher_id")
-            
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=403, detail="无效的用户信息格式")
-    except HTTPException:
-        raise
+    user_roles = current_user["roles"]
+    user_sub = str(current_user["sub"])
+
+    # 检查是否提供了有效的查询参数（三选一）
+    query_params = [target_id, admin_id, teacher_id]
+    if sum(1 for p in query_params if p) != 1:
+        raise HTTPException(status_code=400, detail="必须提供且仅提供一个查询参数：target_id、admin_id或teacher_id")
     
     # 2. 分页参数校验
     if page < 1:
         page = 1
     if page_size < 1 or page_size > 100:
         page_size = 20
+    keyset = decode_cursor(page_cursor) if page_cursor else None
+    include_total = resolve_include_total(include_total, keyset is not None)
     
     cursor = None
     try:
-        cursor = db.cursor()
+        cursor = await db.cursor()
         # 3. 构建查询条件
         base_where = "1=1" 
         params = []
         
-        # 基础条件：只能查看自己发送的消息
-        # 使用更宽松的匹配方式，确保能找到消息
-        base_where += " AND (metadata LIKE %s OR metadata IS NULL OR metadata = '{}')"
-        params.append(f'%sender_id%{user_sub}%')
+        # 基础条件：只能查看自己发送的消息（sender_id 为 metadata 生成列，走索引），同时匹配发送者类型（见 _SENDER_SQL）
+        base_where += " AND sender_id = %s AND JSON_UNQUOTE(metadata->'$.sender_role') = %s"
+        params.extend([user_sub, current_user["user_type"]])
         
         # 处理查询参数
         if target_id:
@@ -239,12 +237,11 @@ def query_notifications(
                 raise HTTPException(status_code=403, detail="只有管理员可以使用admin_id参数")
             
             # 检查输入的admin_id是否与自身currentuser中的admins.id相符
-            cursor.execute("SELECT id FROM admins WHERE id = %s", (admin_id,))
-            admin_row = cursor.fetchone()
-            if not admin_row:
+            admin_identity = await identity_cache.lookup_async(cursor, "admin", admin_id)
+            if not admin_identity:
                 raise HTTPException(status_code=404, detail="管理员ID不存在")
             
-            if str(admin_row[0]) != user_sub:
+            if str(admin_identity["id"]) != user_sub:
                 raise HTTPException(status_code=403, detail="输入的管理员ID与当前用户不符")
         
         elif teacher_id:
@@ -253,37 +250,48 @@ def query_notifications(
                 raise HTTPException(status_code=403, detail="只有教师可以使用teacher_id参数")
             
             # 检查输入的teacher_id是否与自身currentuser中的teacher_id相符
-            cursor.execute("SELECT id, teacher_id FROM teachers WHERE teacher_id = %s", (teacher_id,))
-            teacher_row = cursor.fetchone()
-            if not teacher_row:
-                raise HTTPException(status_code=404, detail="教师工号不存在")
-            
-            # 获取教师的自增ID
-            teacher_internal_id = str(teacher_row[0])
-            if teacher_internal_id != user_sub:
-                raise HTTPException(status_code=403, detail="输入的教师工号与当前用户不符")
+            # 当前用户的工号一致即可放行；不一致时再按工号查库区分 404/403
+            if current_user["user_type"] != "teacher" or current_user["username"] != teacher_id:
+                await cursor.execute("SELECT id, teacher_id FROM teachers WHERE teacher_id = %s", (teacher_id,))
+                teacher_row = await cursor.fetchone()
+                if not teacher_row:
+                    raise HTTPException(status_code=404, detail="教师工号不存在")
+                
+                # 获取教师的自增ID
+                teacher_internal_id = str(teacher_row[0])
+                if teacher_internal_id != user_sub:
+                    raise HTTPException(status_code=403, detail="输入的教师工号与当前用户不符")
         
         # 按状态筛选
         if status:
             base_where += " AND status = %s"
             params.append(status)
         
-        # 4. 查询总记录数
+        # 4. 查询总记录数（按 include_total 决定精确统计、缓存/估算或跳过）
         count_sql = f"SELECT COUNT(*) FROM user_messages WHERE {base_where}"
-        cursor.execute(count_sql, params)
-        total = cursor.fetchone()[0]
+        total, estimated = await count_total_async(cursor, count_sql, params, ("user_messages",), include_total)
         
-        # 5. 分页查询数据
-        offset = (page - 1) * page_size
+        # 5. 分页查询数据：游标分页从上一页最后一行继续，偏移分页保持兼容；多取一行判断是否有下一页
+        if keyset:
+            select_where = f"{base_where} AND {keyset_condition('received_time', 'id')}"
+            page_params = params + keyset_params(keyset) + [page_size + 1]
+            limit_sql = "LIMIT %s"
+        else:
+            select_where = base_where
+            page_params = params + [page_size + 1, (page - 1) * page_size]
+            limit_sql = "LIMIT %s OFFSET %s"
         select_sql = f"""
         SELECT id, user_id, username, title, content, source, status, received_time, metadata 
         FROM user_messages 
-        WHERE {base_where} 
-        ORDER BY received_time DESC 
-        LIMIT %s OFFSET %s
+        WHERE {select_where} 
+        ORDER BY received_time DESC, id DESC 
+        {limit_sql}
         """
-        cursor.execute(select_sql, params + [page_size, offset])
-        rows = cursor.fetchall()
+        await cursor.execute(select_sql, page_params)
+        rows, has_more = split_page(await cursor.fetchall(), page_size)
+        next_cursor = None
+        if has_more and rows and rows[-1][7]:
+            next_cursor = encode_cursor(rows[-1][7], rows[-1][0])
         
         # 6. 组装返回数据
         items = []
@@ -308,13 +316,13 @@ def query_notifications(
             )
         
         # 7. 计算总页数
-        total_pages = (total + page_size - 1) // page_size
         return NotificationQueryResponse(
             items=items,
-            page=page,
+            page=None if keyset else page,
             page_size=page_size,
-            total=total,
-            total_pages=total_pages,
+            **total_fields(total, estimated, page_size),
+            has_more=has_more,
+            next_cursor=next_cursor,
         )
     except HTTPException:
         raise
@@ -322,7 +330,7 @@ def query_notifications(
         raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
     finally:
         if cursor:
-            cursor.close()
+            await cursor.close()
 
 
 @router.put(
@@ -334,7 +342,7 @@ def update_notification(
     notification_id: int,
     payload: NotificationUpdate,
     db: pymysql.connections.Connection = Depends(get_db),
-    # 可接入真实用户：current_user=Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
 ):
     cursor = None
     try:
@@ -346,10 +354,13 @@ def update_notification(
         now = datetime.now()
         now_str = now.strftime("%Y-%m-%d %H:%M:%S")
         
-        # 2. 检查通知是否存在
-        cursor.execute("SELECT id FROM user_messages WHERE id = %s", (notification_id,))
-        if not cursor.fetchone():
+        # 2. 检查通知是否存在，且只有发送者本人或管理员可以修改
+        cursor.execute(_SENDER_SQL, (notification_id,))
+        row = cursor.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="通知不存在")
+        if not _is_sender(row, current_user) and "admin" not in current_user["roles"]:
+            raise HTTPException(status_code=403, detail="只能修改自己发送的通知")
         
         # 3. 准备更新字段
         updates = []
@@ -423,7 +434,7 @@ def update_notification(
 def retract_notification(
     notification_id: int,
     db: pymysql.connections.Connection = Depends(get_db),
-    # 可接入真实用户：current_user=Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
 ):
     cursor = None
     try:
@@ -431,10 +442,13 @@ def retract_notification(
         now = datetime.now()
         now_str = now.strftime("%Y-%m-%d %H:%M:%S")
         
-        # 1. 检查通知是否存在
-        cursor.execute("SELECT id FROM user_messages WHERE id = %s", (notification_id,))
-        if not cursor.fetchone():
+        # 1. 检查通知是否存在，且只有发送者本人或管理员可以撤回
+        cursor.execute(_SENDER_SQL, (notification_id,))
+        row = cursor.fetchone()
+        if not row:
             raise HTTPException(status_code=404, detail="通知不存在")
+        if not _is_sender(row, current_user) and "admin" not in current_user["roles"]:
+            raise HTTPException(status_code=403, detail="只能撤回自己发送的通知")
         
         # 2. 执行撤回操作（将状态改为已撤回）
         update_sql = """
@@ -448,6 +462,7 @@ def retract_notification(
             raise HTTPException(status_code=404, detail="通知撤回失败")
         
         db.commit()
+        count_cache.invalidate("user_messages")
         
         # 3. 返回撤回结果
         return {
@@ -470,69 +485,64 @@ def retract_notification(
 @router.get(
     "/received",
     summary="查看收到的消息",
-    description="学生和教师查看发给自己的消息，返回消息的标题、内容、操作时间和发送者姓名"
+    description="学生和教师查看发给自己的消息，返回消息的标题、内容、操作时间和发送者姓名；传 cursor 时按游标分页"
 )
-def get_received_notifications(
+async def get_received_notifications(
     student_id: Optional[str] = Query(None, description="学生学号（仅学生可用）"),
     teacher_id: Optional[str] = Query(None, description="教师工号（仅教师可用）"),
     status: Optional[str] = Query(None, description="按状态筛选：unread, read, retracted"),
     page: int = 1,
     page_size: int = 20,
-    current_user: str = Query(..., description="当前用户信息(JSON字符串)，示例: {\"sub\":1,\"roles\":[\"student\"],\"username\":\"student1\"}"),
-    db: pymysql.connections.Connection = Depends(get_db),
+    page_cursor: Optional[str] = Query(None, alias="cursor", description="上一页返回的 next_cursor，传入时按游标分页"),
+    include_total: Optional[str] = Query(None, description="总数获取方式：exact（精确）/ approx（允许缓存旧值或估算）/ false（不统计），默认偏移分页 exact、游标分页 false"),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_async_db),
 ):
     # 1. 权限校验
-    try:
-        import urllib.parse
-        current_user = urllib.parse.unquote(current_user)
-        current_user_data = json.loads(current_user)
-        user_roles = current_user_data.get("roles", [])
-        user_sub = str(current_user_data.get("sub"))
-        
-        # 检查是否提供了有效的查询参数（二选一）
-        query_params = [student_id, teacher_id]
-        if sum(1 for p in query_params if p) != 1:
-            raise HTTPException(status_code=400, detail="必须提供且仅提供一个查询参数：student_id或teacher_id")
-        
-        # 验证权限
-        if student_id:
-            if "student" not in user_roles:
-                raise HTTPException(status_code=403, detail="只有学生可以使用student_id参数")
-            # 验证学生ID与当前用户是否匹配
-            cursor = db.cursor()
-            cursor.execute("SELECT id FROM students WHERE student_id = %s", (student_id,))
-            student_row = cursor.fetchone()
+    user_roles = current_user["roles"]
+    user_sub = str(current_user["sub"])
+
+    # 检查是否提供了有效的查询参数（二选一）
+    query_params = [student_id, teacher_id]
+    if sum(1 for p in query_params if p) != 1:
+        raise HTTPException(status_code=400, detail="必须提供且仅提供一个查询参数：student_id或teacher_id")
+
+    # 验证权限：学号/工号与当前用户一致时免查库，不一致时再查库区分 404/403
+    if student_id:
+        if "student" not in user_roles:
+            raise HTTPException(status_code=403, detail="只有学生可以使用student_id参数")
+        if current_user["user_type"] != "student" or current_user["username"] != student_id:
+            async with db.cursor() as check_cursor:
+                await check_cursor.execute("SELECT id FROM students WHERE student_id = %s", (student_id,))
+                student_row = await check_cursor.fetchone()
             if not student_row:
                 raise HTTPException(status_code=404, detail="学生学号不存在")
             if str(student_row[0]) != user_sub:
                 raise HTTPException(status_code=403, detail="输入的学生学号与当前用户不符")
-        
-        if teacher_id:
-            if "teacher" not in user_roles:
-                raise HTTPException(status_code=403, detail="只有教师可以使用teacher_id参数")
-            # 验证教师ID与当前用户是否匹配
-            cursor = db.cursor()
-            cursor.execute("SELECT id FROM teachers WHERE teacher_id = %s", (teacher_id,))
-            teacher_row = cursor.fetchone()
+
+    if teacher_id:
+        if "teacher" not in user_roles:
+            raise HTTPException(status_code=403, detail="只有教师可以使用teacher_id参数")
+        if current_user["user_type"] != "teacher" or current_user["username"] != teacher_id:
+            async with db.cursor() as check_cursor:
+                await check_cursor.execute("SELECT id FROM teachers WHERE teacher_id = %s", (teacher_id,))
+                teacher_row = await check_cursor.fetchone()
             if not teacher_row:
                 raise HTTPException(status_code=404, detail="教师工号不存在")
             if str(teacher_row[0]) != user_sub:
                 raise HTTPException(status_code=403, detail="输入的教师工号与当前用户不符")
-            
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=403, detail="无效的用户信息格式")
-    except HTTPException:
-        raise
     
     # 2. 分页参数校验
     if page < 1:
         page = 1
     if page_size < 1 or page_size > 100:
         page_size = 20
+    keyset = decode_cursor(page_cursor) if page_cursor else None
+    include_total = resolve_include_total(include_total, keyset is not None)
     
     cursor = None
     try:
-        cursor = db.cursor()
+        cursor = await db.cursor()
         # 3. 构建查询条件
         base_where = "1=1" 
         params = []
@@ -550,22 +560,31 @@ def get_received_notifications(
             base_where += " AND status = %s"
             params.append(status)
         
-        # 4. 查询总记录数
+        # 4. 查询总记录数（按 include_total 决定精确统计、缓存/估算或跳过）
         count_sql = f"SELECT COUNT(*) FROM user_messages WHERE {base_where}"
-        cursor.execute(count_sql, params)
-        total = cursor.fetchone()[0]
+        total, estimated = await count_total_async(cursor, count_sql, params, ("user_messages",), include_total)
         
-        # 5. 分页查询数据
-        offset = (page - 1) * page_size
+        # 5. 分页查询数据：游标分页从上一页最后一行继续，偏移分页保持兼容；多取一行判断是否有下一页
+        if keyset:
+            select_where = f"{base_where} AND {keyset_condition('received_time', 'id')}"
+            page_params = params + keyset_params(keyset) + [page_size + 1]
+            limit_sql = "LIMIT %s"
+        else:
+            select_where = base_where
+            page_params = params + [page_size + 1, (page - 1) * page_size]
+            limit_sql = "LIMIT %s OFFSET %s"
         select_sql = f"""
         SELECT id, user_id, username, title, content, source, status, received_time, metadata 
         FROM user_messages 
-        WHERE {base_where} 
-        ORDER BY received_time DESC 
-        LIMIT %s OFFSET %s
+        WHERE {select_where} 
+        ORDER BY received_time DESC, id DESC 
+        {limit_sql}
         """
-        cursor.execute(select_sql, params + [page_size, offset])
-        rows = cursor.fetchall()
+        await cursor.execute(select_sql, page_params)
+        rows, has_more = split_page(await cursor.fetchall(), page_size)
+        next_cursor = None
+        if has_more and rows and rows[-1][7]:
+            next_cursor = encode_cursor(rows[-1][7], rows[-1][0])
         
         # 6. 组装返回数据
         items = []
@@ -578,21 +597,12 @@ def get_received_notifications(
             sender_id = metadata.get("sender_id")
             sender_role = metadata.get("sender_role")
             
-            # 获取发送者姓名
+            # 获取发送者姓名（管理员/教师，走身份缓存）
             sender_name = ""
-            if sender_id and sender_role:
-                if sender_role == "admin":
-                    # 查询管理员姓名
-                    cursor.execute("SELECT name FROM admins WHERE id = %s", (sender_id,))
-                    admin_row = cursor.fetchone()
-                    if admin_row:
-                        sender_name = admin_row[0]
-                elif sender_role == "teacher":
-                    # 查询教师姓名
-                    cursor.execute("SELECT name FROM teachers WHERE id = %s", (sender_id,))
-                    teacher_row = cursor.fetchone()
-                    if teacher_row:
-                        sender_name = teacher_row[0]
+            if sender_id and sender_role in ("admin", "teacher"):
+                identity = await identity_cache.lookup_async(cursor, sender_role, sender_id)
+                if identity:
+                    sender_name = identity["name"]
             
             items.append({
                 "title": row[3],
@@ -602,13 +612,13 @@ def get_received_notifications(
             })
         
         # 7. 计算总页数
-        total_pages = (total + page_size - 1) // page_size
         return {
             "items": items,
-            "page": page,
+            "page": None if keyset else page,
             "page_size": page_size,
-            "total": total,
-            "total_pages": total_pages
+            **total_fields(total, estimated, page_size),
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
     except HTTPException:
         raise
@@ -616,4 +626,4 @@ def get_received_notifications(
         raise HTTPException(status_code=500, detail=f"查询失败：{str(e)}")
     finally:
         if cursor:
-            cursor.close()
+            await cursor.close()
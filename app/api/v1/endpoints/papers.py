@@ -15,9 +15,16 @@ from app.schemas.document import (
     VersionOut,
     DDLOut, 
 )
-from app.services.oss import get_file_from_oss, upload_paper_to_storage
+from app.services.oss import blob_key, get_file_from_oss, resolve_path
+from app.services.uploads import save_upload
 from datetime import datetime
 from app.database import get_db
+from app.async_database import DictCursor, get_async_db
+from app.core import count_cache
+from app.core.dependencies import get_current_user
+from app.core.executor import offload, run_blocking
+from app.services import blob_store, group_stats, paper_acl
+from app.services.ai_adapter import invalidate_paper_reports
 import pymysql
 import json
 
@@ -29,30 +36,6 @@ except ImportError:
 router = APIRouter()
 
 
-def _parse_current_user(current_user: Optional[str]) -> dict:
-    try:
-        if not current_user:
-            return {"sub": 0, "username": "", "roles": []}
-        import urllib.parse
-        raw = urllib.parse.unquote(current_user)
-        if not raw.strip():
-            return {"sub": 0, "username": "", "roles": []}
-        if raw.isdigit():
-            return {"sub": int(raw), "username": f"user{raw}", "roles": ["student"]}
-        data = json.loads(raw)
-        if isinstance(data, dict):
-            sub_value = data.get("sub", 0)
-            if isinstance(sub_value, str) and sub_value.isdigit():
-                data["sub"] = int(sub_value)
-            elif isinstance(sub_value, int):
-                data["sub"] = sub_value
-            else:
-                data["sub"] = 0
-            return data
-    except Exception:
-        pass
-    return {"sub": 0, "username": "", "roles": []}
-
 def _parse_version(version_str: str) -> tuple:
     try:
         version_clean = version_str.strip().lower().lstrip('v')
@@ -81,13 +64,19 @@ def _find_soffice_binary() -> Optional[str]:
             return path
     return None
 
-def convert_docx_to_pdf(docx_content: bytes, filename: str) -> tuple:
-    pdf_filename = os.path.splitext(filename)[0] + '.pdf'
+def convert_docx_to_pdf(oss_key: str, filename: str) -> str:
+    """把已存储的 docx 转为 PDF 存入 blob，返回 PDF 的 oss_key；相同内容的 docx 复用已转换的 PDF"""
+    pdf_filename = os.path.splitext(os.path.basename(filename))[0] + '.pdf'
+    source_sha = blob_store.content_hash(oss_key)
     try:
+        if source_sha:
+            cached_sha = blob_store.get_derivative(source_sha, "pdf")
+            if cached_sha:
+                return blob_key(cached_sha, pdf_filename)
         with tempfile.TemporaryDirectory() as tmpdir:
+            # 转换工具按输入文件名生成 PDF，复制一份原文件名的副本作为输入
             docx_path = os.path.join(tmpdir, os.path.basename(filename) or "input.docx")
-            with open(docx_path, "wb") as temp_docx:
-                temp_docx.write(docx_content)
+            shutil.copyfile(resolve_path(oss_key), docx_path)
 
             if sys.platform.startswith("linux"):
                 soffice_bin = _find_soffice_binary()
@@ -128,10 +117,10 @@ def convert_docx_to_pdf(docx_content: bytes, filename: str) -> tuple:
                     detail="DOCX转PDF失败：未生成PDF文件，请检查转换工具安装情况"
                 )
 
-            with open(pdf_path, 'rb') as f:
-                pdf_content = f.read()
-
-        return pdf_content, pdf_filename
+            pdf = blob_store.put_file(pdf_path, pdf_filename)
+        if source_sha:
+            blob_store.put_derivative(source_sha, "pdf", pdf)
+        return pdf.path
     except HTTPException:
         raise
     except Exception as e:
@@ -152,10 +141,9 @@ async def upload_paper(
     owner_id: int = Query(..., description="论文归属者ID，必须传入且为有效整数"),
     teacher_id: int = Query(..., description="关联的老师ID，必须传入且为有效正整数"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    submitter_id = current_user.get("sub", 0)  
+    submitter_id = current_user["sub"]
     # 参数校验
     if not isinstance(owner_id, int) or owner_id <= 0:
         raise HTTPException(status_code=400, detail="owner_id必须是正整数")
@@ -169,19 +157,32 @@ async def upload_paper(
     # 验证文件扩展名
     if not file.filename.lower().endswith(".docx"):
         raise HTTPException(status_code=400, detail="仅支持 .docx 格式")
-    contents = await file.read()
-    size = len(contents)
-    if size > 100 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="文件大小超过 100MB")
+    # 流式存入 blob 存储（返回 blob:// 存储键作为 oss_key）
+    stored = await save_upload(file, empty_detail=None)
+    oss_key, size = stored.path, stored.size
+
+    # 转换docx到pdf并存入 blob 存储
+    pdf_oss_key = await run_blocking("convert", convert_docx_to_pdf, oss_key, file.filename)
+
+    version = "v1.0"
+    paper_id = await run_blocking(
+        "db", _insert_uploaded_paper, db, current_user, owner_id, teacher_id, version, size, oss_key, pdf_oss_key
+    )
+    return PaperOut(id=paper_id, owner_id=owner_id, teacher_id=teacher_id, latest_version=version, oss_key=oss_key, pdf_oss_key=pdf_oss_key)
 
-    # 本地存储论文到 doc/essay（返回路径作为 oss_key）
-    oss_key = upload_paper_to_storage(file.filename, contents)
-    
-    # 转换docx到pdf并上传到OSS
-    pdf_content, pdf_filename = convert_docx_to_pdf(contents, file.filename)
-    pdf_oss_key = upload_paper_to_storage(pdf_filename, pdf_content)
 
-    # 持久化到数据库：创建paper记录和初始版本v1.0
+def _insert_uploaded_paper(
+    db: pymysql.connections.Connection,
+    current_user: dict,
+    owner_id: int,
+    teacher_id: int,
+    version: str,
+    size: int,
+    oss_key: str,
+    pdf_oss_key: str,
+) -> int:
+    """持久化到数据库：创建paper记录和初始版本，返回论文ID"""
+    submitter_id = current_user["sub"]
     cursor = None 
     try:
         cursor = db.cursor()
@@ -189,7 +190,6 @@ async def upload_paper(
         roles = current_user.get("roles") or []
         submitter_role = ",".join([str(r) for r in roles]) if isinstance(roles, list) else str(roles)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        version = "v1.0"
         paper_sql = """
         INSERT INTO papers (
             owner_id, teacher_id, version, size, status, ddl, oss_key, pdf_oss_key,
@@ -242,7 +242,10 @@ async def upload_paper(
                 now
             )
         )
+        # 论文记录与首个历史版本各引用一次
+        blob_store.add_refs(cursor, [oss_key, pdf_oss_key] * 2)
         db.commit()
+        return paper_id
     except pymysql.MySQLError as e:
         db.rollback() 
         raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
@@ -250,8 +253,6 @@ async def upload_paper(
         if cursor: 
             cursor.close()
 
-    return PaperOut(id=paper_id, owner_id=owner_id, teacher_id=teacher_id, latest_version=version, oss_key=oss_key, pdf_oss_key=pdf_oss_key)
-
 
 @router.put(
     "/{paper_id}",
@@ -264,20 +265,34 @@ async def update_paper(
     file: UploadFile = File(...),
     version: str = Query(..., description="新版本号（必填，格式如v2.0，必须大于当前最新版本）"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    submitter_id = current_user.get("sub", 0)
+    submitter_id = current_user["sub"]
     # 文件校验
     if not file.filename.lower().endswith(".docx"):
         raise HTTPException(status_code=400, detail="仅支持 .docx 格式")
-    contents = await file.read()
-    size = len(contents)
-    if size == 0:
-        raise HTTPException(status_code=400, detail="文件为空")
-    if size > 100 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="文件大小超过 100MB")
+    paper_owner_id, teacher_id = await run_blocking(
+        "db", _check_paper_update, db, paper_id, submitter_id, version
+    )
+
+    # 上传文件
+    stored = await save_upload(file, empty_detail="文件为空")
+    oss_key, size = stored.path, stored.size
+    pdf_oss_key = await run_blocking("convert", convert_docx_to_pdf, oss_key, file.filename)
+
+    await run_blocking(
+        "db", _save_paper_update, db, current_user, paper_id, version, size, oss_key, pdf_oss_key
+    )
+    return PaperOut(id=paper_id, owner_id=paper_owner_id, teacher_id=teacher_id, latest_version=version, oss_key=oss_key)
+
 
+def _check_paper_update(
+    db: pymysql.connections.Connection,
+    paper_id: int,
+    submitter_id: int,
+    version: str,
+) -> tuple:
+    """校验论文存在、归属者权限与版本号，返回 (owner_id, teacher_id)"""
     cursor = None
     try:
         cursor = db.cursor()
@@ -298,18 +313,40 @@ async def update_paper(
                 status_code=400,
                 detail=f"新版本号必须大于当前最新版本号 {current_version_str}，当前提交的版本号 {version} 不符合要求"
             )
-        
-        # 上传文件
-        oss_key = upload_paper_to_storage(file.filename, contents)
-        pdf_content, pdf_filename = convert_docx_to_pdf(contents, file.filename)
-        pdf_oss_key = upload_paper_to_storage(pdf_filename, pdf_content)
+        return paper_owner_id, teacher_id
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
 
+
+def _save_paper_update(
+    db: pymysql.connections.Connection,
+    current_user: dict,
+    paper_id: int,
+    version: str,
+    size: int,
+    oss_key: str,
+    pdf_oss_key: str,
+) -> None:
+    """更新论文最新版本并写入历史版本"""
+    submitter_id = current_user["sub"]
+    cursor = None
+    try:
+        cursor = db.cursor()
         # 数据库更新
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         submitter_name = current_user.get("username") or ""
         roles = current_user.get("roles") or []
         submitter_role = ",".join([str(r) for r in roles]) if isinstance(roles, list) else str(roles)
 
+        # 记录原状态与原文件，用于同步群组统计与 blob 引用数；加行锁，并发更新不会重复释放同一个旧文件
+        cursor.execute(
+            "SELECT owner_id, status, oss_key, pdf_oss_key FROM papers WHERE id = %s FOR UPDATE", (paper_id,)
+        )
+        previous = cursor.fetchone()
+
         cursor.execute(
             """
             UPDATE papers
@@ -366,8 +403,12 @@ async def update_paper(
                 now
             )
         )
+        if previous:
+            group_stats.apply_paper_status_change(cursor, previous[0], previous[1], "已更新")
+            blob_store.release_refs(cursor, previous[2:])
+        blob_store.add_refs(cursor, [oss_key, pdf_oss_key] * 2)
         db.commit()
-        return PaperOut(id=paper_id, owner_id=paper_owner_id, teacher_id=teacher_id, latest_version=version, oss_key=oss_key)
+        paper_acl.invalidate(paper_id)
     except pymysql.MySQLError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
@@ -384,23 +425,20 @@ async def update_paper(
 def delete_paper(
     paper_id: int,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    current_id = current_user.get("sub", 0) 
+    current_id = current_user["sub"]
     current_roles = current_user.get("roles", []) 
-    if current_id == 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
 
     cursor = None
     try:
         cursor = db.cursor()
-        # 查询论文信息
-        cursor.execute("SELECT owner_id, teacher_id FROM papers WHERE id = %s", (paper_id,))
+        # 查询论文信息（加行锁：并发删除时后到的请求读到 404，不会重复释放文件引用）
+        cursor.execute("SELECT owner_id, teacher_id, status FROM papers WHERE id = %s FOR UPDATE", (paper_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="论文不存在")
-        paper_owner_id, teacher_id = row
+        paper_owner_id, teacher_id, paper_status = row
         # 权限校验
         is_owner = (paper_owner_id == current_id)
         is_admin = ("admin" in current_roles) or ("管理员" in current_roles)
@@ -409,9 +447,21 @@ def delete_paper(
                 status_code=403,
                 detail=f"无权限删除该论文：仅论文归属者（ID={paper_owner_id}）或管理员可删除，当前登录用户ID={current_id}，角色={current_roles}"
             )
-        # 删除论文
+        # 删除论文（历史版本随外键级联删除），释放论文与各历史版本对文件的引用
+        cursor.execute(
+            """
+            SELECT oss_key, pdf_oss_key FROM papers WHERE id = %s
+            UNION ALL
+            SELECT oss_key, pdf_oss_key FROM papers_history WHERE paper_id = %s
+            """,
+            (paper_id, paper_id),
+        )
+        blob_store.release_refs(cursor, [key for row in cursor.fetchall() for key in row])
         cursor.execute("DELETE FROM papers WHERE id = %s", (paper_id,))
+        group_stats.apply_paper_status_change(cursor, paper_owner_id, paper_status, None)
         db.commit()
+        paper_acl.invalidate(paper_id)
+        invalidate_paper_reports(paper_id)
         delete_type = "归属者" if is_owner else "管理员"
         return {
             "message": f"论文及其所有版本信息删除成功（{delete_type}权限）",
@@ -444,30 +494,23 @@ def create_paper_status(
         include_in_schema=False
     ),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     """Insert a status row for a paper if it does not exist."""
-    current_user = _parse_current_user(current_user)
-    login_user_id = int(current_user.get("sub", 0))
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
     status = "待审阅"
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute("SELECT owner_id, teacher_id, version, oss_key, pdf_oss_key, size FROM papers WHERE id = %s", (paper_id,))
-        paper_info = cursor.fetchone()
-        if not paper_info:
-            raise HTTPException(status_code=404, detail="论文不存在")
-        student_id, teacher_id, version, oss_key, pdf_oss_key, current_size = paper_info 
+        # 加行锁读取原状态：并发的状态变更串行执行，群组统计按真实的原状态增减
         cursor.execute(
-            "SELECT status, size FROM papers WHERE id = %s",
+            "SELECT owner_id, teacher_id, version, oss_key, pdf_oss_key, size, status FROM papers WHERE id = %s FOR UPDATE",
             (paper_id,),
         )
-        current_status_row = cursor.fetchone()
-        if not current_status_row:
+        paper_info = cursor.fetchone()
+        if not paper_info:
             raise HTTPException(status_code=404, detail="论文不存在")
-        current_status, current_size = current_status_row
+        student_id, teacher_id, version, oss_key, pdf_oss_key, current_size, current_status = paper_info
         if current_status != "已上传":
             raise HTTPException(status_code=400, detail=f"当前论文状态为【{current_status}】，仅状态为【已上传】时可创建待审阅状态")
         is_student = (login_user_id == student_id)
@@ -525,6 +568,8 @@ def create_paper_status(
                 now_str
             )
         )
+        group_stats.apply_paper_status_change(cursor, student_id, current_status, status)
+        blob_store.add_refs(cursor, [oss_key, pdf_oss_key])
         db.commit()
         return PaperStatusOut(
             paper_id=paper_id,
@@ -557,36 +602,23 @@ def update_paper_status(
         enum=["待审阅", "已审阅", "已更新", "待更新", "已定稿"]  
     ),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     """Update status for the latest version of an existing paper."""
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
 
     cursor = None
     try:
         cursor = db.cursor()
+        # 加行锁读取原状态：并发的状态变更串行执行，群组统计按真实的原状态增减
         cursor.execute(
-            "SELECT owner_id, teacher_id, version, oss_key, pdf_oss_key, size FROM papers WHERE id = %s", 
+            "SELECT owner_id, teacher_id, version, oss_key, pdf_oss_key, size, status FROM papers WHERE id = %s FOR UPDATE",
             (paper_id,)
         )
         paper_info = cursor.fetchone()
         if not paper_info:
             raise HTTPException(status_code=404, detail="论文不存在")
-        student_id, teacher_id, version, oss_key, pdf_oss_key, original_size = paper_info 
-        cursor.execute(
-            """
-            SELECT size, status FROM papers
-            WHERE id = %s
-            """,
-            (paper_id,),
-        )
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="论文不存在")
-        original_size, current_status = row
+        student_id, teacher_id, version, oss_key, pdf_oss_key, original_size, current_status = paper_info
         if not current_status:
             raise HTTPException(status_code=404, detail="该论文无有效状态记录，请先创建状态")
         
@@ -681,6 +713,8 @@ def update_paper_status(
                 now_str
             )
         )
+        group_stats.apply_paper_status_change(cursor, student_id, current_status, status)
+        blob_store.add_refs(cursor, [oss_key, pdf_oss_key])
         db.commit()
         return PaperStatusOut(
             paper_id=paper_id,
@@ -709,33 +743,22 @@ def submit_paper_review(
     paper_id: int,
     review_content: str = Body(..., description="审阅内容，非空字符串", min_length=1),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if not ("teacher" in login_user_roles or "教师" in login_user_roles):
         raise HTTPException(status_code=403, detail="无权限提交审阅：仅教师角色可操作")
     
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            "SELECT id, teacher_id FROM papers WHERE id = %s",
-            (paper_id,)
+        paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.TEACHER,),
+            not_found_detail=f"论文ID {paper_id} 不存在",
+            forbidden_detail=f"无权限提交审阅：论文ID {paper_id} 关联的教师ID为 {{teacher_id}}，当前登录教师ID为 {{user_id}}",
         )
-        paper_row = cursor.fetchone()
-        if not paper_row:
-            raise HTTPException(status_code=404, detail=f"论文ID {paper_id} 不存在")
-        
-        paper_db_id, paper_teacher_id = paper_row
-        if paper_teacher_id != login_user_id:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限提交审阅：论文ID {paper_id} 关联的教师ID为 {paper_teacher_id}，当前登录教师ID为 {login_user_id}"
-            )
         cursor.execute(
             "SELECT id FROM paper_reviews WHERE paper_id = %s AND teacher_id = %s LIMIT 1",
             (paper_id, login_user_id)
@@ -794,33 +817,22 @@ def update_paper_review(
     paper_id: int,
     review_content: str = Body(..., description="更新后的审阅内容，非空字符串", min_length=1),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if not ("teacher" in login_user_roles or "教师" in login_user_roles):
         raise HTTPException(status_code=403, detail="无权限更新审阅：仅教师角色可操作")
     
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            "SELECT id, teacher_id FROM papers WHERE id = %s",
-            (paper_id,)
+        paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.TEACHER,),
+            not_found_detail=f"论文ID {paper_id} 不存在",
+            forbidden_detail=f"无权限更新审阅：论文ID {paper_id} 关联的教师ID为 {{teacher_id}}，当前登录教师ID为 {{user_id}}",
         )
-        paper_row = cursor.fetchone()
-        if not paper_row:
-            raise HTTPException(status_code=404, detail=f"论文ID {paper_id} 不存在")
-        
-        paper_db_id, paper_teacher_id = paper_row
-        if paper_teacher_id != login_user_id:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限更新审阅：论文ID {paper_id} 关联的教师ID为 {paper_teacher_id}，当前登录教师ID为 {login_user_id}"
-            )
         cursor.execute(
             "SELECT id, review_content FROM paper_reviews WHERE paper_id = %s AND teacher_id = %s LIMIT 1",
             (paper_id, login_user_id)
@@ -880,49 +892,26 @@ def update_paper_review(
 def get_paper_review(
     paper_id: int,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 解析当前登录用户信息
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     
-    # 1. 基础登录校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     
     cursor = None
     try:
         cursor = db.cursor()
         
-        # 2. 查询论文基础信息（匹配papers表的实际字段：owner_id=学生ID，teacher_id=教师ID）
-        cursor.execute(
-            "SELECT id, owner_id, teacher_id FROM papers WHERE id = %s",
-            (paper_id,)
+        # 2-3. 论文归属（owner_id=学生ID，teacher_id=教师ID）与权限校验：
+        # 仅角色为教师且匹配 teacher_id、或角色为学生且匹配 owner_id 的用户可查看
+        paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.OWNER, paper_acl.TEACHER),
+            match_roles=True,
+            not_found_detail=f"论文ID {paper_id} 不存在",
+            forbidden_detail=f"无权限查看审阅：仅论文ID {paper_id} 关联的教师(ID:{{teacher_id}})或学生(ID:{{owner_id}})可查看",
         )
-        paper_row = cursor.fetchone()
-        if not paper_row:
-            raise HTTPException(status_code=404, detail=f"论文ID {paper_id} 不存在")
-        
-        paper_db_id, paper_owner_id, paper_teacher_id = paper_row
-        
-        # 3. 权限校验：仅论文关联的教师/学生可查看
-        is_teacher = "teacher" in login_user_roles or "教师" in login_user_roles
-        is_student = "student" in login_user_roles or "学生" in login_user_roles
-        
-        permission_denied = True
-        # 教师权限：角色是教师 + 登录ID匹配论文的teacher_id
-        if is_teacher and login_user_id == paper_teacher_id:
-            permission_denied = False
-        # 学生权限：角色是学生 + 登录ID匹配论文的owner_id
-        if is_student and login_user_id == paper_owner_id:
-            permission_denied = False
-        
-        if permission_denied:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限查看审阅：仅论文ID {paper_id} 关联的教师(ID:{paper_teacher_id})或学生(ID:{paper_owner_id})可查看"
-            )
         
         # 4. 查询审阅记录（移除teacher_name字段）
         cursor.execute(
@@ -973,37 +962,22 @@ def get_paper_review(
     summary="查询论文版本列表",
     description="按时间倒序返回指定论文的版本信息"
 )
-def list_versions(
+async def list_versions(
     paper_id: int,
-    # current_user=Depends(get_current_user),  # 保留验证代码，注释掉
-    db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    db=Depends(get_async_db),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    submitter_id = current_user.get("sub", 0)
+    submitter_id = current_user["sub"]
     current_roles = current_user.get("roles", [])
-    if submitter_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再查看论文版本")
     
     # 实际业务逻辑：查询该paper_id对应的版本列表
     cursor = None
     try:
-        cursor = db.cursor()
-        check_owner_sql = "SELECT owner_id, teacher_id FROM papers WHERE id = %s"
-        cursor.execute(check_owner_sql, (paper_id,))
-        paper_info = cursor.fetchone()
-        if not paper_info:
-            raise HTTPException(status_code=404, detail="论文不存在")
-        paper_owner_id, paper_teacher_id = paper_info
-        
-        is_owner = (paper_owner_id == submitter_id)
-        is_teacher = (paper_teacher_id == submitter_id)
-        is_admin = ("admin" in current_roles) or ("管理员" in current_roles)
-        if not is_owner and not is_teacher and not is_admin:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限查看该论文版本：仅论文归属者（ID={paper_owner_id}）、关联老师（ID={paper_teacher_id}）或管理员可查看，当前登录用户ID={submitter_id}，角色={current_roles}"
-            )
+        cursor = await db.cursor()
+        await paper_acl.authorize_paper_async(
+            cursor, paper_id, current_user,
+            forbidden_detail="无权限查看该论文版本：仅论文归属者（ID={owner_id}）、关联老师（ID={teacher_id}）或管理员可查看，当前登录用户ID={user_id}，角色={roles}",
+        )
         
         # 查询历史版本表
         version_sql = """
@@ -1012,8 +986,8 @@ def list_versions(
         WHERE paper_id = %s
         ORDER BY created_at DESC
         """
-        cursor.execute(version_sql, (paper_id,))
-        versions = cursor.fetchall()
+        await cursor.execute(version_sql, (paper_id,))
+        versions = await cursor.fetchall()
         # 组装返回数据
         result = []
         for version in versions:
@@ -1028,7 +1002,7 @@ def list_versions(
         raise HTTPException(status_code=500, detail=f"数据库查询失败: {str(e)}")
     finally:
         if cursor:
-            cursor.close()
+            await cursor.close()
     return []
 
 
@@ -1040,11 +1014,10 @@ def list_versions(
 )
 async def list_student_papers(
     owner_id: int = Query(..., description="要查询的学生ID（论文所有者ID），必须传入且为有效整数"),
-    db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    db=Depends(get_async_db),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)  
+    login_user_id = current_user["sub"]
     current_roles = current_user.get("roles", [])
     
     # 1. 参数校验
@@ -1054,10 +1027,10 @@ async def list_student_papers(
     # 2. 权限校验
     cursor_check = None
     try:
-        cursor_check = db.cursor()
+        cursor_check = await db.cursor()
         # 查询该学生论文关联的教师ID（用于判断是否是指导老师）
-        cursor_check.execute("SELECT teacher_id FROM papers WHERE owner_id = %s LIMIT 1", (owner_id,))
-        paper_teacher_id = cursor_check.fetchone()
+        await cursor_check.execute("SELECT teacher_id FROM papers WHERE owner_id = %s LIMIT 1", (owner_id,))
+        paper_teacher_id = await cursor_check.fetchone()
         paper_teacher_id = paper_teacher_id[0] if paper_teacher_id else 0
         
         # 权限判断：本人/指导老师/管理员
@@ -1072,20 +1045,20 @@ async def list_student_papers(
             )
     finally:
         if cursor_check:
-            cursor_check.close()
+            await cursor_check.close()
     
     # 3. 数据库查询（新增 pdf_oss_key，修正 latest_version 为 version）
     cursor = None
     try:
-        cursor = db.cursor(pymysql.cursors.DictCursor) 
+        cursor = await db.cursor(DictCursor) 
         query_sql = """
         SELECT id, owner_id, teacher_id, version, oss_key, pdf_oss_key, created_at, updated_at
         FROM papers 
         WHERE owner_id = %s 
         ORDER BY created_at DESC
         """
-        cursor.execute(query_sql, (owner_id,))
-        paper_records = cursor.fetchall()
+        await cursor.execute(query_sql, (owner_id,))
+        paper_records = await cursor.fetchall()
         
         # 4. 构造返回结果（新增 pdf_oss_key 字段，version 映射为 latest_version）
         result = []
@@ -1106,7 +1079,7 @@ async def list_student_papers(
         raise HTTPException(status_code=500, detail=f"数据库查询失败: {str(e)}")
     finally:
         if cursor:
-            cursor.close()
+            await cursor.close()
 
 
 @router.get(
@@ -1118,37 +1091,25 @@ def download_paper(
     paper_id: int,
     student_id: int = Query(..., description="待下载论文归属的学生ID"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    login_user_roles = current_user.get("roles", [])
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     cursor = None
     try:
         cursor = db.cursor()
-        cursor.execute(
-            "SELECT owner_id, teacher_id, version, oss_key FROM papers WHERE id = %s",
-            (paper_id,),
+        acl = paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            forbidden_detail="无权限下载该论文：仅论文归属学生(ID={owner_id})、关联老师(ID={teacher_id})或管理员可下载，当前登录用户ID={user_id}",
         )
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="论文不存在")
-        paper_owner_id, teacher_id, latest_version, oss_key = row
-        if paper_owner_id != student_id:
+        if acl.owner_id != student_id:
             raise HTTPException(
                 status_code=400,
-                detail=f"传入的学生ID({student_id})与论文归属者ID({paper_owner_id})不一致"
-            )
-        is_student = (login_user_id == paper_owner_id)  
-        is_teacher = (login_user_id == teacher_id)    
-        is_admin = ("admin" in login_user_roles) or ("管理员" in login_user_roles)  # 管理员
-        if not is_student and not is_teacher and not is_admin:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限下载该论文：仅论文归属学生(ID={paper_owner_id})、关联老师(ID={teacher_id})或管理员可下载，当前登录用户ID={login_user_id}"
+                detail=f"传入的学生ID({student_id})与论文归属者ID({acl.owner_id})不一致"
             )
+        cursor.execute("SELECT version, oss_key FROM papers WHERE id = %s", (paper_id,))
+        row = cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="论文不存在")
+        latest_version, oss_key = row
         if not oss_key:
             raise HTTPException(status_code=404, detail="论文文件不存在（无存储路径）")
         try:
@@ -1226,18 +1187,15 @@ def create_ddl(
     teacher_id: int = Query(..., description="教师ID（必须为正整数）"),
     group_id: str = Query(..., description="群组ID（对应groups表的group_id）"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     teacher_name = current_user.get("username", "") 
     # 基础校验
     if not teacher_name:
         raise HTTPException(status_code=400, detail="教师姓名不能为空")
 
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if "teacher" not in login_user_roles and "教师" not in login_user_roles:
         raise HTTPException(status_code=403, detail="无权限创建DDL：仅教师角色可操作")
     if not isinstance(teacher_id, int) or teacher_id <= 0:
@@ -1324,6 +1282,7 @@ def create_ddl(
             )
         
         db.commit()
+        count_cache.invalidate("user_messages")
         return DDLOut(
             ddlid=ddlid,
             creator_id=teacher_id,
@@ -1351,14 +1310,11 @@ def create_ddl(
 def list_ddl(
     teacher_id: int = Query(..., description="教师ID（查询该教师创建的DDL）"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     # 基础校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if not isinstance(teacher_id, int) or teacher_id <= 0:
         raise HTTPException(status_code=400, detail="teacher_id必须是正整数")
     # 权限校验
@@ -1410,13 +1366,9 @@ def list_ddl(
 )
 def list_received_ddl(
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
-    # 基础校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
     # 数据库查询
     cursor = None
     try:
@@ -1460,16 +1412,11 @@ def list_received_ddl(
 )
 def cleanup_expired_ddl(
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     
-    # 基础校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
-    
     # 权限校验：仅管理员可执行清理操作
     if "admin" not in login_user_roles and "管理员" not in login_user_roles:
         raise HTTPException(status_code=403, detail="无权限执行DDL清理操作：仅管理员可操作")
@@ -1503,10 +1450,10 @@ def cleanup_expired_ddl(
                 # 开始事务
                 db.begin()
                 
-                # a. 删除与该DDL相关的用户消息
-                # 由于DDL消息是发送给群组所有成员的，我们删除所有source为'ddl'的消息
+                # a. 删除与该DDL相关的用户消息（按 ddlid 生成列精确匹配）
                 cursor.execute(
-                    "DELETE FROM user_messages WHERE source = 'ddl'"
+                    "DELETE FROM user_messages WHERE ddlid = %s AND source = 'ddl'",
+                    (str(ddlid),)
                 )
                 deleted_messages = cursor.rowcount
                 deleted_message_count += deleted_messages
@@ -1521,6 +1468,7 @@ def cleanup_expired_ddl(
                 
                 # 提交事务
                 db.commit()
+                count_cache.invalidate("user_messages")
                 
             except Exception:
                 # 回滚事务
@@ -1555,14 +1503,11 @@ def cleanup_expired_ddl(
 def delete_ddl(
     ddlid: int,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     # 基础校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if not isinstance(ddlid, int) or ddlid <= 0:
         raise HTTPException(status_code=400, detail="ddlid必须是正整数")
     # 数据库操作
@@ -1586,46 +1531,16 @@ def delete_ddl(
                 detail=f"无权限删除：仅创建该DDL的教师（ID={ddl_teacher_id}）或管理员可删除，当前登录用户ID={login_user_id}"
             )
         
-        # 获取group_id和ddl_time用于匹配消息
-        group_id = None
-        ddl_time_str = None
-        try:
-            cursor.execute("SELECT group_id, ddl_time FROM ddl_management WHERE ddlid = %s", (ddlid,))
-            row = cursor.fetchone()
-            if row:
-                group_id = row[0]
-                ddl_time = row[1]
-                if ddl_time:
-                    ddl_time_str = ddl_time.strftime('%Y-%m-%d %H:%M:%S')
-        except Exception:
-            pass
-        
         # 删除操作
-        # 先删除相关的消息记录
-        deleted_messages_count = 0
-        
-        # 方式1：通过metadata中的ddlid匹配
-        if ddlid:
-            delete_messages_sql = "DELETE FROM user_messages WHERE source = 'ddl' AND metadata LIKE %s"
-            cursor.execute(delete_messages_sql, (f'%\"ddlid\": {ddlid}%',))
-            deleted_messages_count = cursor.rowcount
-        
-        # 方式2：如果metadata方式没找到，通过group_id匹配
-        if deleted_messages_count == 0 and group_id:
-            delete_messages_sql = "DELETE FROM user_messages WHERE source = 'ddl' AND metadata LIKE %s"
-            cursor.execute(delete_messages_sql, (f'%\"group_id\": {group_id}%',))
-            deleted_messages_count = cursor.rowcount
-        
-        # 方式3：如果metadata方式没找到，尝试通过消息内容匹配
-        if deleted_messages_count == 0 and ddl_time_str:
-            delete_messages_sql = "DELETE FROM user_messages WHERE source = 'ddl' AND content LIKE %s"
-            cursor.execute(delete_messages_sql, (f'%{ddl_time_str}%',))
-            deleted_messages_count = cursor.rowcount
+        # 先删除相关的消息记录（create_ddl 推送的消息都带 ddlid，按 ddlid 生成列精确匹配）
+        cursor.execute("DELETE FROM user_messages WHERE ddlid = %s AND source = 'ddl'", (str(ddlid),))
+        deleted_messages_count = cursor.rowcount
         
         # 再删除DDL记录
         delete_sql = "DELETE FROM ddl_management WHERE ddlid = %s"
         cursor.execute(delete_sql, (ddlid,))
         db.commit()
+        count_cache.invalidate("user_messages")
         
         return {
             "message": f"DDL {ddlid} 删除成功",
@@ -1685,15 +1600,12 @@ def update_ddl(
         enum=[str(s) for s in range(0, 60)]
     ),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    login_user_id = current_user.get("sub", 0)
+    login_user_id = current_user["sub"]
     login_user_roles = current_user.get("roles", [])
     
     # 基础校验
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
     if not isinstance(ddlid, int) or ddlid <= 0:
         raise HTTPException(status_code=400, detail="ddlid必须是正整数")
     
@@ -1781,26 +1693,27 @@ def update_ddl(
     summary="查看论文所有信息",
     description="输入论文ID查询指定字段信息，仅论文归属学生或关联老师可访问"
 )
-async def get_paper_detail(
+@offload("db")
+def get_paper_detail(
     paper_id: int,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    # 解析当前用户信息
-    current_user = _parse_current_user(current_user)
-    submitter_id = current_user.get("sub", 0)  
-
     # 参数校验
     if not isinstance(paper_id, int) or paper_id <= 0:
         raise HTTPException(status_code=400, detail="paper_id必须是正整数")
 
-    # 未登录校验
-    if submitter_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再查看论文信息")
 
     cursor = None
     try:
         cursor = db.cursor(pymysql.cursors.DictCursor)
+        # 权限校验：仅论文归属学生或关联老师可访问（论文归属走缓存）
+        paper_acl.authorize_paper(
+            cursor, paper_id, current_user,
+            allow=(paper_acl.OWNER, paper_acl.TEACHER),
+            not_found_detail=f"论文ID {paper_id} 不存在",
+            forbidden_detail="无权限查看：仅论文归属者（ID={owner_id}）或关联老师（ID={teacher_id}）可查看该论文信息",
+        )
         # 仅查询指定字段（严格匹配你要求的列表）
         paper_sql = """
         SELECT 
@@ -1817,15 +1730,6 @@ async def get_paper_detail(
         if not paper_detail:
             raise HTTPException(status_code=404, detail=f"论文ID {paper_id} 不存在")
 
-        # 权限校验：仅论文归属学生或关联老师可访问
-        paper_owner_id = paper_detail["owner_id"]
-        paper_teacher_id = paper_detail["teacher_id"]
-        if submitter_id not in [paper_owner_id, paper_teacher_id]:
-            raise HTTPException(
-                status_code=403,
-                detail=f"无权限查看：仅论文归属者（ID={paper_owner_id}）或关联老师（ID={paper_teacher_id}）可查看该论文信息"
-            )
-
         return paper_detail
 
     except pymysql.MySQLError as e:
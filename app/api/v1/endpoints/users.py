@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import codecs
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Body
+from fastapi.responses import JSONResponse
 import csv
-import io
 import pymysql
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
@@ -18,31 +20,30 @@ from app.schemas.user import (
     LoginRequest,
     LoginResponse,
 )
-from app.database import get_db
-from app.core.dependencies import get_current_user
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.config import settings
+from app.database import get_connection, get_db
+from app.core import identity_cache
+from app.core.executor import run_blocking
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.dependencies import get_current_user, security
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    get_password_hash_async,
+    get_password_hashes,
+    get_password_hashes_async,
+    revoke_many_user_tokens,
+    revoke_token,
+    revoke_user_tokens,
+    verify_password,
+    verify_password_async,
+)
+from app.services import import_jobs
+from app.services.oss import FileTooLarge
+from app.services.uploads import check_upload_size, upload_too_large
 from loguru import logger
 
 
-def _parse_current_user(current_user: Optional[str]) -> dict:
-    try:
-        if not current_user:
-            return {"sub": 0, "username": "", "roles": []}
-        import urllib.parse
-        raw = urllib.parse.unquote(current_user)
-        if not raw.strip():
-            return {"sub": 0, "username": "", "roles": []}
-        if raw.isdigit():
-            return {"sub": int(raw), "username": f"user{raw}", "roles": ["student"]}
-        import json
-        data = json.loads(raw)
-        if isinstance(data, dict):
-            return data
-    except Exception:
-        pass
-    return {"sub": 0, "username": "", "roles": []}
-
-
 class TeacherSubmitReviewRequest(BaseModel):
     """教师提交审阅请求"""
     paper_id: int
@@ -75,7 +76,6 @@ class TeacherUpdateReviewRequest(BaseModel):
     }
 
 
-
 class UserBindSchool(BaseModel):
     school_id: int
     school_name: Optional[str] = None 
@@ -297,12 +297,11 @@ def _get_next_business_id(
 def create_school(
     payload: SchoolCreateRequest,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 解析当前用户信息
-    current_user_info = _parse_current_user(current_user)
     # 验证当前用户是管理员
-    user_roles = current_user_info.get("roles", [])
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
     cursor = None
@@ -356,12 +355,11 @@ def create_school(
 def create_department(
     payload: DepartmentCreateRequest,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 解析当前用户信息
-    current_user_info = _parse_current_user(current_user)
     # 验证当前用户是管理员
-    user_roles = current_user_info.get("roles", [])
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
     
@@ -528,7 +526,7 @@ def user_bind_school(
     sub: int = Query(..., description="用户ID，必须传入且为有效整数"),
     role: str = Query(..., description="用户角色，仅支持student/teacher"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 基础参数校验
     if sub <= 0:
@@ -538,10 +536,9 @@ def user_bind_school(
     if role not in ["student", "teacher"]:
         raise HTTPException(status_code=400, detail="角色仅支持student/teacher")
 
-    # 解析current_user并校验一致性
-    current_user_info = _parse_current_user(current_user)
-    current_sub = current_user_info.get("sub", 0)
-    current_roles = current_user_info.get("roles", [])
+    # 校验登录用户与传入参数一致
+    current_sub = current_user["sub"]
+    current_roles = current_user.get("roles", [])
 
     # 校验sub一致性
     if current_sub != sub:
@@ -608,7 +605,7 @@ def user_bind_department(
     sub: int = Query(..., description="用户ID，必须传入且为有效整数"),
     role: str = Query(..., description="用户角色，仅支持student/teacher"),
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="提交者信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 基础参数校验
     if sub <= 0:
@@ -618,10 +615,9 @@ def user_bind_department(
     if role not in ["student", "teacher"]:
         raise HTTPException(status_code=400, detail="角色仅支持student/teacher")
 
-    # 解析current_user并校验一致性
-    current_user_info = _parse_current_user(current_user)
-    current_sub = current_user_info.get("sub", 0)
-    current_roles = current_user_info.get("roles", [])
+    # 校验登录用户与传入参数一致
+    current_sub = current_user["sub"]
+    current_roles = current_user.get("roles", [])
 
     # 校验sub一致性
     if current_sub != sub:
@@ -694,10 +690,8 @@ def get_current_user_info(
 ):
     cursor = None
     try:
-        user_id = current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="请先登录")
-        user_type = _resolve_user_type_from_payload(current_user)
+        user_id = current_user["sub"]
+        user_type = current_user["user_type"]
         info = USER_TABLES[user_type]
         table = info["table"]
         cursor = db.cursor(pymysql.cursors.DictCursor)
@@ -717,23 +711,15 @@ def get_current_user_info(
             cursor.close()
 
 
-@router.post(
-    "/login",
-    response_model=LoginResponse,
-    summary="用户登录",
-    description="统一账号密码登录，返回 JWT access token 和用户信息",
-)
-def login_user(payload: LoginRequest, db: pymysql.connections.Connection = Depends(get_db)):
-
+def _load_login_candidates(
+    db: pymysql.connections.Connection,
+    username: str,
+    user_type: str | None,
+) -> tuple[list[tuple[str, dict]], bool]:
+    """查询可能匹配的账号（在 db 线程池中执行），第二项表示是否命中虚拟账号映射"""
     cursor = None
     try:
         cursor = db.cursor(pymysql.cursors.DictCursor)
-        username = payload.username.strip()
-        if not username:
-            raise HTTPException(status_code=400, detail="username 不能为空")
-        if not payload.password:
-            raise HTTPException(status_code=400, detail="password 不能为空")
-
         # 账号映射逻辑：先查映射表
         mapping = None
         try:
@@ -761,65 +747,90 @@ def login_user(payload: LoginRequest, db: pymysql.connections.Connection = Depen
             row = cursor.fetchone()
             if not row:
                 raise HTTPException(status_code=404, detail="真实账号不存在")
-            password_hash = row.get("password")
-            if not password_hash or not verify_password(payload.password, password_hash):
-                raise HTTPException(status_code=401, detail="用户名或密码错误")
-            role = row.get("role") or real_user_type
-            token_payload = {
-                "sub": row["id"],
-                "username": row["username"],
-                "roles": [role],
-                "user_type": real_user_type,
-            }
-            access_token = create_access_token(token_payload)
-            row.pop("password", None)
-            user_out = UserOut(**row)
-            return LoginResponse(access_token=access_token, user=user_out)
+            return [(real_user_type, row)], True
 
         # 没有映射则走原有逻辑
         candidates: list[tuple[str, dict]] = []
-        if payload.user_type:
-            row = _fetch_user_for_login(cursor, username, payload.user_type)
+        if user_type:
+            row = _fetch_user_for_login(cursor, username, user_type)
             if row:
-                candidates.append((payload.user_type, row))
+                candidates.append((user_type, row))
         else:
-            for user_type in ("admin", "teacher", "student"):
-                row = _fetch_user_for_login(cursor, username, user_type)
+            for candidate_type in ("admin", "teacher", "student"):
+                row = _fetch_user_for_login(cursor, username, candidate_type)
                 if row:
-                    candidates.append((user_type, row))
-        if not candidates:
-            raise HTTPException(status_code=401, detail="用户名或密码错误")
-        matched: list[tuple[str, dict]] = []
-        for user_type, row in candidates:
-            password_hash = row.get("password")
-            if password_hash and verify_password(payload.password, password_hash):
-                matched.append((user_type, row))
-        if not matched:
-            raise HTTPException(status_code=401, detail="用户名或密码错误")
-        if len(matched) > 1:
-            raise HTTPException(status_code=400, detail="账号在多个用户类型中匹配，请指定 user_type")
-        user_type, row = matched[0]
-        role = row.get("role") or user_type
-        token_payload = {
-            "sub": row["id"],
-            "username": row["username"],
-            "roles": [role],
-            "user_type": user_type,
-        }
-        access_token = create_access_token(token_payload)
-        row.pop("password", None)
-        user_out = UserOut(**row)
-        return LoginResponse(access_token=access_token, user=user_out)
-    except HTTPException:
-        raise
-    except pymysql.MySQLError as e:
-        logger.error(f"用户登录数据库错误: {str(e)}")
-        raise HTTPException(status_code=500, detail="登录失败")
+                    candidates.append((candidate_type, row))
+        return candidates, False
     finally:
         if cursor:
             cursor.close()
 
 
+async def _password_matches(password: str, row: dict) -> bool:
+    password_hash = row.get("password")
+    return bool(password_hash) and await verify_password_async(password, password_hash)
+
+
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    summary="用户登录",
+    description="统一账号密码登录，返回 JWT access token 和用户信息",
+)
+async def login_user(payload: LoginRequest, db: pymysql.connections.Connection = Depends(get_db)):
+    username = payload.username.strip()
+    if not username:
+        raise HTTPException(status_code=400, detail="username 不能为空")
+    if not payload.password:
+        raise HTTPException(status_code=400, detail="password 不能为空")
+
+    try:
+        candidates, mapped = await run_blocking(
+            "db", _load_login_candidates, db, username, payload.user_type
+        )
+    except pymysql.MySQLError as e:
+        logger.error(f"用户登录数据库错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="登录失败")
+    if not candidates:
+        raise HTTPException(status_code=401, detail="用户名或密码错误")
+
+    # 未指定 user_type 时最多三个候选账号，bcrypt 校验在进程池中并行执行
+    results = await asyncio.gather(
+        *(_password_matches(payload.password, row) for _, row in candidates)
+    )
+    matched = [candidate for candidate, ok in zip(candidates, results) if ok]
+    if not matched:
+        raise HTTPException(status_code=401, detail="用户名或密码错误")
+    if len(matched) > 1 and not mapped:
+        raise HTTPException(status_code=400, detail="账号在多个用户类型中匹配，请指定 user_type")
+    user_type, row = matched[0]
+    role = row.get("role") or user_type
+    token_payload = {
+        "sub": row["id"],
+        "username": row["username"],
+        "roles": [role],
+        "user_type": user_type,
+    }
+    access_token = create_access_token(token_payload)
+    row.pop("password", None)
+    user_out = UserOut(**row)
+    return LoginResponse(access_token=access_token, user=user_out)
+
+
+@router.post(
+    "/logout",
+    summary="退出登录",
+    description="吊销当前请求携带的 access token，之后该 token 无法再访问接口",
+)
+def logout_user(
+    current_user: dict = Depends(get_current_user),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+):
+    if credentials is not None:
+        revoke_token(credentials.credentials)
+    return {"message": "已退出登录"}
+
+
 class ChangePasswordRequest(BaseModel):
     """修改密码请求"""
     old_password: str
@@ -842,16 +853,12 @@ class ChangePasswordRequest(BaseModel):
 def change_password(
     payload: ChangePasswordRequest,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="登录用户信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
-    current_user = _parse_current_user(current_user)
-    user_id = current_user.get("sub")
-    if not user_id or user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录")
+    user_id = current_user["sub"]
     cursor = None
     try:
-        # 解析用户类型
-        user_type = _resolve_user_type_from_payload(current_user)
+        user_type = current_user["user_type"]
         info = USER_TABLES[user_type]
         table = info["table"]
         cursor = db.cursor(pymysql.cursors.DictCursor)
@@ -876,6 +883,8 @@ def change_password(
             (new_password_hash, user_id)
         )
         db.commit()
+        # 旧密码签发的 token（包括当前这个）全部失效，需要重新登录
+        revoke_user_tokens(user_type, user_id)
         return {"message": "密码修改成功"}
     except HTTPException:
         raise
@@ -911,12 +920,11 @@ class ResetPasswordRequest(BaseModel):
 def reset_user_password(
     payload: ResetPasswordRequest,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 解析当前用户信息
-    current_user_info = _parse_current_user(current_user)
     # 验证当前用户是管理员
-    user_roles = current_user_info.get("roles", [])
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
     cursor = None
@@ -938,6 +946,7 @@ def reset_user_password(
             (password_hash, payload.user_id)
         )
         db.commit()
+        revoke_user_tokens(user_type, payload.user_id)
         return {
             "message": f"{user_type}用户密码已重置为123456",
             "user_id": payload.user_id,
@@ -1304,6 +1313,7 @@ def update_user(user_id: int, payload: UserUpdate, db: pymysql.connections.Conne
         params.append(user_id)
         cursor.execute(sql, tuple(params))
         db.commit()
+        identity_cache.invalidate(user_type, user_id)
         updated = _fetch_user(cursor, user_id, user_type)
         if not updated:
             raise HTTPException(status_code=500, detail="用户更新后查询失败")
@@ -1340,6 +1350,7 @@ def delete_user(
             raise HTTPException(status_code=404, detail="用户不存在")
         cursor.execute(f"DELETE FROM {table} WHERE id = %s", (user_id,))
         db.commit()
+        identity_cache.invalidate(user_type, user_id)
         return {"message": "删除成功", "user_id": user_id}
     except HTTPException:
         raise
@@ -1352,141 +1363,360 @@ def delete_user(
             cursor.close()
 
 
-@router.post(
-    "/import",
-    summary="一键导入用户",
-    description="上传 CSV/TSV 文件批量导入用户（列：username,user_type,email,full_name,role,password 可选）"
-)
-async def import_users(file: UploadFile = File(...), db: pymysql.connections.Connection = Depends(get_db)):
-    filename = file.filename or ""
-    lower_name = filename.lower()
-    if not lower_name.endswith(SUPPORTED_IMPORT_EXTS):
-        raise HTTPException(status_code=400, detail="仅支持 .csv 或 .tsv 文件")
+DEFAULT_IMPORT_PASSWORD = "123456"
+DEFAULT_IMPORT_ROLE = "admin"
+
+# 批量 upsert 语句，executemany 会把同一批改写为一条多行 INSERT
+_IMPORT_UPSERT_SQL = {
+    "admin": """
+        INSERT INTO admins (admin_id, name, phone, email, role, password)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            name = VALUES(name),
+            phone = VALUES(phone),
+            email = VALUES(email),
+            role = VALUES(role),
+            password = VALUES(password),
+            updated_at = NOW()
+    """,
+    "student": """
+        INSERT INTO students (student_id, name, phone, email, password)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            name = VALUES(name),
+            phone = VALUES(phone),
+            email = VALUES(email),
+            password = VALUES(password),
+            updated_at = NOW()
+    """,
+    "teacher": """
+        INSERT INTO teachers (teacher_id, name, phone, email, password)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            name = VALUES(name),
+            phone = VALUES(phone),
+            email = VALUES(email),
+            password = VALUES(password),
+            updated_at = NOW()
+    """,
+}
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="上传文件为空")
 
-    delimiter = "\t" if lower_name.endswith(".tsv") else ","
-    try:
-        text = content.decode("utf-8-sig")
-    except UnicodeDecodeError:
+def _detect_import_encoding(stream) -> str:
+    """
+    判断编码（UTF-8 或 GBK），读完后回到文件开头。
+    按块扫描整个文件：只看开头时，前面全是 ASCII 的 GBK 文件会被误判为 UTF-8，读到中途才报错。
+    """
+    decoders = {encoding: codecs.getincrementaldecoder(encoding)() for encoding in ("utf-8-sig", "gbk")}
+    chunk_size = max(1, settings.UPLOAD_CHUNK_SIZE)
+    empty = True
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        empty = False
+        for encoding, decoder in list(decoders.items()):
+            try:
+                decoder.decode(chunk, final=False)
+            except UnicodeDecodeError:
+                del decoders[encoding]
+        if not decoders:
+            break
+    stream.seek(0)
+    if empty:
+        raise HTTPException(status_code=400, detail="上传文件为空")
+    for encoding, decoder in decoders.items():
         try:
-            text = content.decode("gbk")
+            decoder.decode(b"", final=True)
+            return encoding
         except UnicodeDecodeError:
-            raise HTTPException(status_code=400, detail="文件编码仅支持 UTF-8 或 GBK")
+            continue
+    raise HTTPException(status_code=400, detail="文件编码仅支持 UTF-8 或 GBK")
+
 
-    reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-    required_col = "username"
-    if required_col not in reader.fieldnames:
+def _open_import_reader(stream, delimiter: str) -> csv.DictReader:
+    """以流的方式读取上传文件，不把整个文件读入内存"""
+    encoding = _detect_import_encoding(stream)
+    reader = csv.DictReader(codecs.getreader(encoding)(stream), delimiter=delimiter)
+    if "username" not in (reader.fieldnames or []):
         raise HTTPException(status_code=400, detail="文件缺少 username 列")
+    return reader
 
-    created, updated = 0, 0
-    default_role = "admin"
-    default_password = "123456"
-    cursor = None
-    created_items = []
-    updated_items = []
+
+def _clean(value: str | None) -> str | None:
+    return (value or "").strip() or None
+
+
+def _parse_import_row(row: dict) -> dict | None:
+    """解析一行导入数据，username 为空返回 None；password 为 None 表示使用默认密码"""
+    username = (row.get("username") or "").strip()
+    if not username:
+        return None
+    return {
+        "user_type": _normalize_user_type(row.get("user_type") or "admin"),
+        "username": username,
+        "full_name": _clean(row.get("full_name")) or username,  # 默认使用username作为full_name
+        "phone": _clean(row.get("phone")),
+        "email": _clean(row.get("email")),
+        "role": _clean(row.get("role")) or DEFAULT_IMPORT_ROLE,
+        "password": _clean(row.get("password")),
+    }
+
+
+def _iter_import_batches(reader: csv.DictReader, batch_size: int):
+    """逐行解析并按 batch_size 分批"""
+    batch: list[dict] = []
     try:
-        cursor = db.cursor()
         for row in reader:
-            username = (row.get("username") or "").strip()
-            if not username:
+            parsed = _parse_import_row(row)
+            if parsed is None:
                 continue
-            user_type = _normalize_user_type(row.get("user_type") or "admin")
+            batch.append(parsed)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="文件编码仅支持 UTF-8 或 GBK")
+    if batch:
+        yield batch
+
+
+async def _hash_import_batch(batch: list[dict], default_hash: str) -> list[str]:
+    """只为自带密码的行计算哈希，其余行复用默认密码的哈希"""
+    explicit = [row["password"] for row in batch if row["password"]]
+    hashed = iter(await get_password_hashes_async(explicit))
+    return [next(hashed) if row["password"] else default_hash for row in batch]
+
+
+def _select_ids_by_username(cursor, table: str, id_col: str, usernames: list[str]) -> dict[str, int]:
+    if not usernames:
+        return {}
+    placeholders = ", ".join(["%s"] * len(usernames))
+    cursor.execute(f"SELECT id, {id_col} FROM {table} WHERE {id_col} IN ({placeholders})", usernames)
+    ids = {}
+    for rec in cursor.fetchall():
+        values = list(rec.values()) if isinstance(rec, dict) else list(rec)
+        ids[values[1]] = values[0]
+    return ids
+
+
+def _upsert_user_batch(
+    db: pymysql.connections.Connection,
+    batch: list[dict],
+    password_hashes: list[str],
+) -> tuple[list[dict], list[dict]]:
+    """按用户表分组批量 upsert 一批用户（在 db 线程池中执行，不提交事务）
+
+    已存在的账号在写入前用一条 IN 查询确定（计为更新），新账号的ID在写入后再用一条 IN 查询取回。
+    同一批内重复的账号以最后一行为准。
+    """
+    by_type: dict[str, dict[str, tuple[dict, str]]] = {}
+    for row, password_hash in zip(batch, password_hashes):
+        by_type.setdefault(row["user_type"], {})[row["username"]] = (row, password_hash)
+
+    created_items: list[dict] = []
+    updated_items: list[dict] = []
+    cursor = db.cursor()
+    try:
+        for user_type, rows in by_type.items():
             info = USER_TABLES[user_type]
-            table = info["table"]
-            phone = (row.get("phone") or None) and row.get("phone").strip()
-            email = (row.get("email") or None) and row.get("email").strip()
-            full_name = (row.get("full_name") or None) and row.get("full_name").strip()
-            role = (row.get("role") or default_role).strip() or default_role
-            password = (row.get("password") or default_password).strip() or default_password
-            password_hash = get_password_hash(password)
-            if not full_name:
-                full_name = username  # 默认使用username作为full_name
+            table, id_col = info["table"], info["id_col"]
+            usernames = list(rows)
+            existing = _select_ids_by_username(cursor, table, id_col, usernames)
             if user_type == "admin":
-                cursor.execute(
-                    """
-                    INSERT INTO admins (admin_id, name, phone, email, role, password)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        name = VALUES(name),
-                        phone = VALUES(phone),
-                        email = VALUES(email),
-                        role = VALUES(role),
-                        password = VALUES(password),
-                        updated_at = NOW()
-                    """,
-                    (username, full_name, phone, email, role, password_hash),
-                )
-            elif user_type == "student":
-                cursor.execute(
-                    """
-                    INSERT INTO students (student_id, name, phone, email, password)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        name = VALUES(name),
-                        phone = VALUES(phone),
-                        email = VALUES(email),
-                        password = VALUES(password),
-                        updated_at = NOW()
-                    """,
-                    (username, full_name, phone, email, password_hash),
-                )
+                params = [
+                    (r["username"], r["full_name"], r["phone"], r["email"], r["role"], h)
+                    for r, h in rows.values()
+                ]
             else:
-                cursor.execute(
-                    """
-                    INSERT INTO teachers (teacher_id, name, phone, email, password)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        name = VALUES(name),
-                        phone = VALUES(phone),
-                        email = VALUES(email),
-                        password = VALUES(password),
-                        updated_at = NOW()
-                    """,
-                    (username, full_name, phone, email, password_hash),
-                )
-            if cursor.rowcount == 1:
-                created += 1
-                # fetch id
-                cursor.execute(f"SELECT id FROM {table} WHERE {info['id_col']} = %s", (username,))
-                rid = cursor.fetchone()
-                if rid:
-                    if isinstance(rid, dict):
-                        rec_id = rid.get('id')
-                    else:
-                        rec_id = rid[0]
-                else:
-                    rec_id = None
-                created_items.append({"user_type": user_type, "username": username, "id": rec_id})
-            else:
-                updated += 1
-                cursor.execute(f"SELECT id FROM {table} WHERE {info['id_col']} = %s", (username,))
-                rid = cursor.fetchone()
-                if rid:
-                    if isinstance(rid, dict):
-                        rec_id = rid.get('id')
-                    else:
-                        rec_id = rid[0]
+                params = [
+                    (r["username"], r["full_name"], r["phone"], r["email"], h)
+                    for r, h in rows.values()
+                ]
+            cursor.executemany(_IMPORT_UPSERT_SQL[user_type], params)
+            created_ids = _select_ids_by_username(
+                cursor, table, id_col, [u for u in usernames if u not in existing]
+            )
+            for username in usernames:
+                if username in existing:
+                    updated_items.append({"user_type": user_type, "username": username, "id": existing[username]})
                 else:
-                    rec_id = None
-                updated_items.append({"user_type": user_type, "username": username, "id": rec_id})
-        db.commit()
-        return {
-            "message": "导入完成",
-            "created": created,
-            "updated": updated,
-            "created_items": created_items,
-            "updated_items": updated_items,
-        }
-    except pymysql.MySQLError as e:
-        db.rollback()
-        logger.error(f"用户导入数据库错误: {str(e)}")
-        raise HTTPException(status_code=500, detail="用户导入失败")
+                    created_items.append({"user_type": user_type, "username": username, "id": created_ids.get(username)})
+        return created_items, updated_items
     finally:
-        if cursor:
-            cursor.close()
+        cursor.close()
+
+
+def _import_job_chunk(
+    conn: pymysql.connections.Connection,
+    job: import_jobs.JobContext,
+    chunk: list[tuple[int, dict]],
+    default_hash: str,
+) -> tuple[int, int]:
+    """后台任务的一个分块：一个事务写入；批量写入失败时逐行重试以定位出错的行"""
+    rows: list[dict] = []
+    sources: list[tuple[int, dict]] = []
+    for line, raw in chunk:
+        try:
+            parsed = _parse_import_row(raw)
+        except HTTPException as e:
+            job.fail_row(line, raw, str(e.detail))
+            continue
+        if parsed is not None:
+            rows.append(parsed)
+            sources.append((line, raw))
+    if not rows:
+        return 0, 0
+
+    explicit = get_password_hashes([row["password"] for row in rows if row["password"]])
+    hashed = iter(explicit)
+    hashes = [next(hashed) if row["password"] else default_hash for row in rows]
+    try:
+        created, updated = _upsert_user_batch(conn, rows, hashes)
+        conn.commit()
+    except pymysql.MySQLError:
+        conn.rollback()
+        created, updated = [], []
+        for row, password_hash, (line, raw) in zip(rows, hashes, sources):
+            try:
+                row_created, row_updated = _upsert_user_batch(conn, [row], [password_hash])
+                conn.commit()
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                job.fail_row(line, raw, f"写入失败：{e.args[-1] if e.args else e}")
+                continue
+            created.extend(row_created)
+            updated.extend(row_updated)
+    updated_keys = [(item["user_type"], item["id"]) for item in updated]
+    identity_cache.invalidate_many(updated_keys)
+    revoke_many_user_tokens(updated_keys)
+    return len(created), len(updated)
+
+
+def _run_user_import_job(job: import_jobs.JobContext) -> dict:
+    """后台导入用户：每 IMPORT_JOB_CHUNK_SIZE 行一个事务，非法行与写入失败的行记入失败行文件"""
+    delimiter = "\t" if job.filename.lower().endswith(".tsv") else ","
+    default_hash = get_password_hash(DEFAULT_IMPORT_PASSWORD)
+    created = updated = 0
+    conn = get_connection()
+    try:
+        with open(job.path, "rb") as stream:
+            reader = _open_import_reader(stream, delimiter)
+            job.set_columns(reader.fieldnames)
+            chunk: list[tuple[int, dict]] = []
+            try:
+                for raw in reader:
+                    chunk.append((reader.line_num, raw))
+                    if len(chunk) >= job.chunk_size:
+                        c, u = _import_job_chunk(conn, job, chunk, default_hash)
+                        created, updated = created + c, updated + u
+                        job.advance(len(chunk))
+                        chunk = []
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=400, detail=f"第{reader.line_num}行附近编码错误，文件编码仅支持 UTF-8 或 GBK")
+            if chunk:
+                c, u = _import_job_chunk(conn, job, chunk, default_hash)
+                created, updated = created + c, updated + u
+                job.advance(len(chunk))
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {"created": created, "updated": updated, "failed": job.failed}
+
+
+import_jobs.register("users", _run_user_import_job)
+
+
+@router.post(
+    "/import",
+    summary="一键导入用户",
+    description="上传 CSV/TSV 文件批量导入用户（列：username,user_type,email,full_name,role,password 可选），"
+                "按批写入并返回每批的新建/更新数量；as_job=true 时提交为后台任务，返回任务ID",
+)
+async def import_users(
+    file: UploadFile = File(...),
+    as_job: bool = Query(False, description="提交为后台任务，通过 /jobs/{id} 查询进度"),
+    db: pymysql.connections.Connection = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    user_roles = current_user.get("roles", [])
+    if "admin" not in user_roles and "管理员" not in user_roles:
+        raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
+    filename = file.filename or ""
+    lower_name = filename.lower()
+    if not lower_name.endswith(SUPPORTED_IMPORT_EXTS):
+        raise HTTPException(status_code=400, detail="仅支持 .csv 或 .tsv 文件")
+    delimiter = "\t" if lower_name.endswith(".tsv") else ","
+    check_upload_size(file, settings.IMPORT_MAX_BYTES)
+
+    if as_job:
+        try:
+            job_id = await run_blocking(
+                "storage", import_jobs.create_job, "users", filename, file.file,
+                f"{current_user['user_type']}:{current_user['sub']}",
+            )
+        except FileTooLarge as e:
+            raise upload_too_large(e.limit)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "导入任务已提交", "job_id": job_id, "status_url": f"/api/v1/jobs/{job_id}"},
+        )
+
+    reader = await run_blocking("storage", _open_import_reader, file.file, delimiter)
+    batches = _iter_import_batches(reader, max(1, settings.USER_IMPORT_BATCH_SIZE))
+    # 未填写密码的行共用默认密码的同一个哈希，只计算一次
+    default_hash = await get_password_hash_async(DEFAULT_IMPORT_PASSWORD)
+
+    created_items: list[dict] = []
+    updated_items: list[dict] = []
+    batch_stats: list[dict] = []
+    pending: tuple[list[dict], asyncio.Future] | None = None
+
+    async def write(batch: list[dict], hashing: asyncio.Future) -> None:
+        created, updated = await run_blocking("db", _upsert_user_batch, db, batch, await hashing)
+        created_items.extend(created)
+        updated_items.extend(updated)
+        batch_stats.append({
+            "batch": len(batch_stats) + 1,
+            "rows": len(batch),
+            "created": len(created),
+            "updated": len(updated),
+        })
+
+    # 流水线：第 N 批写库的同时，第 N+1 批的密码在 bcrypt 进程池中计算
+    try:
+        while True:
+            batch = await run_blocking("storage", next, batches, None)
+            if batch is None:
+                break
+            hashing = asyncio.ensure_future(_hash_import_batch(batch, default_hash))
+            previous, pending = pending, (batch, hashing)
+            if previous is not None:
+                await write(*previous)
+        if pending is not None:
+            last, pending = pending, None
+            await write(*last)
+        await run_blocking("db", db.commit)
+    except Exception as e:
+        if pending is not None:
+            pending[1].cancel()
+        await run_blocking("db", db.rollback)
+        if isinstance(e, pymysql.MySQLError):
+            logger.error(f"用户导入数据库错误: {str(e)}")
+            raise HTTPException(status_code=500, detail="用户导入失败")
+        raise
+
+    # 新建的账号不在身份缓存中，只需失效被更新的账号；导入会覆盖其密码，旧 token 一并吊销
+    updated_keys = [(item["user_type"], item["id"]) for item in updated_items]
+    identity_cache.invalidate_many(updated_keys)
+    revoke_many_user_tokens(updated_keys)
+    return {
+        "message": "导入完成",
+        "created": len(created_items),
+        "updated": len(updated_items),
+        "batches": batch_stats,
+        "created_items": created_items,
+        "updated_items": updated_items,
+    }
 
 
 @router.put(
@@ -1571,9 +1801,6 @@ def bind_email(
             cursor.close()
 
 
-
-
-
 def _validate_school_exists(cursor: pymysql.cursors.Cursor, school_id: int) -> bool:
     """校验学校ID是否存在"""
     cursor.execute("SELECT 1 FROM schools WHERE school_id = %s LIMIT 1", (school_id,))
@@ -1608,11 +1835,10 @@ def bind_school(
     payload: UserBindSchool,
     db: pymysql.connections.Connection = Depends(get_db),
     user_type: str = Query("admin", description="用户类型：student/teacher/admin"),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 1. 校验管理员权限
-    current_user_info = _parse_current_user(current_user)
-    user_roles = current_user_info.get("roles", [])
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
     
@@ -1678,11 +1904,10 @@ def bind_department(
     payload: UserBindDepartment,
     db: pymysql.connections.Connection = Depends(get_db),
     user_type: str = Query("admin", description="用户类型：student/teacher/admin"),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 1. 校验管理员权限
-    current_user_info = _parse_current_user(current_user)
-    user_roles = current_user_info.get("roles", [])
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="仅管理员可执行此操作")
     
@@ -1921,14 +2146,11 @@ class UserRoleChangeRequest(BaseModel):
 def change_user_role(
     payload: UserRoleChangeRequest,
     db: pymysql.connections.Connection = Depends(get_db),
-    current_user: Optional[str] = Query(None, description="管理员信息(JSON字符串，包含 sub/username/roles)"),
+    current_user: dict = Depends(get_current_user),
 ):
     # 解析并验证当前操作用户
-    current_user_info = _parse_current_user(current_user)
-    login_user_id = current_user_info.get("sub", 0)
-    user_roles = current_user_info.get("roles", [])
-    if login_user_id <= 0:
-        raise HTTPException(status_code=401, detail="请先登录后再操作")
+    login_user_id = current_user["sub"]
+    user_roles = current_user.get("roles", [])
     if "admin" not in user_roles and "管理员" not in user_roles:
         raise HTTPException(status_code=403, detail="无权限执行角色转换：仅管理员可操作")
     # 验证请求参数合法性
@@ -2013,6 +2235,7 @@ def change_user_role(
         )
         # 提交事务
         db.commit()
+        identity_cache.invalidate(original_role, original_sub)
         return {
             "code": 200,
             "message": f"用户角色已从{original_role}成功转换为{new_role}",
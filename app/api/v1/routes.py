@@ -9,6 +9,7 @@ from app.api.v1.endpoints import (
 	ai_review,
 	annotations,
 	admin,
+	jobs,
 	notifications,
 	users,
 )
@@ -22,6 +23,7 @@ api_router.include_router(papers.router, prefix="/papers", tags=["论文"])
 api_router.include_router(ai_review.router, prefix="/papers", tags=["AI评审"])
 api_router.include_router(annotations.router, prefix="/annotations", tags=["标注"])
 api_router.include_router(admin.router, prefix="/admin", tags=["管理"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["任务"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["通知"])
 api_router.include_router(users.router, prefix="/users", tags=["用户"])
 
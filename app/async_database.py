@@ -0,0 +1,258 @@
+"""异步数据库连接与依赖（基于 aiomysql，可选）。
+
+本文件提供 `get_async_db` 依赖，供高并发的只读接口使用：
+
+    async def endpoint(db=Depends(get_async_db)):
+        cursor = await db.cursor(DictCursor)
+        await cursor.execute(...)
+        rows = await cursor.fetchall()
+        await cursor.close()
+
+也可以使用 `async with db.cursor() as cursor:`。
+
+安装 aiomysql 且 `ASYNC_DB_ENABLED=true` 时使用原生 asyncio 连接池，
+一个 worker 可以同时挂起大量查询而不占用线程；否则退化为
+同步连接池 + db 线程池的适配实现，调用方写法不变。
+连接参数与 `app.database` 共用同一份 `DATABASE_URL` 解析结果。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import AsyncGenerator, Dict, Optional
+
+import pymysql
+import pymysql.cursors
+
+from app.config import settings
+from app.core.executor import run_blocking
+from app.core import slow_query
+from app.core.sql_stats import current_stats, record_query
+from app.database import _CONN_PARAMS, PoolTimeoutError, get_connection
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+
+# aiomysql 与 pymysql 的游标类不能混用，按当前实现导出
+DictCursor = aiomysql.DictCursor if aiomysql is not None else pymysql.cursors.DictCursor
+
+
+def async_db_enabled() -> bool:
+    return aiomysql is not None and settings.ASYNC_DB_ENABLED
+
+
+class _ThreadedCursor:
+    """把 pymysql 游标包装成 aiomysql 风格的异步接口。"""
+
+    def __init__(self, cursor: pymysql.cursors.Cursor):
+        self._cursor = cursor
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    async def execute(self, query: str, args=None) -> int:
+        return await run_blocking("db", self._cursor.execute, query, args)
+
+    async def executemany(self, query: str, args) -> int:
+        return await run_blocking("db", self._cursor.executemany, query, args)
+
+    # pymysql 默认游标在 execute 时已缓冲全部结果，fetch 不会阻塞
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchmany(self, size: Optional[int] = None):
+        return self._cursor.fetchmany(size)
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def close(self) -> None:
+        self._cursor.close()
+
+    async def _ready(self) -> "_ThreadedCursor":
+        return self
+
+    def __await__(self):
+        # 兼容 aiomysql 的 `cursor = await db.cursor()` 写法
+        return self._ready().__await__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class _ThreadedConnection:
+    """同步连接池连接的异步适配器。"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, cursor_class=None) -> _ThreadedCursor:
+        if cursor_class is None:
+            return _ThreadedCursor(self._conn.cursor())
+        return _ThreadedCursor(self._conn.cursor(cursor_class))
+
+    async def commit(self) -> None:
+        await run_blocking("db", self._conn.commit)
+
+    async def rollback(self) -> None:
+        await run_blocking("db", self._conn.rollback)
+
+    async def close(self) -> None:
+        await run_blocking("db", self._conn.close)
+
+
+class _TracedCursor:
+    """aiomysql 游标代理，execute/executemany 计入请求级 SQL 统计与慢查询日志。"""
+
+    def __init__(self, pending):
+        # aiomysql 的 conn.cursor() 返回需要 await 的对象
+        self._pending = pending
+        self._cursor = None
+
+    async def _ready(self) -> "_TracedCursor":
+        if self._cursor is None:
+            self._cursor = await self._pending
+        return self
+
+    def __await__(self):
+        return self._ready().__await__()
+
+    async def __aenter__(self):
+        return await self._ready()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def execute(self, query: str, args=None) -> int:
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self._cursor.rowcount, args)
+
+    async def executemany(self, query: str, args) -> int:
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self._cursor.rowcount, args, many=True)
+
+    async def close(self) -> None:
+        if self._cursor is not None:
+            await self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TracedConnection:
+    """aiomysql 连接代理，只替换 `cursor()`，其余方法原样透传。"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *cursors) -> _TracedCursor:
+        return _TracedCursor(self._conn.cursor(*cursors))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+_async_pool = None
+_async_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_async_pool():
+    """惰性创建 aiomysql 连接池（仅在 `async_db_enabled()` 时可用）。"""
+    global _async_pool, _async_pool_lock
+    if not async_db_enabled():
+        raise RuntimeError("aiomysql 未安装或未启用异步数据库")
+    if _async_pool is not None:
+        return _async_pool
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+    async with _async_pool_lock:
+        if _async_pool is None:
+            _async_pool = await aiomysql.create_pool(
+                minsize=settings.ASYNC_DB_POOL_MIN_SIZE,
+                maxsize=settings.ASYNC_DB_POOL_MAX_SIZE,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                host=_CONN_PARAMS['host'],
+                port=_CONN_PARAMS['port'],
+                user=_CONN_PARAMS['user'],
+                password=_CONN_PARAMS['password'],
+                db=_CONN_PARAMS['database'],
+                charset=_CONN_PARAMS.get('charset', 'utf8mb4'),
+                autocommit=False,
+            )
+    return _async_pool
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+def async_pool_stats() -> Dict:
+    if _async_pool is None:
+        return {"enabled": async_db_enabled(), "size": 0, "idle": 0, "in_use": 0}
+    size = _async_pool.size
+    idle = _async_pool.freesize
+    return {
+        "enabled": True,
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "min_size": _async_pool.minsize,
+        "max_size": _async_pool.maxsize,
+    }
+
+
+async def get_async_db() -> AsyncGenerator:
+    """FastAPI dependency that yields an async MySQL connection.
+
+    归还前会回滚未提交的事务；超过 `DB_POOL_TIMEOUT` 仍拿不到连接时抛出 `PoolTimeoutError`。
+    """
+    if not async_db_enabled():
+        conn = _ThreadedConnection(await run_blocking("db", get_connection))
+        try:
+            yield conn
+        finally:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+        return
+
+    pool = await get_async_pool()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), timeout=settings.DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolTimeoutError(
+            2013, f"获取异步数据库连接超时（{settings.DB_POOL_TIMEOUT:.1f}s，最大连接数 {pool.maxsize}）"
+        )
+    try:
+        traced = current_stats() is not None or slow_query.enabled()
+        yield _TracedConnection(conn) if traced else conn
+    finally:
+        try:
+            await conn.rollback()
+        except Exception:
+            # 回滚失败说明连接已不可用，关闭后由连接池丢弃
+            conn.close()
+        pool.release(conn)
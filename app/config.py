@@ -35,10 +35,71 @@ class Settings(BaseSettings):
     MYSQL_USER: str 
     MYSQL_PASSWORD: str 
     MYSQL_DATABASE: str
+    # Connection pool
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT: float = 10.0  # 获取连接的最长等待秒数
+    DB_POOL_RECYCLE: int = 1800  # 空闲超过该秒数的连接会被重建
+    DB_POOL_PRE_PING: bool = True
+    # Async connection pool (需要安装 aiomysql，未安装时自动退化为线程池实现)
+    ASYNC_DB_ENABLED: bool = True
+    ASYNC_DB_POOL_MIN_SIZE: int = 1
+    ASYNC_DB_POOL_MAX_SIZE: int = 50
+    # Blocking executors (async 接口中的阻塞任务线程池)
+    EXECUTOR_DB_WORKERS: int = 10
+    EXECUTOR_STORAGE_WORKERS: int = 4
+    EXECUTOR_CONVERT_WORKERS: int = 2
+    EXECUTOR_AI_WORKERS: int = 4
+    # Uploads (论文/材料/模板按块写入内容寻址存储 doc/blobs，边写边校验大小)
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024  # 单个上传文件的大小上限
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 每次读取/写入的字节数
+    IMPORT_MAX_BYTES: int = 50 * 1024 * 1024  # 用户/群组导入文件的大小上限
+    BLOB_GC_GRACE_SECONDS: int = 24 * 3600  # 引用数为 0 的 blob 至少保留的秒数，之后才能被回收
+    # User import
+    USER_IMPORT_BATCH_SIZE: int = 500  # 每批 executemany 的行数
+    # Background import jobs (用户/群组导入提交为任务时使用)
+    IMPORT_JOB_DIR: str = "data/import_jobs"  # 上传文件与失败行 CSV 的落盘目录，多机部署需为共享目录
+    IMPORT_JOB_WORKERS: int = 1  # 每个进程同时执行的导入任务数
+    IMPORT_JOB_CHUNK_SIZE: int = 500  # 每个事务处理的行数
+    IMPORT_JOB_STALE_SECONDS: int = 600  # 超过该秒数没有进度的未完成任务，启动时标记为中断
+    IMPORT_JOB_RETENTION_DAYS: int = 7  # 已结束任务的文件保留天数
+    # Password hashing process pool (bcrypt)
+    PASSWORD_HASH_WORKERS: int = 2  # 进程数，0 表示在接口线程中直接计算
+    PASSWORD_HASH_MAX_PENDING: int = 64  # 排队+执行中的任务上限，超出时返回 503
+    # Per-request SQL statistics
+    SQL_STATS_ENABLED: bool = True
+    SQL_REPEAT_WARN_THRESHOLD: int = 10  # 同一语句形状在单个请求内超过该次数时告警（疑似 N+1）
+    # Slow query log
+    SLOW_QUERY_THRESHOLD_MS: int = 500  # 0 表示关闭
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_EXPLAIN_INTERVAL: int = 60  # 同一语句形状两次 EXPLAIN 的最小间隔秒数
+    SLOW_QUERY_LOG_FILE: str = "logs/slow_query.log"
+    SLOW_QUERY_LOG_MAX_BYTES: int = 20 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS: int = 5
+    # List total count cache
+    COUNT_CACHE_TTL: int = 30  # 精确总数缓存秒数，0 表示关闭
+    COUNT_CACHE_STALE_TTL: int = 300  # include_total=approx 时可接受的旧值最长秒数
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+    # Caller identity cache
+    IDENTITY_CACHE_TTL: int = 300  # 秒，0 表示关闭
+    IDENTITY_CACHE_MAX_SIZE: int = 10000
+    # Paper ownership (owner_id/teacher_id) cache
+    PAPER_ACL_CACHE_TTL: int = 300  # 秒，0 表示关闭
+    PAPER_ACL_CACHE_MAX_SIZE: int = 20000
+    # Shared cache / cross-worker invalidation (redis 需要安装 redis 包)
+    CACHE_BACKEND: str = "memory"  # memory / redis
+    CACHE_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    CACHE_KEY_PREFIX: str = "cdai:"
+    CACHE_INVALIDATION_CHANNEL: str = "cdai:cache-invalidation"
+    CACHE_MEMORY_MAX_ENTRIES: int = 10000
+    AI_REPORT_CACHE_TTL: int = 7 * 24 * 3600  # 秒，0 表示不过期
     # Auth
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     SECRET_KEY: SecretStr = SecretStr("change-me")
     ALGORITHM: str = "HS256"
+    AUTH_ALLOW_LEGACY_CURRENT_USER: bool = False  # 迁移期：无 token 时接受未签名的 current_user 参数
+    TOKEN_CACHE_TTL: int = 300  # 已验证 token 的缓存秒数（不超过 token 的 exp），0 表示关闭
+    TOKEN_CACHE_MAX_SIZE: int = 10000
 
     def parse_cors(self) -> List[str]:
         v = self.CORS_ORIGINS
@@ -0,0 +1,119 @@
+"""
+列表总数缓存
+
+分页列表每一页都会带同样过滤条件的 COUNT(*)。这里按“规范化后的计数 SQL + 参数”
+缓存结果，TTL 较短（`COUNT_CACHE_TTL`），并记录依赖的表：对应表发生写入时调用
+`invalidate(table)`，精确模式不会再命中旧值。
+
+`include_total=approx` 时允许使用已失效但未超过 `COUNT_CACHE_STALE_TTL` 的旧值；
+连旧值都没有时用 EXPLAIN 的行数估算（无过滤条件时取 information_schema 的表行数），
+不执行真正的 COUNT(*)。
+
+缓存是进程内的；表版本的变更经 `app.core.shared_cache` 广播，其它 worker 收到后
+同样递增版本号（`memory` 后端下跨进程的写入只能依赖 TTL 过期）。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.core import shared_cache
+
+_Key = Tuple[str, Tuple[Any, ...]]
+
+_NAMESPACE = "count"
+
+_lock = threading.Lock()
+# key -> (总数, 写入时间, 依赖表, 写入时各依赖表的版本)
+_entries: "OrderedDict[_Key, Tuple[int, float, Tuple[str, ...], Tuple[int, ...]]]" = OrderedDict()
+_versions: Dict[str, int] = {}
+_hits = 0
+_stale_hits = 0
+_misses = 0
+
+
+def make_key(sql: str, params: Optional[Sequence[Any]]) -> _Key:
+    return " ".join(sql.split()), tuple(params or ())
+
+
+def table_versions(tables: Iterable[str]) -> Tuple[int, ...]:
+    """执行 COUNT 之前先取版本号，计数期间发生的写入会让这次结果直接视为过期。"""
+    return tuple(_versions.get(t, 0) for t in tables)
+
+
+def get(key: _Key, allow_stale: bool = False) -> Optional[Tuple[int, bool]]:
+    """取缓存总数，返回 (总数, 是否仍然有效)。
+
+    allow_stale 时接受依赖表已变更或超过 TTL（但未超过 STALE_TTL）的旧值。
+    """
+    global _hits, _stale_hits, _misses
+    if settings.COUNT_CACHE_TTL <= 0:
+        return None
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            value, stored_at, tables, versions = entry
+            age = now - stored_at
+            fresh = age < settings.COUNT_CACHE_TTL and table_versions(tables) == versions
+            if fresh:
+                _entries.move_to_end(key)
+                _hits += 1
+                return value, True
+            if allow_stale and age < settings.COUNT_CACHE_STALE_TTL:
+                _stale_hits += 1
+                return value, False
+        _misses += 1
+        return None
+
+
+def put(key: _Key, value: int, tables: Sequence[str], versions: Tuple[int, ...]) -> None:
+    if settings.COUNT_CACHE_TTL <= 0:
+        return
+    with _lock:
+        _entries[key] = (int(value), time.monotonic(), tuple(tables), versions)
+        _entries.move_to_end(key)
+        while len(_entries) > settings.COUNT_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def _bump(tables: Iterable[str]) -> None:
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def invalidate(*tables: str) -> None:
+    """表发生写入后调用；依赖这些表的精确缓存随即失效（旧值仍可供 approx 使用）。"""
+    _bump(tables)
+    shared_cache.broadcast(_NAMESPACE, tables)
+
+
+def _on_remote_invalidate(tables: Optional[List[str]]) -> None:
+    if tables is None:
+        clear()
+    else:
+        _bump(tables)
+
+
+shared_cache.subscribe(_NAMESPACE, _on_remote_invalidate)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def count_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "entries": len(_entries),
+            "hits": _hits,
+            "stale_hits": _stale_hits,
+            "misses": _misses,
+            "ttl": settings.COUNT_CACHE_TTL,
+            "stale_ttl": settings.COUNT_CACHE_STALE_TTL,
+        }
@@ -1,34 +1,157 @@
 """
 依赖注入
+
+`get_current_user` 是所有接口统一的调用者依赖：
+- 校验 `Authorization: Bearer <JWT>`（登录接口签发），每个请求只解码一次，结果缓存在 `request.state.principal`
+- 通过进程内身份缓存（`app.core.identity_cache`）确认调用者在 students/teachers/admins 表中存在，
+  命中缓存时不访问数据库；未命中时借出一条连接，查完立即归还，不与接口的连接同时占用连接池
+- 返回 `{"sub", "username", "roles", "user_type", "identity"}`，roles 中总会包含 user_type
+
+迁移期间可设置 `AUTH_ALLOW_LEGACY_CURRENT_USER=true`，在未携带 token 时仍接受旧的
+`current_user` 查询参数或 `X-Current-User` 请求头（JSON 字符串），但同样要求用户真实存在。
 """
-from typing import Generator
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import json
+import urllib.parse
+from typing import Any, Dict, List, Optional
+
 import pymysql
-from app.database import get_db
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from loguru import logger
+
+from app.config import settings
+from app.core import identity_cache
 from app.core.security import decode_access_token
+from app.database import get_connection
+
+security = HTTPBearer(auto_error=False)
+
+# 角色名（含中文别名）-> 用户类型
+_ROLE_USER_TYPES = {
+    "admin": "admin",
+    "管理员": "admin",
+    "teacher": "teacher",
+    "教师": "teacher",
+    "student": "student",
+    "学生": "student",
+}
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _normalize_roles(roles: Any) -> List[str]:
+    if isinstance(roles, str):
+        roles = [roles]
+    if not isinstance(roles, (list, tuple)):
+        return []
+    return [str(r).strip() for r in roles if str(r).strip()]
 
-security = HTTPBearer()
+
+def _resolve_user_type(payload: Dict[str, Any], roles: List[str]) -> Optional[str]:
+    user_type = str(payload.get("user_type") or "").strip().lower()
+    if user_type in identity_cache.IDENTITY_TABLES:
+        return user_type
+    # 旧 token / 旧参数没有 user_type 时按角色推断，优先级 admin > teacher > student
+    found = {_ROLE_USER_TYPES.get(r.lower()) for r in roles}
+    for candidate in ("admin", "teacher", "student"):
+        if candidate in found:
+            return candidate
+    return None
+
+
+def _parse_legacy_current_user(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    """解析旧的 current_user JSON 字符串（纯数字视为学生ID）。"""
+    if not raw:
+        return None
+    raw = urllib.parse.unquote(raw).strip()
+    if not raw:
+        return None
+    if raw.isdigit():
+        return {"sub": int(raw), "roles": ["student"]}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _legacy_payload(request: Request) -> Optional[Dict[str, Any]]:
+    if not settings.AUTH_ALLOW_LEGACY_CURRENT_USER:
+        return None
+    payload = _parse_legacy_current_user(
+        request.query_params.get("current_user") or request.headers.get("X-Current-User")
+    )
+    if payload is not None:
+        logger.warning("请求 {} 使用了未签名的 current_user 参数，请改用 Bearer token", request.url.path)
+    return payload
+
+
+def _build_principal(payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        sub = int(payload.get("sub") or 0)
+    except (TypeError, ValueError):
+        sub = 0
+    if sub <= 0:
+        raise _unauthorized("无效的认证凭据")
+    roles = _normalize_roles(payload.get("roles"))
+    user_type = _resolve_user_type(payload, roles)
+    if user_type is None:
+        raise _unauthorized("无法识别用户类型")
+
+    identity = identity_cache.get(user_type, sub)
+    if identity is None:
+        # 不使用请求的 get_db 连接：那条连接会保留到响应结束，接口再自行借连接时同一请求就占用两条
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                identity = identity_cache.lookup(cursor, user_type, sub)
+        finally:
+            conn.close()
+    if identity is None:
+        raise _unauthorized("当前用户在系统中不存在或已被删除")
+
+    if user_type not in roles:
+        roles.append(user_type)
+    return {
+        "sub": sub,
+        "username": identity["code"],
+        "roles": roles,
+        "user_type": user_type,
+        "identity": identity,
+    }
 
 
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: pymysql.connections.Connection = Depends(get_db)
-):
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> Dict[str, Any]:
     """
     获取当前用户
-    从JWT token中解析用户信息
+    校验 JWT 并确认用户存在，同一请求内只解析一次
     """
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="无效的认证凭据",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # 这里应该使用原生 SQL 通过 `db.cursor()` 查询用户信息并返回用户对象
-    return payload  # 临时返回payload，实际使用时应该返回用户对象
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+
+    if credentials is not None:
+        payload = decode_access_token(credentials.credentials)
+        if payload is None:
+            raise _unauthorized("无效的认证凭据")
+    else:
+        payload = _legacy_payload(request)
+        if payload is None:
+            raise _unauthorized("请先登录后再操作")
 
+    try:
+        principal = _build_principal(payload)
+    except pymysql.MySQLError as e:
+        logger.error(f"校验调用者身份数据库错误: {str(e)}")
+        raise HTTPException(status_code=500, detail="校验用户身份失败")
+    request.state.principal = principal
+    return principal
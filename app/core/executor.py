@@ -0,0 +1,297 @@
+"""
+阻塞任务执行层
+
+async 接口中的 pymysql 查询、文件读写、文档转换等阻塞操作统一交给这里的
+有界线程池执行，避免卡住事件循环。按用途划分为多个池，互不抢占：
+
+- db：数据库查询与写入
+- storage：本地/OSS 文件读写、打包
+- convert：docx 转 pdf 等外部进程调用
+- ai：AI 评审调用
+- import：后台导入任务（`app.services.import_jobs`）
+
+CPU 密集且持有 GIL 的计算（bcrypt 密码哈希/校验）放在独立的进程池中：
+
+- bcrypt：密码哈希与校验，排队+执行中的任务超过上限时直接拒绝（`ExecutorBusy`），
+  避免登录高峰时请求无限堆积
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, TypeVar, Union
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class BlockingPool:
+    """带排队指标的有界线程池。"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-worker"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._max_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_time_total = 0.0
+        self._run_time_total = 0.0
+
+    def _wrap(self, func: Callable[[], T]) -> Callable[[], T]:
+        enqueued_at = time.monotonic()
+
+        def runner() -> T:
+            started_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_time_total += started_at - enqueued_at
+            ok = False
+            try:
+                result = func()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._run_time_total += time.monotonic() - started_at
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        return runner
+
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        # 复制当前上下文，保证请求级 contextvars 在工作线程中可见
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, func, *args, **kwargs)
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+            if self._queued > self._max_queued:
+                self._max_queued = self._queued
+        return self._executor.submit(self._wrap(call))
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "max_queued": self._max_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._wait_time_total / finished * 1000, 3) if finished else 0.0,
+                "avg_run_ms": round(self._run_time_total / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class ExecutorBusy(RuntimeError):
+    """进程池排队已满。"""
+
+
+def _noop() -> None:
+    return None
+
+
+class ProcessPool:
+    """带排队上限与指标的进程池，接口与 BlockingPool 一致。
+
+    func 及其参数必须可以 pickle（模块级函数）。工作进程以 spawn 方式启动，
+    不继承父进程中的线程与连接；某个工作进程异常退出后整个池会被重建。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        self._pending = 0
+        self._max_pending_seen = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._latency_total = 0.0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _on_done(self, future: Future, submitted_at: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._latency_total += time.monotonic() - submitted_at
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def _restart(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = self._create_executor()
+                self._restarts += 1
+            executor = self._executor
+        broken.shutdown(wait=False, cancel_futures=True)
+        return executor
+
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorBusy(f"{self.name} 进程池排队已满（{self.max_pending}）")
+            self._pending += 1
+            self._submitted += 1
+            if self._pending > self._max_pending_seen:
+                self._max_pending_seen = self._pending
+            executor = self._executor
+        submitted_at = time.monotonic()
+        try:
+            try:
+                future = executor.submit(func, *args, **kwargs)
+            except BrokenProcessPool:
+                future = self._restart(executor).submit(func, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+                self._failed += 1
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, submitted_at))
+        return future
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def call(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """同步调用：在当前线程等待结果（供同步接口使用，计算本身不占用本进程的 GIL）。"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def warm_up(self) -> None:
+        """提前拉起全部工作进程，避免第一批请求承担进程启动耗时。"""
+        futures = [self._executor.submit(_noop) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "max_pending_seen": self._max_pending_seen,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "restarts": self._restarts,
+                "avg_latency_ms": round(self._latency_total / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_POOL_SIZES = {
+    "db": lambda: settings.EXECUTOR_DB_WORKERS,
+    "storage": lambda: settings.EXECUTOR_STORAGE_WORKERS,
+    "convert": lambda: settings.EXECUTOR_CONVERT_WORKERS,
+    "ai": lambda: settings.EXECUTOR_AI_WORKERS,
+    "import": lambda: settings.IMPORT_JOB_WORKERS,
+}
+
+# 进程池：名称 -> (进程数, 排队上限)
+_PROCESS_POOL_SIZES = {
+    "bcrypt": (lambda: settings.PASSWORD_HASH_WORKERS, lambda: settings.PASSWORD_HASH_MAX_PENDING),
+}
+
+AnyPool = Union[BlockingPool, ProcessPool]
+
+_pools: Dict[str, AnyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _create_pool(name: str) -> AnyPool:
+    if name in _POOL_SIZES:
+        return BlockingPool(name, _POOL_SIZES[name]())
+    if name in _PROCESS_POOL_SIZES:
+        workers, max_pending = _PROCESS_POOL_SIZES[name]
+        return ProcessPool(name, workers(), max_pending())
+    raise ValueError(f"未知的执行池：{name}")
+
+
+def get_executor(name: str) -> AnyPool:
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _create_pool(name)
+            _pools[name] = pool
+    return pool
+
+
+async def run_blocking(pool: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在指定线程池（或进程池）中执行阻塞函数并等待结果。"""
+    return await get_executor(pool).run(func, *args, **kwargs)
+
+
+def offload(pool: str):
+    """把同步的路由函数整体放到指定线程池执行。
+
+    装饰后的函数是协程函数，FastAPI 通过 `__wrapped__` 读取原函数签名，
+    依赖注入与参数校验不受影响：
+
+        @router.get("/xxx")
+        @offload("db")
+        def handler(...):
+            ...
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await run_blocking(pool, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in list(_pools.items())}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,132 @@
+"""
+调用者身份缓存
+
+各接口在处理前都会按 `(用户类型, 自增ID)` 到 students/teachers/admins 表确认调用者存在，
+这些记录几乎不变。这里在进程内缓存查到的身份（LRU，带 TTL 与容量上限），
+命中时不再访问数据库。
+
+只缓存“存在”的结果：新建用户无需失效，不存在的 ID 每次都会回库确认。
+更新、删除、角色转换后调用 `invalidate(user_type, user_id)`（批量导入用 `invalidate_many`），
+并通过 `app.core.shared_cache` 广播给其它进程（`memory` 后端下依赖 TTL 过期）。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core import shared_cache
+from app.core.ttl_cache import TTLCache
+
+# 用户类型 -> (表名, 业务账号列)
+IDENTITY_TABLES = {
+    "student": ("students", "student_id"),
+    "teacher": ("teachers", "teacher_id"),
+    "admin": ("admins", "admin_id"),
+}
+
+_NAMESPACE = "identity"
+
+_cache = TTLCache(
+    max_size=lambda: settings.IDENTITY_CACHE_MAX_SIZE,
+    ttl=lambda: settings.IDENTITY_CACHE_TTL,
+)
+
+
+def _key(user_type: str, user_id: Any) -> Optional[Tuple[str, int]]:
+    try:
+        return user_type, int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def get(user_type: str, user_id: Any) -> Optional[Dict[str, Any]]:
+    key = _key(user_type, user_id)
+    return _cache.get(key) if key is not None else None
+
+
+def put(user_type: str, user_id: Any, identity: Dict[str, Any]) -> None:
+    key = _key(user_type, user_id)
+    if key is not None:
+        _cache.put(key, identity)
+
+
+def invalidate(user_type: str, user_id: Any) -> None:
+    key = _key(user_type, user_id)
+    if key is not None:
+        _cache.pop(key)
+        shared_cache.broadcast(_NAMESPACE, [list(key)])
+
+
+def invalidate_many(keys: List[Tuple[str, Any]]) -> None:
+    """批量失效（批量导入后调用），只广播一条消息。"""
+    valid = [k for k in (_key(user_type, user_id) for user_type, user_id in keys) if k is not None]
+    if not valid:
+        return
+    for key in valid:
+        _cache.pop(key)
+    shared_cache.broadcast(_NAMESPACE, [list(k) for k in valid])
+
+
+def clear() -> None:
+    _cache.clear()
+    shared_cache.broadcast(_NAMESPACE)
+
+
+def _on_remote_invalidate(keys: Optional[List[Any]]) -> None:
+    if keys is None:
+        _cache.clear()
+        return
+    for user_type, user_id in keys:
+        _cache.pop((user_type, int(user_id)))
+
+
+shared_cache.subscribe(_NAMESPACE, _on_remote_invalidate)
+
+
+def _select_sql(user_type: str) -> str:
+    table, code_col = IDENTITY_TABLES[user_type]
+    return f"SELECT `id`, `{code_col}`, `name` FROM `{table}` WHERE `id` = %s"
+
+
+def _to_identity(user_type: str, row: Any) -> Dict[str, Any]:
+    if isinstance(row, dict):
+        values = list(row.values())
+    else:
+        values = list(row)
+    return {"user_type": user_type, "id": int(values[0]), "code": values[1], "name": values[2]}
+
+
+def lookup(cursor, user_type: str, user_id: Any) -> Optional[Dict[str, Any]]:
+    """按用户类型与自增ID取身份 {user_type, id, code, name}，不存在时返回 None。"""
+    if user_type not in IDENTITY_TABLES:
+        return None
+    identity = get(user_type, user_id)
+    if identity is not None:
+        return identity
+    cursor.execute(_select_sql(user_type), (user_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    identity = _to_identity(user_type, row)
+    put(user_type, user_id, identity)
+    return identity
+
+
+async def lookup_async(cursor, user_type: str, user_id: Any) -> Optional[Dict[str, Any]]:
+    """`lookup` 的异步游标版本。"""
+    if user_type not in IDENTITY_TABLES:
+        return None
+    identity = get(user_type, user_id)
+    if identity is not None:
+        return identity
+    await cursor.execute(_select_sql(user_type), (user_id,))
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    identity = _to_identity(user_type, row)
+    put(user_type, user_id, identity)
+    return identity
+
+
+def identity_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
@@ -0,0 +1,160 @@
+"""
+列表分页工具
+
+除传统的 `page/page_size`（LIMIT/OFFSET）外，列表接口支持游标分页（keyset）：
+按 `(时间列, id)` 倒序排列，游标记录上一页最后一行的排序键，下一页用
+`(t < ? OR (t = ? AND id < ?))` 直接从索引位置继续扫描，深翻页不再随偏移量线性变慢。
+
+游标对客户端是不透明字符串（排序键 JSON 的 base64url 编码），只能原样回传。
+
+`include_total` 控制总数的获取方式（结果经 `app.core.count_cache` 缓存）：
+- `exact`：精确总数（偏移分页默认），缓存在依赖表写入后失效
+- `approx`：允许返回稍旧的缓存值或 EXPLAIN 估算值，响应中 `total_estimated=true`
+- `false`：不返回总数（游标分页默认），无限滚动场景无需每次统计
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.core import count_cache
+
+INCLUDE_TOTAL_EXACT = "exact"
+INCLUDE_TOTAL_APPROX = "approx"
+INCLUDE_TOTAL_NONE = "false"
+INCLUDE_TOTAL_CHOICES = (INCLUDE_TOTAL_EXACT, INCLUDE_TOTAL_APPROX, INCLUDE_TOTAL_NONE)
+
+_TABLE_ROWS_SQL = (
+    "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+)
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    payload = json.dumps([sort_value.isoformat(), int(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标；格式不对时返回 400。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def keyset_condition(time_column: str, id_column: str) -> str:
+    """倒序 keyset 条件，参数由 `keyset_params` 生成。"""
+    return f"({time_column} < %s OR ({time_column} = %s AND {id_column} < %s))"
+
+
+def keyset_params(cursor: Tuple[datetime, int]) -> List[Any]:
+    sort_value, row_id = cursor
+    return [sort_value, sort_value, row_id]
+
+
+def resolve_include_total(value: Optional[str], cursor_mode: bool) -> str:
+    if value is None or value == "":
+        return INCLUDE_TOTAL_NONE if cursor_mode else INCLUDE_TOTAL_EXACT
+    value = value.lower()
+    if value not in INCLUDE_TOTAL_CHOICES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"include_total 仅支持：{' / '.join(INCLUDE_TOTAL_CHOICES)}",
+        )
+    return value
+
+
+def split_page(rows: Sequence[Any], page_size: int) -> Tuple[List[Any], bool]:
+    """查询时多取一行用于判断是否还有下一页，这里截掉多取的那行。"""
+    rows = list(rows)
+    return rows[:page_size], len(rows) > page_size
+
+
+def total_pages(total: Optional[int], page_size: int) -> Optional[int]:
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
+
+
+def _first_value(row: Any) -> int:
+    if not row:
+        return 0
+    value = next(iter(row.values())) if isinstance(row, dict) else row[0]
+    return int(value or 0)
+
+
+def _explain_rows(description: Any, rows: Sequence[Any]) -> Optional[int]:
+    """从 EXPLAIN 结果第一行取 rows × filtered% 作为估算；计划被优化掉时返回 None。"""
+    if not rows:
+        return None
+    first = rows[0]
+    if not isinstance(first, dict):
+        first = dict(zip([d[0] for d in description], first))
+    estimate = first.get("rows")
+    if estimate is None:
+        return None
+    filtered = first.get("filtered")
+    return int(int(estimate) * (float(filtered) if filtered is not None else 100.0) / 100)
+
+
+def _cached_total(count_sql: str, params: Sequence[Any], mode: str) -> Tuple[Any, Optional[Tuple[int, bool]]]:
+    key = count_cache.make_key(count_sql, params)
+    return key, count_cache.get(key, allow_stale=mode == INCLUDE_TOTAL_APPROX)
+
+
+def count_total(cursor, count_sql: str, params: Sequence[Any], tables: Sequence[str], mode: str) -> Tuple[Optional[int], bool]:
+    """按 include_total 模式取总数，返回 (总数, 是否为估算值)。tables[0] 为计数的主表。"""
+    if mode == INCLUDE_TOTAL_NONE:
+        return None, False
+    key, cached = _cached_total(count_sql, params, mode)
+    if cached is not None:
+        value, fresh = cached
+        return value, not fresh
+    if mode == INCLUDE_TOTAL_APPROX:
+        cursor.execute(f"EXPLAIN {count_sql}", params or None)
+        estimate = _explain_rows(cursor.description, cursor.fetchall())
+        if estimate is None:
+            cursor.execute(_TABLE_ROWS_SQL, (tables[0],))
+            estimate = _first_value(cursor.fetchone())
+        return estimate, True
+    versions = count_cache.table_versions(tables)
+    cursor.execute(count_sql, params or None)
+    total = _first_value(cursor.fetchone())
+    count_cache.put(key, total, tables, versions)
+    return total, False
+
+
+async def count_total_async(cursor, count_sql: str, params: Sequence[Any], tables: Sequence[str], mode: str) -> Tuple[Optional[int], bool]:
+    """`count_total` 的异步游标版本（aiomysql / 线程池回退连接）。"""
+    if mode == INCLUDE_TOTAL_NONE:
+        return None, False
+    key, cached = _cached_total(count_sql, params, mode)
+    if cached is not None:
+        value, fresh = cached
+        return value, not fresh
+    if mode == INCLUDE_TOTAL_APPROX:
+        await cursor.execute(f"EXPLAIN {count_sql}", params or None)
+        estimate = _explain_rows(cursor.description, await cursor.fetchall())
+        if estimate is None:
+            await cursor.execute(_TABLE_ROWS_SQL, (tables[0],))
+            estimate = _first_value(await cursor.fetchone())
+        return estimate, True
+    versions = count_cache.table_versions(tables)
+    await cursor.execute(count_sql, params or None)
+    total = _first_value(await cursor.fetchone())
+    count_cache.put(key, total, tables, versions)
+    return total, False
+
+
+def total_fields(total: Optional[int], estimated: bool, page_size: int) -> Dict[str, Any]:
+    """列表响应中与总数相关的字段。"""
+    return {
+        "total": total,
+        "total_pages": total_pages(total, page_size),
+        "total_estimated": estimated,
+    }
@@ -1,16 +1,49 @@
 """
 安全相关功能：密码加密、JWT token生成和验证
+
+已验证的 token 按 SHA-256 摘要缓存（`TOKEN_CACHE_TTL`，且不超过 token 自身的 exp），
+同一 token 在有效期内重复请求时不再做 HMAC 校验与 claims 解析。
+登出调用 `revoke_token`，修改/重置密码调用 `revoke_user_tokens`（批量导入用 `revoke_many_user_tokens`），
+立即让对应 token 失效，
+吊销记录经 `app.core.shared_cache` 广播给其它 worker。吊销记录只保存在进程内存中，
+进程重启后丢失，最长影响到 token 自然过期（`ACCESS_TOKEN_EXPIRE_MINUTES`）。
+
+bcrypt 哈希/校验每次约 100-300ms 且持有 GIL，统一交给 `bcrypt` 进程池
+（`PASSWORD_HASH_WORKERS`，0 表示不用进程池：同步接口在当前线程计算，
+`*_async` 版本放到 db 线程池，不阻塞事件循环）。async 接口使用 `*_async` 版本，
+排队超过 `PASSWORD_HASH_MAX_PENDING` 时返回 503。
 """
+import asyncio
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import jwt
 from jwt.exceptions import InvalidTokenError
 import bcrypt
+from fastapi import HTTPException
 from app.config import settings
+from app.core import shared_cache
+from app.core.executor import ExecutorBusy, get_executor, run_blocking
+from app.core.ttl_cache import TTLCache
 
+_NAMESPACE = "token"
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
+# 摘要 -> 已验证的 payload
+_verified = TTLCache(
+    max_size=lambda: settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=lambda: settings.TOKEN_CACHE_TTL,
+)
+_revoke_lock = threading.Lock()
+# 已吊销的 token 摘要 -> exp，过期后清理
+_revoked_tokens: Dict[str, float] = {}
+# (user_type, sub) -> 吊销时间，iat 早于该时间的 token 一律无效
+_revoked_before: Dict[Tuple[str, str], float] = {}
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（在 bcrypt 工作进程中执行）"""
     try:
         # bcrypt返回的是bytes，需要编码处理
         if isinstance(hashed_password, str):
@@ -22,8 +55,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 
-def get_password_hash(password: str) -> str:
-    """获取密码哈希值"""
+def _hashpw(password: str) -> str:
+    """获取密码哈希值（在 bcrypt 工作进程中执行）"""
     # 生成salt并哈希密码
     salt = bcrypt.gensalt()
     if isinstance(password, str):
@@ -32,24 +65,219 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+def _hashpw_many(passwords: List[str]) -> List[str]:
+    """批量哈希（在 bcrypt 工作进程中执行），一次提交处理多条，减少进程间往返。"""
+    return [_hashpw(p) for p in passwords]
+
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="请求过多，请稍后重试", headers={"Retry-After": "1"})
+
+
+def _use_pool() -> bool:
+    return settings.PASSWORD_HASH_WORKERS > 0
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（同步接口使用，当前线程等待进程池结果）"""
+    if not _use_pool():
+        return _checkpw(plain_password, hashed_password)
+    try:
+        return get_executor("bcrypt").call(_checkpw, plain_password, hashed_password)
+    except ExecutorBusy:
+        raise _busy()
+
+
+def get_password_hash(password: str) -> str:
+    """获取密码哈希值（同步接口使用）"""
+    if not _use_pool():
+        return _hashpw(password)
+    try:
+        return get_executor("bcrypt").call(_hashpw, password)
+    except ExecutorBusy:
+        raise _busy()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """验证密码，等待期间不占用事件循环与接口线程"""
+    if not _use_pool():
+        return await run_blocking("db", _checkpw, plain_password, hashed_password)
+    try:
+        return await get_executor("bcrypt").run(_checkpw, plain_password, hashed_password)
+    except ExecutorBusy:
+        raise _busy()
+
+
+async def get_password_hash_async(password: str) -> str:
+    if not _use_pool():
+        return await run_blocking("db", _hashpw, password)
+    try:
+        return await get_executor("bcrypt").run(_hashpw, password)
+    except ExecutorBusy:
+        raise _busy()
+
+
+def _split_for_pool(passwords: List[str], workers: int) -> List[List[str]]:
+    size = -(-len(passwords) // workers)
+    return [passwords[i:i + size] for i in range(0, len(passwords), size)]
+
+
+def get_password_hashes(passwords: List[str]) -> List[str]:
+    """批量哈希的同步版本（后台导入任务使用），结果顺序与输入一致"""
+    if not passwords:
+        return []
+    if not _use_pool():
+        return _hashpw_many(passwords)
+    pool = get_executor("bcrypt")
+    try:
+        futures = [pool.submit(_hashpw_many, chunk) for chunk in _split_for_pool(passwords, pool.max_workers)]
+    except ExecutorBusy:
+        raise _busy()
+    return [h for future in futures for h in future.result()]
+
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    """批量哈希：按进程数切块并行计算，结果顺序与输入一致（批量导入用户使用）"""
+    if not passwords:
+        return []
+    if not _use_pool():
+        return await run_blocking("db", _hashpw_many, passwords)
+    pool = get_executor("bcrypt")
+    try:
+        results = await asyncio.gather(
+            *(pool.run(_hashpw_many, chunk) for chunk in _split_for_pool(passwords, pool.max_workers))
+        )
+    except ExecutorBusy:
+        raise _busy()
+    return [h for chunk in results for h in chunk]
+
+
+def warm_up_password_pool() -> None:
+    """启动时拉起 bcrypt 工作进程。"""
+    if _use_pool():
+        get_executor("bcrypt").warm_up()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
     to_encode = data.copy()
+    # PyJWT 2.10 起要求 sub 为字符串，解码后由 get_current_user 转回整数
+    if "sub" in to_encode:
+        to_encode["sub"] = str(to_encode["sub"])
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    # iat 使用带小数的时间戳，便于与 revoke_user_tokens 的吊销时间精确比较
+    to_encode.update({"exp": expire, "iat": time.time()})
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY.get_secret_value(), algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _user_key(payload: Dict[str, Any]) -> Tuple[str, str]:
+    return str(payload.get("user_type") or ""), str(payload.get("sub"))
+
+
+def _is_revoked(digest: str, payload: Dict[str, Any]) -> bool:
+    with _revoke_lock:
+        if digest in _revoked_tokens:
+            return True
+        revoked_at = _revoked_before.get(_user_key(payload))
+    return revoked_at is not None and float(payload.get("iat") or 0) < revoked_at
+
+
 def decode_access_token(token: str) -> Optional[dict]:
-    """解码访问令牌"""
+    """解码访问令牌；签名无效、已过期或已吊销时返回 None"""
+    digest = _digest(token)
+    payload = _verified.get(digest)
+    if payload is not None and payload.get("exp", 0) <= time.time():
+        _verified.pop(digest)
+        return None
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY.get_secret_value(), algorithms=[settings.ALGORITHM])
+        except InvalidTokenError:
+            return None
+        _verified.put(digest, payload)
+    if _is_revoked(digest, payload):
+        return None
+    return dict(payload)
+
+
+def _prune_revocations(now: float) -> None:
+    """清理已过期的吊销记录（调用方持有 _revoke_lock）。"""
+    for digest in [d for d, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[digest]
+    horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for key in [k for k, ts in _revoked_before.items() if ts <= horizon]:
+        del _revoked_before[key]
+
+
+def _apply_revocations(items: List[Dict[str, Any]]) -> None:
+    now = time.time()
+    with _revoke_lock:
+        for item in items:
+            if "digest" in item:
+                _revoked_tokens[item["digest"]] = float(item["exp"])
+                _verified.pop(item["digest"])
+            else:
+                key = (str(item["user_type"]), str(item["sub"]))
+                _revoked_before[key] = max(_revoked_before.get(key, 0.0), float(item["before"]))
+        _prune_revocations(now)
+
+
+def revoke_token(token: str) -> None:
+    """吊销单个 token（登出），直到它自然过期。"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
+        payload = jwt.decode(
+            token,
+            settings.SECRET_KEY.get_secret_value(),
+            algorithms=[settings.ALGORITHM],
+            options={"verify_exp": False},
+        )
     except InvalidTokenError:
-        return None
+        return
+    item = {"digest": _digest(token), "exp": float(payload.get("exp", 0))}
+    _apply_revocations([item])
+    shared_cache.broadcast(_NAMESPACE, [item])
+
+
+def revoke_user_tokens(user_type: str, user_id: Any) -> None:
+    """吊销某个用户此前签发的全部 token（修改/重置密码后调用）。"""
+    item = {"user_type": user_type, "sub": str(user_id), "before": time.time()}
+    _apply_revocations([item])
+    shared_cache.broadcast(_NAMESPACE, [item])
+
+
+def revoke_many_user_tokens(users: List[Tuple[str, Any]]) -> None:
+    """批量吊销 (user_type, user_id) 的全部 token（批量导入覆盖密码后调用），只广播一条消息。"""
+    if not users:
+        return
+    before = time.time()
+    items = [{"user_type": user_type, "sub": str(user_id), "before": before} for user_type, user_id in users]
+    _apply_revocations(items)
+    shared_cache.broadcast(_NAMESPACE, items)
+
+
+def _on_remote_revoke(items: Optional[List[Dict[str, Any]]]) -> None:
+    if items is None:
+        _verified.clear()
+        return
+    _apply_revocations(items)
+
+
+shared_cache.subscribe(_NAMESPACE, _on_remote_revoke)
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    stats = _verified.stats()
+    with _revoke_lock:
+        stats["revoked_tokens"] = len(_revoked_tokens)
+        stats["revoked_users"] = len(_revoked_before)
+    return stats
 
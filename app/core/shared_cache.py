@@ -0,0 +1,365 @@
+"""
+共享缓存与跨进程失效广播
+
+多个 uvicorn worker / 多台机器部署时，进程内缓存（身份、论文归属、列表总数）各自独立，
+一个进程里的写入只能让本进程的缓存失效。本模块提供两部分能力：
+
+1. 共享缓存 `get_cache()`：键值 + TTL + 标签失效，用于需要在各进程间共享的数据（如 AI 报告）
+   - `memory`：进程内实现（默认，单进程部署或开发环境）
+   - `redis`：任何 Redis 协议服务（Redis / KeyDB / Valkey 等），值以 JSON 存储，
+     标签对应一个记录键名的集合，失效时整组删除
+2. 失效广播 `broadcast(namespace, keys)`：写入方丢弃本地缓存后调用，通过 Redis pub/sub 频道
+   `CACHE_INVALIDATION_CHANNEL` 通知其它进程，各进程用 `subscribe(namespace, handler)`
+   注册的回调丢弃本地条目。`memory` 后端下没有其它进程，广播为空操作。
+
+Redis 不可用时读取按未命中处理、写入与广播只记录告警，不影响接口本身；
+此时其它进程的本地缓存退化为依赖 TTL 过期。
+
+使用 `redis` 后端需安装 `redis`（`uv pip install -e ".[redis]"`）；
+`RedisCache` 也接受任意 redis-py 兼容的客户端对象（如本地测试用的 fakeredis）。
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from loguru import logger
+
+from app.config import settings
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# 本进程标识，用于忽略自己发出的失效消息
+NODE_ID = uuid.uuid4().hex
+
+InvalidationHandler = Callable[[Optional[List[Any]]], None]
+
+_handlers: Dict[str, List[InvalidationHandler]] = {}
+_handlers_lock = threading.Lock()
+
+
+class CacheBackend(ABC):
+    """共享缓存接口。ttl 为秒数，None 表示不过期。"""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Sequence[str] = ()) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate_tags(self, *tags: str) -> None:
+        ...
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        """向其它进程发送失效消息；单进程后端无需实现。"""
+
+    def start_listener(self, dispatch: Callable[[Dict[str, Any]], None]) -> None:
+        """开始接收其它进程的失效消息；单进程后端无需实现。"""
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryCache(CacheBackend):
+    """进程内实现：LRU + 过期时间 + 标签索引。"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (value, 过期时间(monotonic) 或 None, tags)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Sequence[str] = ()) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "tags": len(self._tags),
+                "max_entries": self._max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class RedisCache(CacheBackend):
+    """Redis 协议实现；client 为 redis-py 兼容对象，连接失败时按未命中处理。"""
+
+    name = "redis"
+
+    def __init__(self, client: Any, prefix: str = "cdai:", channel: str = "cdai:cache-invalidation"):
+        self._client = client
+        self._prefix = prefix
+        self._channel = channel
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.published = 0
+        self.received = 0
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str, channel: str) -> "RedisCache":
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis 需要安装 redis：uv pip install -e \".[redis]\"")
+        client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0, health_check_interval=30)
+        return cls(client, prefix=prefix, channel=channel)
+
+    def _key(self, key: str) -> str:
+        return f"{self._prefix}{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}tag:{tag}"
+
+    def _failed(self, action: str, exc: Exception) -> None:
+        self.errors += 1
+        logger.warning("共享缓存 {} 失败: {}", action, exc)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(self._key(key))
+        except Exception as exc:
+            self._failed("读取", exc)
+            self.misses += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Sequence[str] = ()) -> None:
+        full_key = self._key(key)
+        try:
+            pipe = self._client.pipeline()
+            pipe.set(full_key, json.dumps(value, ensure_ascii=False, default=str), ex=ttl or None)
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                pipe.sadd(tag_key, full_key)
+                # 标签集合随最近写入的条目一起过期，避免从未失效的标签长期占用内存
+                if ttl:
+                    pipe.expire(tag_key, ttl)
+            pipe.execute()
+        except Exception as exc:
+            self._failed("写入", exc)
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            self._client.delete(*[self._key(k) for k in keys])
+        except Exception as exc:
+            self._failed("删除", exc)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        try:
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                members = list(self._client.smembers(tag_key))
+                self._client.delete(tag_key, *members)
+        except Exception as exc:
+            self._failed("按标签失效", exc)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        try:
+            self._client.publish(self._channel, json.dumps(message, ensure_ascii=False, default=str))
+            self.published += 1
+        except Exception as exc:
+            self._failed("广播", exc)
+
+    def start_listener(self, dispatch: Callable[[Dict[str, Any]], None]) -> None:
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(
+            target=self._listen, args=(dispatch,), name="cache-invalidation", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self, dispatch: Callable[[Dict[str, Any]], None]) -> None:
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get("type") != "message":
+                        continue
+                    self.received += 1
+                    try:
+                        dispatch(json.loads(message["data"]))
+                    except Exception as exc:
+                        logger.warning("处理缓存失效消息失败: {}", exc)
+            except Exception as exc:
+                self._failed("订阅", exc)
+                # 断线期间错过的消息无法补回，本地缓存依赖 TTL 过期
+                self._stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=3.0)
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "published": self.published,
+            "received": self.received,
+            "listener_alive": self._listener is not None and self._listener.is_alive(),
+        }
+
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def _create_backend() -> CacheBackend:
+    backend = (settings.CACHE_BACKEND or "memory").lower()
+    if backend == "redis":
+        return RedisCache.from_url(
+            settings.CACHE_REDIS_URL,
+            prefix=settings.CACHE_KEY_PREFIX,
+            channel=settings.CACHE_INVALIDATION_CHANNEL,
+        )
+    if backend != "memory":
+        raise ValueError(f"不支持的 CACHE_BACKEND：{settings.CACHE_BACKEND}（可选 memory / redis）")
+    return MemoryCache(max_entries=settings.CACHE_MEMORY_MAX_ENTRIES)
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _create_backend()
+    return _cache
+
+
+def set_backend(backend: CacheBackend) -> None:
+    """替换当前后端（脚本或本地调试时注入 fakeredis 等替身）。"""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = backend
+
+
+def subscribe(namespace: str, handler: InvalidationHandler) -> None:
+    """注册本地缓存的失效回调；handler 收到键列表，None 表示清空整个命名空间。"""
+    with _handlers_lock:
+        _handlers.setdefault(namespace, []).append(handler)
+
+
+def _dispatch(message: Dict[str, Any]) -> None:
+    if message.get("origin") == NODE_ID:
+        return
+    with _handlers_lock:
+        handlers = list(_handlers.get(message.get("ns", ""), ()))
+    for handler in handlers:
+        handler(message.get("keys"))
+
+
+def broadcast(namespace: str, keys: Optional[Iterable[Any]] = None) -> None:
+    """通知其它进程丢弃本地缓存条目（调用方自己负责先丢弃本进程的条目）。"""
+    get_cache().publish({
+        "origin": NODE_ID,
+        "ns": namespace,
+        "keys": None if keys is None else list(keys),
+    })
+
+
+def init_shared_cache() -> None:
+    """应用启动时调用：创建后端并开始接收失效消息。"""
+    get_cache().start_listener(_dispatch)
+
+
+def close_shared_cache() -> None:
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+def shared_cache_stats() -> Dict[str, Any]:
+    return get_cache().stats()
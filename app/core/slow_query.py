@@ -0,0 +1,158 @@
+"""
+慢查询日志
+
+执行时间超过 `SLOW_QUERY_THRESHOLD_MS` 的语句会被放入队列，由后台线程补充
+`EXPLAIN FORMAT=JSON` 后写入独立的滚动日志文件（每行一个 JSON），不阻塞请求本身。
+
+记录字段：语句形状、参数指纹、接口路径、耗时、返回行数、执行计划。
+参数只记录指纹，不落明文，便于在不泄露数据的前提下区分同形状的不同调用。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+
+# EXPLAIN 只支持这些语句；DDL、SHOW 等直接跳过
+_EXPLAINABLE = ("select", "with", "update", "delete", "insert", "replace")
+
+_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=1000)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+_file_logger: Optional[logging.Logger] = None
+_last_explained: Dict[str, float] = {}
+_dropped = 0
+
+
+def enabled() -> bool:
+    return settings.SLOW_QUERY_THRESHOLD_MS > 0
+
+
+def is_slow(elapsed: float) -> bool:
+    return enabled() and elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS
+
+
+def params_fingerprint(args: Any) -> Optional[str]:
+    if args is None:
+        return None
+    return hashlib.sha1(repr(args).encode("utf-8", "replace")).hexdigest()[:16]
+
+
+def capture(sql: str, shape: str, args: Any, elapsed: float, rows: int, path: str = "", many: bool = False) -> None:
+    """登记一条慢查询；队列满时丢弃并计数，绝不阻塞调用方。"""
+    global _dropped
+    item = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "path": path,
+        "duration_ms": round(elapsed * 1000, 3),
+        "rows": rows,
+        "sql": shape,
+        "params_fingerprint": params_fingerprint(args),
+        "_raw_sql": sql,
+        "_args": None if many else args,
+    }
+    _ensure_worker()
+    try:
+        _queue.put_nowait(item)
+    except queue.Full:
+        _dropped += 1
+
+
+def _ensure_worker() -> None:
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="slow-query-writer", daemon=True)
+            _worker.start()
+
+
+def _get_file_logger() -> logging.Logger:
+    global _file_logger
+    if _file_logger is None:
+        path = settings.SLOW_QUERY_LOG_FILE
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        file_logger = logging.getLogger("cd_ai.slow_query")
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+        file_logger.addHandler(handler)
+        _file_logger = file_logger
+    return _file_logger
+
+
+def _should_explain(item: Dict[str, Any]) -> bool:
+    if not settings.SLOW_QUERY_EXPLAIN:
+        return False
+    if item["_args"] is None and "%s" in item["_raw_sql"]:
+        # executemany 的批量参数无法代入单条 EXPLAIN
+        return False
+    if not item["_raw_sql"].lstrip().lower().startswith(_EXPLAINABLE):
+        return False
+    # 同一形状在间隔内只 EXPLAIN 一次，避免慢查询风暴时再给数据库加压
+    now = time.monotonic()
+    last = _last_explained.get(item["sql"])
+    if last is not None and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    _last_explained[item["sql"]] = now
+    return True
+
+
+def _explain(sql: str, args: Any) -> Any:
+    from app.database import get_connection
+
+    conn = get_connection()
+    try:
+        # 使用底层连接，EXPLAIN 本身不再进入 SQL 统计与慢查询日志
+        with conn.raw.cursor() as cursor:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql}", args)
+            row = cursor.fetchone()
+        plan = row[0] if row else None
+        return json.loads(plan) if isinstance(plan, str) else plan
+    finally:
+        conn.close()
+
+
+def _run() -> None:
+    while True:
+        item = _queue.get()
+        try:
+            if _should_explain(item):
+                try:
+                    item["explain"] = _explain(item["_raw_sql"], item["_args"])
+                except Exception as e:
+                    item["explain_error"] = str(e)
+            record = {k: v for k, v in item.items() if not k.startswith("_")}
+            _get_file_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+            logger.warning(f"慢查询: {item['path'] or '-'} - 耗时 {item['duration_ms']}ms: {item['sql']}")
+        except Exception as e:
+            logger.error(f"慢查询日志写入失败：{str(e)}")
+        finally:
+            _queue.task_done()
+
+
+def slow_query_stats() -> Dict[str, Any]:
+    return {
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "pending": _queue.qsize(),
+        "dropped": _dropped,
+        "log_file": settings.SLOW_QUERY_LOG_FILE,
+    }
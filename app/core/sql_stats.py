@@ -0,0 +1,146 @@
+"""
+请求级 SQL 统计
+
+每个请求开始时由 `SQLStatsMiddleware` 创建一个 `RequestSQLStats` 放入 contextvar，
+请求内所有经过连接池借出的游标在 `execute`/`executemany` 时把耗时与行数记到这里。
+执行层（`run_blocking`）会复制上下文，工作线程里的查询同样会被统计。
+
+语句按“形状”聚合：去掉字面量、合并 IN 列表，同一条模板 SQL 在一次请求内
+执行次数超过 `SQL_REPEAT_WARN_THRESHOLD` 时视为疑似 N+1。
+超过 `SLOW_QUERY_THRESHOLD_MS` 的语句额外交给 `app.core.slow_query` 记录。
+"""
+from __future__ import annotations
+
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import slow_query
+
+_current: contextvars.ContextVar[Optional["RequestSQLStats"]] = contextvars.ContextVar(
+    "request_sql_stats", default=None
+)
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST_RE = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """把 SQL 归一化为语句形状：字面量与占位符替换为 `?`，多值列表合并。"""
+    shape = _STRING_RE.sub("?", sql)
+    shape = _PLACEHOLDER_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _VALUES_LIST_RE.sub(r"\1, ...", shape)
+    shape = _IN_LIST_RE.sub("(?, ...)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class RequestSQLStats:
+    """单个请求内的查询计数、耗时、行数与语句形状分布。"""
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.method = method
+        self.path = path
+        self._lock = threading.Lock()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.shapes: Counter = Counter()
+
+    def record(self, shape: str, elapsed: float, rows: int) -> None:
+        with self._lock:
+            self.query_count += 1
+            self.db_time += elapsed
+            if rows and rows > 0:
+                self.rows += rows
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        with self._lock:
+            return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "method": self.method,
+                "path": self.path,
+                "queries": self.query_count,
+                "db_time_ms": round(self.db_time * 1000, 3),
+                "rows": self.rows,
+                "distinct_shapes": len(self.shapes),
+                "top_shapes": [
+                    {"sql": shape, "count": n} for shape, n in self.shapes.most_common(top)
+                ],
+            }
+
+
+def start_request(method: str = "", path: str = "") -> Tuple[RequestSQLStats, contextvars.Token]:
+    stats = RequestSQLStats(method, path)
+    return stats, _current.set(stats)
+
+
+def finish_request(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def current_stats() -> Optional[RequestSQLStats]:
+    return _current.get()
+
+
+def record_query(sql: str, elapsed: float, rows: int, args: Any = None, many: bool = False) -> None:
+    stats = _current.get()
+    slow = slow_query.is_slow(elapsed)
+    if stats is None and not slow:
+        return
+    shape = normalize_sql(sql)
+    if stats is not None:
+        stats.record(shape, elapsed, rows)
+    if slow:
+        slow_query.capture(sql, shape, args, elapsed, rows, stats.path if stats else "", many)
+
+
+class InstrumentedCursor:
+    """pymysql 游标代理，execute/executemany 的耗时与行数计入当前请求并检测慢查询。"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self._cursor.rowcount, args)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start, self._cursor.rowcount, args, many=True)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+
+def wrap_cursor(cursor):
+    """处于请求上下文或开启了慢查询日志时返回带统计的游标，否则原样返回。"""
+    if _current.get() is None and not slow_query.enabled():
+        return cursor
+    return InstrumentedCursor(cursor)
@@ -0,0 +1,77 @@
+"""
+进程内 LRU + TTL 缓存
+
+供身份、论文归属等“读多写少、允许短时间不一致”的小对象缓存复用：
+超过容量按最近最少使用淘汰，超过 TTL 的条目在读取时丢弃，并统计命中/未命中次数。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+_Number = Union[int, float]
+
+
+class TTLCache:
+    """线程安全的 LRU 缓存，ttl/max_size 可传入函数以便运行时读取配置。"""
+
+    def __init__(self, max_size: Union[int, Callable[[], int]], ttl: Union[_Number, Callable[[], _Number]]):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self) -> _Number:
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size() if callable(self._max_size) else self._max_size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        ttl = self.ttl
+        if ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        max_size = self.max_size
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -2,10 +2,14 @@
 中间件模块
 """
 from fastapi import FastAPI
+from app.config import settings
 from app.middleware.logging import LoggingMiddleware
+from app.middleware.sql_stats import SQLStatsMiddleware
 
 
 def setup_middleware(app: FastAPI):
     """设置中间件"""
     app.add_middleware(LoggingMiddleware)
+    if settings.SQL_STATS_ENABLED:
+        app.add_middleware(SQLStatsMiddleware)
 
@@ -3,7 +3,8 @@
 用于将所有操作记录到operation_logs表中
 """
 import json
-from app.database import get_db
+from app.core import count_cache
+from app.database import get_connection
 
 def record_operation_log(user_id, username, operation_type, operation_path, 
                         operation_params, ip_address, status):
@@ -11,7 +12,7 @@ def record_operation_log(user_id, username, operation_type, operation_path,
     db = None
     cursor = None
     try:
-        db = get_db()
+        db = get_connection()
         cursor = db.cursor()
         
         # 准备参数
@@ -30,6 +31,7 @@ def record_operation_log(user_id, username, operation_type, operation_path,
             params_json, ip_address, status
         ))
         db.commit()
+        count_cache.invalidate("operation_logs")
     except Exception:
         # 日志记录失败不应影响主流程
         pass
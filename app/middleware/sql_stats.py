@@ -0,0 +1,43 @@
+"""
+SQL 统计中间件
+"""
+import json
+
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from loguru import logger
+
+from app.config import settings
+from app.core.sql_stats import finish_request, start_request
+
+
+class SQLStatsMiddleware(BaseHTTPMiddleware):
+    """统计每个请求的查询次数、数据库耗时与返回行数。
+
+    - 每个访问过数据库的请求输出一行 JSON 格式的 `SQL统计` 日志
+    - 同一语句形状执行次数超过 `SQL_REPEAT_WARN_THRESHOLD` 时输出告警
+    - `DEBUG=true` 时在响应头中返回 `X-DB-Query-Count` / `X-DB-Time` / `X-DB-Rows`
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        stats, token = start_request(request.method, request.url.path)
+        try:
+            response = await call_next(request)
+        finally:
+            finish_request(token)
+
+        if stats.query_count:
+            threshold = settings.SQL_REPEAT_WARN_THRESHOLD
+            summary = stats.summary()
+            logger.info(f"SQL统计 {json.dumps(summary, ensure_ascii=False)}")
+            for shape, count in stats.repeated(threshold):
+                logger.warning(
+                    f"疑似 N+1 查询: {request.method} {request.url.path} - "
+                    f"同一语句执行 {count} 次（阈值 {threshold}）: {shape}"
+                )
+
+        if settings.DEBUG:
+            response.headers["X-DB-Query-Count"] = str(stats.query_count)
+            response.headers["X-DB-Time"] = f"{stats.db_time:.6f}"
+            response.headers["X-DB-Rows"] = str(stats.rows)
+        return response
@@ -32,7 +32,10 @@ class NotificationItem(BaseModel):
 
 class NotificationQueryResponse(BaseModel):
     items: List[NotificationItem]
-    page: int
+    page: Optional[int] = None
     page_size: int
-    total: int
-    total_pages: int
+    total: Optional[int] = None
+    total_pages: Optional[int] = None
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
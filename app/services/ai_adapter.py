@@ -1,7 +1,32 @@
 import time
+from typing import Optional
 
-# 内存存储，用于保存生成的AI报告
-ai_reports = {}
+from app.config import settings
+from app.core.shared_cache import get_cache
+
+
+# 生成的 AI 报告保存在共享缓存中，多 worker 部署时任意进程都能读到
+def _report_key(paper_id: int) -> str:
+    return f"ai_report:{paper_id}"
+
+
+def _store_report(paper_id: int, report: dict) -> None:
+    get_cache().set(
+        _report_key(paper_id),
+        report,
+        ttl=settings.AI_REPORT_CACHE_TTL or None,
+        tags=[f"paper:{paper_id}"],
+    )
+
+
+# 快速审稿结果按文件内容缓存：同一份文件（如重新提交的相同版本）不重复调用 AI 服务
+def _file_review_key(content_hash: str) -> str:
+    return f"ai_review:sha256:{content_hash}"
+
+
+def invalidate_paper_reports(paper_id: int) -> None:
+    """论文删除后丢弃其 AI 报告。"""
+    get_cache().invalidate_tags(f"paper:{paper_id}")
 
 
 def submit_ai_review(paper_id: int, user_payload: dict):
@@ -14,39 +39,45 @@ def submit_ai_review(paper_id: int, user_payload: dict):
     time.sleep(0.5)
     # Return a fake report (in real usage, persist to DB)
     report = {"paper_id": paper_id, "issues": []}
-    # 存储报告到内存
-    ai_reports[paper_id] = report
+    _store_report(paper_id, report)
     return report
 
 
-def submit_ai_review_file(file_bytes: bytes, filename: str, user_payload: dict):
+def submit_ai_review_file(file_bytes: bytes, filename: str, user_payload: dict, content_hash: Optional[str] = None):
     """Stub: 直接处理上传文件的 AI 评审。
 
     参数:
       file_bytes: 文件内容
       filename: 原始文件名
       user_payload: 当前用户信息
+      content_hash: 文件内容的 SHA-256（blob 存储键可得），提供时按内容复用评审结果
     """
-    time.sleep(0.5)
-    # 真实场景中：调用外部AI审查接口，返回结构化问题列表或评分
-    report = {
-        "filename": filename,
-        "length": len(file_bytes),
-        "issues": [],
-        "message": "快速审稿完成（模拟数据）",
-    }
+    cached = get_cache().get(_file_review_key(content_hash)) if content_hash else None
+    if cached is not None:
+        report = {**cached, "filename": filename}
+    else:
+        time.sleep(0.5)
+        # 真实场景中：调用外部AI审查接口，返回结构化问题列表或评分
+        report = {
+            "filename": filename,
+            "length": len(file_bytes),
+            "issues": [],
+            "message": "快速审稿完成（模拟数据）",
+        }
+        if content_hash:
+            get_cache().set(_file_review_key(content_hash), report, ttl=settings.AI_REPORT_CACHE_TTL or None)
     # 从用户信息中获取paper_id
     paper_id = user_payload.get("paper_id")
     if paper_id:
-        # 存储报告到内存
-        ai_reports[paper_id] = report
+        _store_report(paper_id, report)
     return report
 
 
 def get_ai_report_by_paper_id(paper_id: int):
     """Stub: 根据 paper_id 返回历史审查报告。"""
-    # 检查内存中是否有报告
-    if paper_id in ai_reports:
+    # 检查缓存中是否有报告
+    cached = get_cache().get(_report_key(paper_id))
+    if cached is not None:
         return {
             "task_id": f"paper_{paper_id}",
             "status": "COMPLETED",
@@ -57,7 +88,7 @@ def get_ai_report_by_paper_id(paper_id: int):
                 "message": "AI 审查完成。",
             },
             "issues": [],
-            **ai_reports[paper_id]
+            **cached
         }
     
     # 这里根据你的文件 JSON 生成一个固定返回值，使用时可扩展入 DB
@@ -0,0 +1,49 @@
+"""
+论文批注数（papers.annotation_count）维护
+
+创建/删除批注时在同一事务内加减计数，群组视图直接读取该列，
+不再对每篇论文执行 `SELECT COUNT(*) FROM annotations`。
+`app/tasks/reconcile_annotation_counts.py` 按 annotations 表重算，修正偏差。
+
+papers.updated_at 带 ON UPDATE CURRENT_TIMESTAMP，且被用作“论文更新时间”展示与排序，
+维护计数时必须显式保留原值。
+"""
+from typing import Iterable, Optional
+
+
+def adjust(cursor, paper_id: int, delta: int) -> None:
+    """按 delta 调整论文批注数，不会减到负数。"""
+    cursor.execute(
+        """
+        UPDATE papers
+        SET annotation_count = GREATEST(annotation_count + %s, 0),
+            updated_at = updated_at
+        WHERE id = %s
+        """,
+        (delta, paper_id),
+    )
+
+
+def reconcile(cursor, paper_ids: Optional[Iterable[int]] = None) -> int:
+    """按 annotations 表重算批注数，返回被修正的论文数。"""
+    where = ""
+    params = []
+    if paper_ids is not None:
+        ids = sorted({int(pid) for pid in paper_ids})
+        if not ids:
+            return 0
+        where = f"AND p.id IN ({', '.join(['%s'] * len(ids))})"
+        params = ids
+    cursor.execute(
+        f"""
+        UPDATE papers p
+        LEFT JOIN (
+            SELECT paper_id, COUNT(*) AS cnt FROM annotations GROUP BY paper_id
+        ) a ON a.paper_id = p.id
+        SET p.annotation_count = COALESCE(a.cnt, 0),
+            p.updated_at = p.updated_at
+        WHERE p.annotation_count <> COALESCE(a.cnt, 0) {where}
+        """,
+        params,
+    )
+    return cursor.rowcount
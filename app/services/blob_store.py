@@ -0,0 +1,269 @@
+"""
+内容寻址存储（blob）的索引、引用计数与派生缓存
+
+- `put_stream` / `put_file`：写入 `doc/blobs`，相同内容只保留一份，返回 `blob://<sha256>/<文件名>` 存储键
+- 论文、历史版本、材料、模板每一行对存储键的引用都计入 `blobs.ref_count`：写入/删除记录时在
+  同一事务中调用 `add_refs` / `release_refs`，旧的路径键会被忽略
+- `get_derivative` / `put_derivative`：按源文件内容缓存派生结果（如 docx 转换得到的 PDF），
+  缓存项本身持有派生 blob 的一个引用
+- `collect_garbage`：删除引用数为 0 且超过 `BLOB_GC_GRACE_SECONDS` 未被写入的 blob；
+  宽限期覆盖“已写入文件、记录尚未提交”的上传过程。删除前再按引用表确认确实无人引用，
+  计数偏低的 blob 只修正计数、不删除。`recount_refs` 按引用表重算全部引用数，用于修复计数偏差
+
+`blobs` 行先于文件登记：回收时对候选行加锁后再删除文件，同一内容的并发上传会等待锁释放后
+重新登记并写入文件，不会引用到已删除的 blob。
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import time
+from collections import Counter
+from typing import BinaryIO, Dict, Iterable, Optional
+
+import pymysql
+from loguru import logger
+
+from app.config import settings
+from app.database import get_connection
+from app.services.oss import (
+    BLOB_DIR,
+    TEMP_PREFIX,
+    StoredFile,
+    blob_key,
+    blob_path,
+    parse_blob_key,
+    stream_to_temp,
+)
+
+# 引用 blob 存储键的列，recount_refs 据此重算引用数
+REFERENCE_COLUMNS = (
+    ("papers", "oss_key"),
+    ("papers", "pdf_oss_key"),
+    ("papers_history", "oss_key"),
+    ("papers_history", "pdf_oss_key"),
+    ("file_records", "storage_path"),
+    ("templates", "oss_key"),
+)
+
+
+def content_hash(oss_key: Optional[str]) -> Optional[str]:
+    """blob 存储键的内容 SHA-256；旧的路径键返回 None。"""
+    parsed = parse_blob_key(oss_key)
+    return parsed[0] if parsed else None
+
+
+def _register(sha256: str, size: int) -> None:
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO `blobs` (`sha256`, `size`) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE `updated_at` = NOW()
+                """,
+                (sha256, size),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def put_stream(stream: BinaryIO, filename: str, max_bytes: Optional[int] = None) -> StoredFile:
+    """
+    按块写入临时文件并计算 SHA-256，登记 blobs 行后原子改名到内容地址；
+    已有相同内容时直接丢弃临时文件（阻塞操作，在 storage 线程池中调用）。
+    新登记的 blob 引用数为 0，由写入记录的事务调用 add_refs。
+    """
+    tmp_path, size, sha256 = stream_to_temp(stream, BLOB_DIR, max_bytes)
+    try:
+        _register(sha256, size)
+        target = blob_path(sha256)
+        if target.is_file():
+            os.unlink(tmp_path)
+        else:
+            target.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, target)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return StoredFile(blob_key(sha256, filename), size, sha256)
+
+
+def put_file(path: str, filename: str) -> StoredFile:
+    """把本机生成的文件（如转换得到的 PDF）存入 blob。"""
+    with open(path, "rb") as f:
+        return put_stream(f, filename)
+
+
+def _ref_deltas(keys: Iterable[Optional[str]]) -> Counter:
+    return Counter(sha for sha in map(content_hash, keys) if sha)
+
+
+def add_refs(cursor, keys: Iterable[Optional[str]]) -> None:
+    """记录新增了对 keys 的引用（同一键出现几次计几次），在调用方的事务中执行。"""
+    deltas = _ref_deltas(keys)
+    if deltas:
+        cursor.executemany(
+            "UPDATE `blobs` SET `ref_count` = `ref_count` + %s WHERE `sha256` = %s",
+            [(n, sha) for sha, n in deltas.items()],
+        )
+
+
+def release_refs(cursor, keys: Iterable[Optional[str]]) -> None:
+    """记录删除了对 keys 的引用，引用数归零的 blob 由 collect_garbage 回收。"""
+    deltas = _ref_deltas(keys)
+    if deltas:
+        cursor.executemany(
+            "UPDATE `blobs` SET `ref_count` = GREATEST(`ref_count` - %s, 0) WHERE `sha256` = %s",
+            [(n, sha) for sha, n in deltas.items()],
+        )
+
+
+def get_derivative(source_sha256: str, kind: str) -> Optional[str]:
+    """按源内容查找已缓存的派生结果，返回派生 blob 的 SHA-256（文件缺失时视为未命中）。"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT `result_sha256` FROM `blob_derivatives` WHERE `source_sha256` = %s AND `kind` = %s",
+                (source_sha256, kind),
+            )
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    if row and blob_path(row[0]).is_file():
+        return row[0]
+    return None
+
+
+def put_derivative(source_sha256: str, kind: str, result: StoredFile) -> None:
+    """缓存派生结果；并发生成同一派生结果时保留先写入的一条。"""
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT IGNORE INTO `blob_derivatives` (`source_sha256`, `kind`, `result_sha256`)
+                VALUES (%s, %s, %s)
+                """,
+                (source_sha256, kind, result.sha256),
+            )
+            if cursor.rowcount:
+                add_refs(cursor, [result.path])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _remove_blob(sha256: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(blob_path(sha256))
+
+
+def _sweep_temp_files(grace_seconds: int) -> int:
+    """删除写入中断遗留的临时文件。"""
+    removed = 0
+    deadline = time.time() - grace_seconds
+    for entry in os.scandir(BLOB_DIR):
+        if entry.is_file() and entry.name.startswith(TEMP_PREFIX) and entry.stat().st_mtime < deadline:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(entry.path)
+                removed += 1
+    return removed
+
+
+def _count_refs(cursor, sha256: str) -> int:
+    """按引用表与派生缓存统计实际引用 sha256 的行数。"""
+    total = 0
+    for table, column in REFERENCE_COLUMNS:
+        cursor.execute(f"SELECT COUNT(*) FROM `{table}` WHERE `{column}` LIKE %s", (blob_key(sha256, "") + "%",))
+        total += cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM `blob_derivatives` WHERE `result_sha256` = %s", (sha256,))
+    return total + cursor.fetchone()[0]
+
+
+def collect_garbage(grace_seconds: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """回收引用数为 0 的 blob 及其派生缓存，返回回收统计。"""
+    grace = settings.BLOB_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    removed = freed = 0
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT `sha256`, `size` FROM `blobs`
+                WHERE `ref_count` <= 0 AND `updated_at` < NOW() - INTERVAL %s SECOND
+                FOR UPDATE
+                """,
+                (grace,),
+            )
+            candidates = cursor.fetchall()
+            if dry_run:
+                orphans = [(sha256, size) for sha256, size in candidates if not _count_refs(cursor, sha256)]
+                conn.rollback()
+                return {"blobs": len(orphans), "bytes": sum(size for _, size in orphans), "temp_files": 0}
+            for sha256, size in candidates:
+                refs = _count_refs(cursor, sha256)
+                if refs:
+                    logger.warning("blob {} 引用数为 0 但仍被 {} 行引用，已修正计数", sha256, refs)
+                    cursor.execute("UPDATE `blobs` SET `ref_count` = %s WHERE `sha256` = %s", (refs, sha256))
+                    continue
+                cursor.execute(
+                    "SELECT `result_sha256` FROM `blob_derivatives` WHERE `source_sha256` = %s",
+                    (sha256,),
+                )
+                results = [row[0] for row in cursor.fetchall()]
+                release_refs(cursor, [blob_key(sha, "") for sha in results])
+                cursor.execute("DELETE FROM `blob_derivatives` WHERE `source_sha256` = %s", (sha256,))
+                # 先删文件再删行：行锁持有到提交，期间同一内容的上传在 _register 处等待
+                _remove_blob(sha256)
+                cursor.execute("DELETE FROM `blobs` WHERE `sha256` = %s", (sha256,))
+                removed += 1
+                freed += size
+        conn.commit()
+    except pymysql.MySQLError:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    temp_files = _sweep_temp_files(grace)
+    if removed or temp_files:
+        logger.info("回收 blob {} 个（{} 字节），清理临时文件 {} 个", removed, freed, temp_files)
+    return {"blobs": removed, "bytes": freed, "temp_files": temp_files}
+
+
+def recount_refs() -> Dict[str, int]:
+    """
+    按引用表与派生缓存重算全部 blob 的引用数，返回 {sha256: 引用数}（只含有引用的 blob）。
+    重算期间发生的引用变更可能被覆盖，请在低峰期执行。
+    """
+    counts: Counter = Counter()
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            for table, column in REFERENCE_COLUMNS:
+                cursor.execute(
+                    f"SELECT `{column}`, COUNT(*) FROM `{table}` WHERE `{column}` LIKE %s GROUP BY `{column}`",
+                    ("blob://%",),
+                )
+                for key, n in cursor.fetchall():
+                    sha = content_hash(key)
+                    if sha:
+                        counts[sha] += n
+            cursor.execute("SELECT `result_sha256`, COUNT(*) FROM `blob_derivatives` GROUP BY `result_sha256`")
+            for sha, n in cursor.fetchall():
+                counts[sha] += n
+            cursor.execute("UPDATE `blobs` SET `ref_count` = 0")
+            cursor.executemany(
+                "UPDATE `blobs` SET `ref_count` = %s WHERE `sha256` = %s",
+                [(n, sha) for sha, n in counts.items()],
+            )
+        conn.commit()
+    except pymysql.MySQLError:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return dict(counts)
@@ -0,0 +1,94 @@
+"""
+群组统计（group_stats 表）维护
+
+`groups.list_groups` 展示的学生人数、待审阅/已审阅论文数预先汇总在 `group_stats` 表中，
+列表查询直接 JOIN 读取，不再对每个群组执行相关子查询。
+
+维护方式：
+- 成员变动（添加/移除/导入/绑定/创建群组）：在同一事务内按群组重新汇总该群组一行
+- 论文状态变化：按论文所属学生所在的群组增量加减计数
+- 删除群组：删除对应统计行
+- `app/tasks/reconcile_group_stats.py` 定期全量重算，修正可能出现的偏差
+
+所有函数都接收调用方的游标，与业务写入处于同一事务中，由调用方负责提交。
+"""
+from typing import Iterable, Optional
+
+# 论文状态 -> group_stats 计数列
+STATUS_COLUMNS = {
+    "待审阅": "pending_papers",
+    "已审阅": "reviewed_papers",
+}
+
+_AGGREGATE_SQL = """
+INSERT INTO `group_stats` (`group_id`, `student_count`, `pending_papers`, `reviewed_papers`, `refreshed_at`)
+SELECT
+    g.group_id,
+    COUNT(DISTINCT gm.member_id),
+    COUNT(DISTINCT CASE WHEN p.status = '待审阅' THEN p.id END),
+    COUNT(DISTINCT CASE WHEN p.status = '已审阅' THEN p.id END),
+    NOW()
+FROM `groups` g
+LEFT JOIN `group_members` gm
+    ON gm.group_id = g.group_id AND gm.member_type = 'student' AND gm.is_active = 1
+LEFT JOIN `papers` p
+    ON p.owner_id = gm.member_id AND p.status IN ('待审阅', '已审阅')
+{where}
+GROUP BY g.group_id
+ON DUPLICATE KEY UPDATE
+    `student_count` = VALUES(`student_count`),
+    `pending_papers` = VALUES(`pending_papers`),
+    `reviewed_papers` = VALUES(`reviewed_papers`),
+    `refreshed_at` = VALUES(`refreshed_at`)
+"""
+
+
+def refresh_groups(cursor, group_ids: Iterable[str]) -> None:
+    """重新汇总指定群组的统计行（不存在则创建）。"""
+    ids = sorted({str(g) for g in group_ids if g})
+    if not ids:
+        return
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(_AGGREGATE_SQL.format(where=f"WHERE g.group_id IN ({placeholders})"), ids)
+
+
+def delete_group(cursor, group_id: str) -> None:
+    cursor.execute("DELETE FROM `group_stats` WHERE `group_id` = %s", (group_id,))
+
+
+def apply_paper_status_change(cursor, owner_id: int, old_status: Optional[str], new_status: Optional[str]) -> None:
+    """论文状态从 old_status 变为 new_status 时，增量调整学生所在各群组的计数。
+
+    新增论文传 old_status=None，删除论文传 new_status=None。
+    """
+    deltas = {}
+    if old_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[old_status]] = deltas.get(STATUS_COLUMNS[old_status], 0) - 1
+    if new_status in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[new_status]] = deltas.get(STATUS_COLUMNS[new_status], 0) + 1
+    deltas = {col: d for col, d in deltas.items() if d}
+    if not deltas:
+        return
+    assignments = ", ".join(f"gs.`{col}` = gs.`{col}` + %s" for col in deltas)
+    cursor.execute(
+        f"""
+        UPDATE `group_stats` gs
+        JOIN `group_members` gm ON gm.group_id = gs.group_id
+        SET {assignments}
+        WHERE gm.member_id = %s AND gm.member_type = 'student' AND gm.is_active = 1
+        """,
+        (*deltas.values(), owner_id),
+    )
+
+
+def reconcile_all(cursor) -> int:
+    """全量重算所有群组的统计，并清理已删除群组的残留行，返回重算的群组数。"""
+    cursor.execute(_AGGREGATE_SQL.format(where=""))
+    cursor.execute(
+        "DELETE gs FROM `group_stats` gs LEFT JOIN `groups` g ON g.group_id = gs.group_id WHERE g.group_id IS NULL"
+    )
+    cursor.execute("SELECT COUNT(*) FROM `group_stats`")
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        return int(next(iter(row.values())) or 0)
+    return int(row[0] or 0) if row else 0
@@ -0,0 +1,259 @@
+"""
+后台导入任务
+
+大文件导入（用户、群组师生关系）在 HTTP 请求内执行，容易被反向代理超时中断。提交为任务后：
+
+1. 上传文件落盘到 `IMPORT_JOB_DIR/<任务ID>/`，`import_jobs` 表记录任务，接口立即返回任务ID
+2. 本进程的 `import` 线程池在后台调用对应类型注册的处理函数，按 `IMPORT_JOB_CHUNK_SIZE` 行
+   一个事务提交，每个分块结束后把已处理/失败行数写回任务表
+3. 客户端轮询 `GET /api/v1/jobs/{id}` 获取进度与预计剩余时间；失败行（原始列 + 行号 + 原因）
+   写入 `failed_rows.csv`，通过 `GET /api/v1/jobs/{id}/failed-rows` 下载
+
+任务状态在数据库中，任一 worker 都能查询；文件在本机磁盘，多机部署时 `IMPORT_JOB_DIR` 需为共享目录。
+进程退出时执行中的任务无法续跑，启动时 `recover_interrupted_jobs` 把长时间没有进度的任务标记为失败。
+"""
+from __future__ import annotations
+
+import contextvars
+import csv
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+import pymysql
+from loguru import logger
+
+from app.config import settings
+from app.core.executor import get_executor
+from app.database import get_connection
+from app.services.oss import save_stream
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FAILED_ROWS_FILENAME = "failed_rows.csv"
+
+_processors: Dict[str, Callable[["JobContext"], Dict[str, Any]]] = {}
+
+
+def register(kind: str, processor: Callable[["JobContext"], Dict[str, Any]]) -> None:
+    """注册某类导入的处理函数；处理函数在 import 线程池中执行，返回结果汇总。"""
+    _processors[kind] = processor
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(settings.IMPORT_JOB_DIR, job_id)
+
+
+class JobContext:
+    """处理函数使用的任务上下文：源文件、分块大小、进度与失败行记录。"""
+
+    def __init__(self, job_id: str, filename: str, path: str, params: Dict[str, Any]):
+        self.job_id = job_id
+        self.filename = filename
+        self.path = path
+        self.params = params
+        self.chunk_size = max(1, settings.IMPORT_JOB_CHUNK_SIZE)
+        self.processed = 0
+        self.failed = 0
+        self._columns: List[str] = []
+        self._failed_file = None
+        self._failed_writer = None
+
+    def set_columns(self, columns: List[str]) -> None:
+        """设置失败行 CSV 的原始列（通常为源文件表头）。"""
+        self._columns = [c for c in columns if c]
+
+    def fail_row(self, line: int, values: Dict[str, Any], reason: str) -> None:
+        if self._failed_writer is None:
+            self._failed_file = open(
+                os.path.join(_job_dir(self.job_id), FAILED_ROWS_FILENAME), "w", encoding="utf-8-sig", newline=""
+            )
+            self._failed_writer = csv.writer(self._failed_file)
+            self._failed_writer.writerow(["行号", *self._columns, "失败原因"])
+        self._failed_writer.writerow([line, *(values.get(c, "") for c in self._columns), reason])
+        self.failed += 1
+
+    def advance(self, rows: int) -> None:
+        """一个分块处理完成（rows 含失败行），写回进度。"""
+        self.processed += rows
+        if self._failed_file is not None:
+            self._failed_file.flush()
+        _execute(
+            "UPDATE `import_jobs` SET `processed_rows` = %s, `failed_rows` = %s WHERE `id` = %s",
+            (self.processed, self.failed, self.job_id),
+        )
+
+    def close(self) -> None:
+        if self._failed_file is not None:
+            self._failed_file.close()
+            self._failed_file = None
+
+
+def _execute(sql: str, args: tuple) -> None:
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, args)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _count_data_lines(path: str) -> int:
+    """按换行数估算数据行数（不含表头），用于计算进度与预计剩余时间。"""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def create_job(
+    kind: str,
+    filename: str,
+    stream: BinaryIO,
+    created_by: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    落盘上传文件、登记任务并提交到后台执行，返回任务ID（阻塞操作，在线程池中调用）。
+    文件超过 IMPORT_MAX_BYTES 时抛出 `oss.FileTooLarge`，不登记任务。
+    """
+    if kind not in _processors:
+        raise ValueError(f"未注册的导入类型：{kind}")
+    job_id = uuid.uuid4().hex
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    ext = os.path.splitext(filename)[1].lower()
+    path = os.path.join(job_dir, f"source{ext}")
+    try:
+        save_stream(stream, Path(path), settings.IMPORT_MAX_BYTES)
+    except BaseException:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    _execute(
+        """
+        INSERT INTO `import_jobs` (`id`, `kind`, `status`, `filename`, `params`, `created_by`, `total_rows`)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        (job_id, kind, QUEUED, filename, json.dumps(params or {}, ensure_ascii=False), created_by,
+         _count_data_lines(path)),
+    )
+    # 用空上下文提交，后台任务不继承当前请求的 contextvars（如请求级 SQL 统计）
+    contextvars.Context().run(get_executor("import").submit, _run_job, job_id, kind, filename, path, params or {})
+    logger.info("导入任务 {} 已提交（{}，文件 {}）", job_id, kind, filename)
+    return job_id
+
+
+def _run_job(job_id: str, kind: str, filename: str, path: str, params: Dict[str, Any]) -> None:
+    ctx = JobContext(job_id, filename, path, params)
+    try:
+        _execute(
+            "UPDATE `import_jobs` SET `status` = %s, `started_at` = NOW() WHERE `id` = %s",
+            (RUNNING, job_id),
+        )
+        try:
+            result = _processors[kind](ctx)
+        except Exception as e:
+            # HTTPException 的 detail 即面向用户的错误说明
+            detail = getattr(e, "detail", None) or str(e)
+            if not isinstance(detail, str):
+                detail = json.dumps(detail, ensure_ascii=False)
+            logger.exception("导入任务 {} 失败", job_id)
+            _finish(ctx, FAILED, error=detail)
+            return
+        _finish(ctx, SUCCEEDED, result=result)
+        logger.info("导入任务 {} 完成：处理 {} 行，失败 {} 行", job_id, ctx.processed, ctx.failed)
+    except pymysql.MySQLError:
+        # 任务表本身无法更新时只能记录日志，任务会在下次启动时被标记为中断
+        logger.exception("导入任务 {} 状态更新失败", job_id)
+        ctx.close()
+
+
+def _finish(ctx: JobContext, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+    ctx.close()
+    _execute(
+        """
+        UPDATE `import_jobs`
+        SET `status` = %s, `processed_rows` = %s, `failed_rows` = %s, `result` = %s, `error` = %s,
+            `finished_at` = NOW()
+        WHERE `id` = %s
+        """,
+        (status, ctx.processed, ctx.failed,
+         json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+         error, ctx.job_id),
+    )
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """查询任务进度；运行中的任务按已处理速度估算剩余秒数。"""
+    conn = get_connection()
+    try:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(
+                """
+                SELECT `id`, `kind`, `status`, `filename`, `created_by`, `total_rows`, `processed_rows`,
+                       `failed_rows`, `result`, `error`,
+                       DATE_FORMAT(`created_at`, '%%Y-%%m-%%d %%H:%%i:%%s') AS created_at,
+                       DATE_FORMAT(`started_at`, '%%Y-%%m-%%d %%H:%%i:%%s') AS started_at,
+                       DATE_FORMAT(`finished_at`, '%%Y-%%m-%%d %%H:%%i:%%s') AS finished_at,
+                       TIMESTAMPDIFF(SECOND, `started_at`, NOW()) AS elapsed_seconds
+                FROM `import_jobs` WHERE `id` = %s
+                """,
+                (job_id,),
+            )
+            job = cursor.fetchone()
+    finally:
+        conn.close()
+    if not job:
+        return None
+    if isinstance(job.get("result"), str):
+        job["result"] = json.loads(job["result"])
+    total, processed = job["total_rows"], job["processed_rows"]
+    elapsed = job.pop("elapsed_seconds")
+    job["eta_seconds"] = None
+    if job["status"] == RUNNING and total and processed and elapsed is not None:
+        job["eta_seconds"] = max(int(elapsed * (total - processed) / processed), 0)
+    job["failed_rows_url"] = f"/api/v1/jobs/{job_id}/failed-rows" if job["failed_rows"] else None
+    return job
+
+
+def failed_rows_path(job_id: str) -> Optional[str]:
+    path = os.path.join(_job_dir(job_id), FAILED_ROWS_FILENAME)
+    return path if os.path.isfile(path) else None
+
+
+def recover_interrupted_jobs() -> None:
+    """启动时调用：标记因进程退出而中断的任务，并清理超过保留期的任务文件。"""
+    try:
+        _execute(
+            """
+            UPDATE `import_jobs` SET `status` = %s, `error` = %s, `finished_at` = NOW()
+            WHERE `status` IN (%s, %s) AND `updated_at` < NOW() - INTERVAL %s SECOND
+            """,
+            (FAILED, "服务重启，任务中断，请重新提交", QUEUED, RUNNING, settings.IMPORT_JOB_STALE_SECONDS),
+        )
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT `id` FROM `import_jobs` WHERE `finished_at` < NOW() - INTERVAL %s DAY",
+                    (settings.IMPORT_JOB_RETENTION_DAYS,),
+                )
+                expired = [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    except pymysql.MySQLError as e:
+        logger.warning("检查中断的导入任务失败（是否已执行 database_setup.py 创建 import_jobs 表？）: {}", e)
+        return
+    for job_id in expired:
+        shutil.rmtree(_job_dir(job_id), ignore_errors=True)
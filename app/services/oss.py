@@ -1,49 +1,128 @@
+"""
+本地文件存储
+
+新上传的论文、PDF、材料、模板按内容存放在 `doc/blobs/<sha256 前两位>/<sha256>`，
+存储键为 `blob://<sha256>/<原文件名>`：内容相同的文件只占一份磁盘，文件名跟随引用方。
+引用计数与回收见 `app.services.blob_store`。
+
+早期的存储键是 `doc/template|essay|attachment` 下带时间戳前缀的文件路径，仍可正常读取。
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
 from pathlib import Path
-from datetime import datetime
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+
+from app.config import settings
 
 
 TEMPLATE_DIR = Path(__file__).resolve().parents[2] / "doc" / "template"
 ESSAY_DIR = Path(__file__).resolve().parents[2] / "doc" / "essay"
 ATTACHMENT_DIR = Path(__file__).resolve().parents[2] / "doc" / "attachment"
+BLOB_DIR = Path(__file__).resolve().parents[2] / "doc" / "blobs"
 TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
 ESSAY_DIR.mkdir(parents=True, exist_ok=True)
 ATTACHMENT_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+
+BLOB_KEY_PREFIX = "blob://"
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+
+
+class StoredFile(NamedTuple):
+    """流式写入的结果：存储键（oss_key）、字节数与内容的 SHA-256。"""
+    path: str
+    size: int
+    sha256: str
+
+
+class FileTooLarge(ValueError):
+    """写入过程中超过大小上限；抛出前临时文件已删除。"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"文件大小超过 {limit} 字节")
+        self.limit = limit
+
+
+def stream_to_temp(stream: BinaryIO, directory: Path, max_bytes: Optional[int] = None) -> Tuple[str, int, str]:
+    """
+    按块把 stream 写入 directory 下的临时文件，边写边累计大小与 SHA-256，返回 (临时路径, 字节数, SHA-256)。
+    超过 max_bytes 时立即中止并删除临时文件；返回前已 fsync，调用方负责改名或删除。
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX)
+    chunk_size = max(1, settings.UPLOAD_CHUNK_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise FileTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+
+def save_stream(stream: BinaryIO, target: Path, max_bytes: Optional[int] = None) -> StoredFile:
+    """
+    流式写入 target：临时文件与 target 在同一目录，写完后 os.replace 原子改名，
+    其它读者要么看不到文件，要么看到完整的文件。
+    """
+    tmp_path, size, sha256 = stream_to_temp(stream, target.parent, max_bytes)
+    try:
+        os.replace(tmp_path, target)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    return StoredFile(str(target), size, sha256)
+
+
+def blob_key(sha256: str, filename: str) -> str:
+    # 存储键列最短为 VARCHAR(255)：文件名超长时保留末尾（含扩展名）
+    return f"{BLOB_KEY_PREFIX}{sha256}/{Path(filename).name[-180:]}"
+
+
+def parse_blob_key(oss_key: Optional[str]) -> Optional[Tuple[str, str]]:
+    """blob 存储键返回 (sha256, 文件名)，旧的文件路径键返回 None。"""
+    if not oss_key or not oss_key.startswith(BLOB_KEY_PREFIX):
+        return None
+    sha256, _, filename = oss_key[len(BLOB_KEY_PREFIX):].partition("/")
+    return sha256, filename
+
 
+def blob_path(sha256: str) -> Path:
+    return BLOB_DIR / sha256[:2] / sha256
 
-def upload_file_to_oss(filename: str, content: bytes) -> str:
-    """Store template content under doc/template and return local path key."""
-    safe_name = Path(filename).name
-    ts = datetime.now().strftime("%Y%m%d%H%M%S%f")
-    stored_name = f"{ts}_{safe_name}"
-    stored_path = TEMPLATE_DIR / stored_name
-    stored_path.write_bytes(content)
-    return str(stored_path)
 
+def resolve_path(oss_key: str) -> Path:
+    """存储键对应的本地文件路径。"""
+    parsed = parse_blob_key(oss_key)
+    return blob_path(parsed[0]) if parsed else Path(oss_key)
 
-def upload_paper_to_storage(filename: str, content: bytes) -> str:
-    """Store paper content under doc/essay and return local path key."""
-    safe_name = Path(filename).name
-    ts = datetime.now().strftime("%Y%m%d%H%M%S%f")
-    stored_name = f"{ts}_{safe_name}"
-    stored_path = ESSAY_DIR / stored_name
-    stored_path.write_bytes(content)
-    return str(stored_path)
 
+def delete_file(oss_key: Optional[str]) -> None:
+    """删除旧的路径键文件；blob 可能被其它记录共用，由引用计数回收，这里不处理。"""
+    if not oss_key or parse_blob_key(oss_key):
+        return
+    Path(oss_key).unlink(missing_ok=True)
 
-def upload_attachment_to_storage(filename: str, content: bytes) -> str:
-    """Store material content under doc/attachment and return local path key."""
-    safe_name = Path(filename).name
-    ts = datetime.now().strftime("%Y%m%d%H%M%S%f")
-    stored_name = f"{ts}_{safe_name}"
-    stored_path = ATTACHMENT_DIR / stored_name
-    stored_path.write_bytes(content)
-    return str(stored_path)
 
 def get_file_from_oss(oss_key: str) -> tuple:
     """从本地存储读取文件，返回 (文件名, 文件内容)"""
-    file_path = Path(oss_key)
+    file_path = resolve_path(oss_key)
     if not file_path.exists() or not file_path.is_file():
         raise KeyError(f"文件不存在: {oss_key}")
     content = file_path.read_bytes()
-    filename = file_path.name.split("_", 1)[1] 
+    parsed = parse_blob_key(oss_key)
+    filename = parsed[1] if parsed else file_path.name.split("_", 1)[1]
     return (filename, content)
@@ -0,0 +1,172 @@
+"""
+论文归属缓存与统一权限校验
+
+论文、批注、AI 评审接口在处理前都要按论文ID取 `owner_id`（学生）与 `teacher_id`（教师）做权限判断。
+论文的归属几乎不会变化，这里用进程内 LRU + TTL 缓存（`PAPER_ACL_CACHE_TTL`）保存，
+`authorize_paper` 统一完成“论文存在 + 调用者有权访问”的校验，命中缓存时不再访问数据库。
+
+失效时机：更新论文（上传新版本）、删除论文以及变更论文的负责教师后调用 `invalidate(paper_id)`，
+失效消息经 `app.core.shared_cache` 广播给其它 worker。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.core import shared_cache
+from app.core.ttl_cache import TTLCache
+
+OWNER = "owner"
+TEACHER = "teacher"
+ADMIN = "admin"
+
+_ACL_SQL = "SELECT owner_id, teacher_id FROM papers WHERE id = %s"
+
+_NAMESPACE = "paper_acl"
+
+_cache = TTLCache(
+    max_size=lambda: settings.PAPER_ACL_CACHE_MAX_SIZE,
+    ttl=lambda: settings.PAPER_ACL_CACHE_TTL,
+)
+
+
+class PaperACL(NamedTuple):
+    owner_id: int
+    teacher_id: int
+
+
+def _to_acl(row: Any) -> PaperACL:
+    values = list(row.values()) if isinstance(row, dict) else list(row)
+    return PaperACL(int(values[0]), int(values[1]))
+
+
+def get_acl(cursor, paper_id: int) -> Optional[PaperACL]:
+    """取论文归属，论文不存在时返回 None。"""
+    acl = _cache.get(int(paper_id))
+    if acl is not None:
+        return acl
+    cursor.execute(_ACL_SQL, (paper_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    acl = _to_acl(row)
+    _cache.put(int(paper_id), acl)
+    return acl
+
+
+async def get_acl_async(cursor, paper_id: int) -> Optional[PaperACL]:
+    """`get_acl` 的异步游标版本。"""
+    acl = _cache.get(int(paper_id))
+    if acl is not None:
+        return acl
+    await cursor.execute(_ACL_SQL, (paper_id,))
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    acl = _to_acl(row)
+    _cache.put(int(paper_id), acl)
+    return acl
+
+
+def invalidate(paper_id: int) -> None:
+    _cache.pop(int(paper_id))
+    shared_cache.broadcast(_NAMESPACE, [int(paper_id)])
+
+
+def _on_remote_invalidate(keys: Optional[List[Any]]) -> None:
+    if keys is None:
+        _cache.clear()
+        return
+    for paper_id in keys:
+        _cache.pop(int(paper_id))
+
+
+shared_cache.subscribe(_NAMESPACE, _on_remote_invalidate)
+
+
+def is_admin(principal: Dict[str, Any]) -> bool:
+    roles = principal.get("roles") or []
+    return "admin" in roles or "管理员" in roles
+
+
+def check_access(
+    acl: PaperACL,
+    principal: Dict[str, Any],
+    allow: Sequence[str] = (OWNER, TEACHER, ADMIN),
+    match_roles: bool = False,
+) -> bool:
+    """判断调用者是否为允许的身份之一。
+
+    owner_id/teacher_id 分别是 students.id 与 teachers.id，两者可能数值相同；
+    match_roles=True 时还要求调用者声明了对应角色（学生/教师）。
+    """
+    user_id = principal.get("sub", 0)
+    roles = principal.get("roles") or []
+    if OWNER in allow and user_id == acl.owner_id:
+        if not match_roles or "student" in roles or "学生" in roles:
+            return True
+    if TEACHER in allow and user_id == acl.teacher_id:
+        if not match_roles or "teacher" in roles or "教师" in roles:
+            return True
+    return ADMIN in allow and is_admin(principal)
+
+
+def _authorize(
+    acl: Optional[PaperACL],
+    principal: Dict[str, Any],
+    allow: Sequence[str],
+    match_roles: bool,
+    not_found_detail: str,
+    forbidden_detail: str,
+) -> PaperACL:
+    if acl is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    if not check_access(acl, principal, allow, match_roles):
+        raise HTTPException(
+            status_code=403,
+            detail=forbidden_detail.format(
+                owner_id=acl.owner_id,
+                teacher_id=acl.teacher_id,
+                user_id=principal.get("sub", 0),
+                roles=principal.get("roles") or [],
+            ),
+        )
+    return acl
+
+
+def authorize_paper(
+    cursor,
+    paper_id: int,
+    principal: Dict[str, Any],
+    allow: Sequence[str] = (OWNER, TEACHER, ADMIN),
+    match_roles: bool = False,
+    not_found_detail: str = "论文不存在",
+    forbidden_detail: str = "无权限操作该论文",
+) -> PaperACL:
+    """校验论文存在且调用者（current_user 字典，含 sub/roles）有权访问，返回论文归属。
+
+    论文不存在抛 404，无权限抛 403；forbidden_detail 可引用
+    {owner_id}、{teacher_id}、{user_id}、{roles}。
+    """
+    acl = get_acl(cursor, paper_id)
+    return _authorize(acl, principal, allow, match_roles, not_found_detail, forbidden_detail)
+
+
+async def authorize_paper_async(
+    cursor,
+    paper_id: int,
+    principal: Dict[str, Any],
+    allow: Sequence[str] = (OWNER, TEACHER, ADMIN),
+    match_roles: bool = False,
+    not_found_detail: str = "论文不存在",
+    forbidden_detail: str = "无权限操作该论文",
+) -> PaperACL:
+    """`authorize_paper` 的异步游标版本。"""
+    acl = await get_acl_async(cursor, paper_id)
+    return _authorize(acl, principal, allow, match_roles, not_found_detail, forbidden_detail)
+
+
+def paper_acl_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
@@ -0,0 +1,69 @@
+"""
+上传文件处理
+
+接口不再 `await file.read()` 把整个文件读入内存：
+- `save_upload` 在 storage 线程池中把 `UploadFile` 按 `UPLOAD_CHUNK_SIZE` 分块写入临时文件，
+  边写边校验大小、计算 SHA-256，再按内容存入 blob（见 `blob_store.put_stream`），返回 `StoredFile`
+- `read_upload` 只用于需要整体解析的导入名单，按块读取并在超过上限时立即拒绝
+- 客户端提供了文件大小时（`UploadFile.size`），`check_upload_size` 在读取前就拒绝超限文件
+"""
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from loguru import logger
+
+from app.config import settings
+from app.core.executor import run_blocking
+from app.services import blob_store
+from app.services.oss import FileTooLarge, StoredFile
+
+
+def upload_too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"文件大小超过 {limit // (1024 * 1024)}MB")
+
+
+def check_upload_size(file: UploadFile, limit: int) -> None:
+    size = getattr(file, "size", None)
+    if size is not None and size > limit:
+        raise upload_too_large(limit)
+
+
+def _save(file: UploadFile, limit: int) -> StoredFile:
+    file.file.seek(0)
+    return blob_store.put_stream(file.file, file.filename, limit)
+
+
+async def save_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    empty_detail: Optional[str] = "上传文件为空",
+) -> StoredFile:
+    """
+    把上传文件流式写入 blob 存储，返回 (存储键, 字节数, SHA-256)。
+    超过 max_bytes（默认 UPLOAD_MAX_BYTES）返回 400；empty_detail 为 None 时允许空文件。
+    返回的 blob 尚未被引用，写入记录时需调用 `blob_store.add_refs`。
+    """
+    limit = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    check_upload_size(file, limit)
+    try:
+        stored = await run_blocking("storage", _save, file, limit)
+    except FileTooLarge:
+        raise upload_too_large(limit)
+    if stored.size == 0 and empty_detail:
+        # 未被引用的空 blob 由 collect_garbage 回收
+        raise HTTPException(status_code=400, detail=empty_detail)
+    logger.info("已保存上传文件 {}（{} 字节）", stored.path, stored.size)
+    return stored
+
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """读取需要整体解析的上传文件，超过 max_bytes（默认 IMPORT_MAX_BYTES）立即返回 400。"""
+    limit = settings.IMPORT_MAX_BYTES if max_bytes is None else max_bytes
+    check_upload_size(file, limit)
+    chunk_size = max(1, settings.UPLOAD_CHUNK_SIZE)
+    content = bytearray()
+    while chunk := await file.read(chunk_size):
+        content += chunk
+        if len(content) > limit:
+            raise upload_too_large(limit)
+    return bytes(content)
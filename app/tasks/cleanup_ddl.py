@@ -8,7 +8,8 @@ from datetime import datetime, timedelta
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from app.database import get_connection
+from app.core import count_cache
+from app.database import close_pool, get_connection
 from loguru import logger
 
 
@@ -48,26 +49,12 @@ def cleanup_expired_ddl():
                 # 开始事务
                 conn.begin()
                 
-                # 获取该DDL的截止时间字符串，用于匹配消息
-                ddl_time_str = ddl_time.strftime('%Y-%m-%d %H:%M:%S') if ddl_time else None
-                
-                # a. 删除与该DDL相关的消息
-                # 方式1：通过metadata中的ddlid匹配
-                deleted_messages = 0
-                if ddlid:
-                    cursor.execute(
-                        "DELETE FROM user_messages WHERE source = 'ddl' AND metadata LIKE %s",
-                        (f'%\"ddlid\": {ddlid}%',)
-                    )
-                    deleted_messages = cursor.rowcount
-                
-                # 方式2：如果metadata方式没找到，尝试通过消息内容匹配
-                if deleted_messages == 0 and ddl_time_str:
-                    cursor.execute(
-                        "DELETE FROM user_messages WHERE source = 'ddl' AND content LIKE %s",
-                        (f'%{ddl_time_str}%',)
-                    )
-                    deleted_messages = cursor.rowcount
+                # a. 删除与该DDL相关的消息（按 ddlid 生成列精确匹配）
+                cursor.execute(
+                    "DELETE FROM user_messages WHERE ddlid = %s AND source = 'ddl'",
+                    (str(ddlid),)
+                )
+                deleted_messages = cursor.rowcount
                 
                 # b. 删除DDL记录
                 cursor.execute(
@@ -78,6 +65,7 @@ def cleanup_expired_ddl():
                 
                 # 提交事务
                 conn.commit()
+                count_cache.invalidate("user_messages")
                 
                 logger.info(f"成功清理DDL {ddlid}（教师：{teacher_name}，截止时间：{ddl_time}），删除了 {deleted_messages} 条消息")
                 
@@ -107,4 +95,7 @@ def cleanup_expired_ddl():
 
 
 if __name__ == "__main__":
-    cleanup_expired_ddl()
+    try:
+        cleanup_expired_ddl()
+    finally:
+        close_pool()
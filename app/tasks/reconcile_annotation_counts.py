@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""对账论文批注数（papers.annotation_count）任务
+
+用法：
+    python app/tasks/reconcile_annotation_counts.py              # 全量重算
+    python app/tasks/reconcile_annotation_counts.py 12 15 18     # 只重算指定论文
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import close_pool, get_connection
+from app.services.annotation_counts import reconcile
+from loguru import logger
+
+
+def reconcile_annotation_counts(paper_ids=None):
+    """按 annotations 表重算论文批注数"""
+    logger.info("开始执行论文批注数对账任务")
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        fixed = reconcile(cursor, paper_ids)
+        conn.commit()
+        logger.info(f"论文批注数对账完成，修正 {fixed} 篇论文")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"执行论文批注数对账任务失败：{str(e)}")
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+if __name__ == "__main__":
+    try:
+        reconcile_annotation_counts([int(arg) for arg in sys.argv[1:]] or None)
+    finally:
+        close_pool()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""定时对账群组统计（group_stats）任务
+
+业务写入时 group_stats 已增量维护，本任务按 groups/group_members/papers 全量重算，
+修正直接改库、异常中断等情况造成的偏差。首次部署或执行 database_setup.py 后也应运行一次。
+
+建议通过 crontab 每小时执行：
+    0 * * * * cd /path/to/CD_AI_back_end && python app/tasks/reconcile_group_stats.py
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import close_pool, get_connection
+from app.services.group_stats import reconcile_all
+from loguru import logger
+
+
+def reconcile_group_stats():
+    """全量重算群组统计"""
+    logger.info("开始执行群组统计对账任务")
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        start = time.monotonic()
+        total = reconcile_all(cursor)
+        conn.commit()
+        logger.info(f"群组统计对账完成，共 {total} 个群组，耗时 {time.monotonic() - start:.2f}s")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error(f"执行群组统计对账任务失败：{str(e)}")
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+if __name__ == "__main__":
+    try:
+        reconcile_group_stats()
+    finally:
+        close_pool()
@@ -212,7 +212,8 @@ CREATE TABLE IF NOT EXISTS `groups` (
     UNIQUE KEY `uniq_group_id` (`group_id`),
     KEY `idx_group_name` (`group_name`),
     KEY `idx_teacher_id` (`teacher_id`),
-    KEY `idx_teacher_name` (`teacher_name`)
+    KEY `idx_teacher_name` (`teacher_name`),
+    KEY `idx_groups_created_at` (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='群组表';
 """
 
@@ -232,11 +233,25 @@ CREATE TABLE IF NOT EXISTS `group_members` (
     PRIMARY KEY (`group_id`, `member_id`, `member_type`),
     KEY `idx_member_id` (`member_id`),
     KEY `idx_member_type` (`member_type`),
-    KEY `idx_group_id` (`group_id`)
+    KEY `idx_group_id` (`group_id`),
+    KEY `idx_group_members_group_type_active` (`group_id`, `member_type`, `is_active`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='群组成员关系表';
 """
 
 
+GROUP_STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `group_stats` (
+    `group_id` VARCHAR(64) NOT NULL COMMENT '群组编号',
+    `student_count` INT NOT NULL DEFAULT 0 COMMENT '有效学生成员数',
+    `pending_papers` INT NOT NULL DEFAULT 0 COMMENT '待审阅论文数',
+    `reviewed_papers` INT NOT NULL DEFAULT 0 COMMENT '已审阅论文数',
+    `refreshed_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最近一次全量汇总时间',
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`group_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='群组统计表（由业务写入增量维护，定期对账）';
+"""
+
+
 PAPERS_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS `papers` (
     `id` INT NOT NULL AUTO_INCREMENT COMMENT '论文ID',
@@ -247,12 +262,13 @@ CREATE TABLE IF NOT EXISTS `papers` (
     `status` VARCHAR(32) NOT NULL COMMENT '状态（uploaded:已上传, processing:处理中, completed:完成, rejected:驳回）',
     `detail` TEXT COMMENT '状态描述',
     `ddl` DATETIME DEFAULT NULL COMMENT '截止时间',
-    `oss_key` VARCHAR(128) NOT NULL COMMENT 'OSS存储键（docx文件）',
-    `pdf_oss_key` VARCHAR(128) NOT NULL COMMENT 'OSS存储键（PDF文件）',
+    `oss_key` VARCHAR(255) NOT NULL COMMENT 'OSS存储键（docx文件）',
+    `pdf_oss_key` VARCHAR(255) NOT NULL COMMENT 'OSS存储键（PDF文件）',
     `submitted_by_name` VARCHAR(128) DEFAULT NULL COMMENT '提交者姓名',
     `submitted_by_role` VARCHAR(64) DEFAULT NULL COMMENT '提交者角色',
     `operated_by` VARCHAR(64) DEFAULT NULL COMMENT '操作人',
     `operated_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '操作时间',
+    `annotation_count` INT NOT NULL DEFAULT 0 COMMENT '批注数（随批注增删维护）',
     `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     PRIMARY KEY (`id`),
@@ -260,7 +276,9 @@ CREATE TABLE IF NOT EXISTS `papers` (
     KEY `idx_teacher_id` (`teacher_id`),
     KEY `idx_version` (`version`),
     KEY `idx_status` (`status`),
-    KEY `idx_operated_time` (`operated_time`)
+    KEY `idx_operated_time` (`operated_time`),
+    KEY `idx_papers_owner_status` (`owner_id`, `status`),
+    KEY `idx_papers_owner_created_at` (`owner_id`, `created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='论文信息表';
 """
 
@@ -287,6 +305,7 @@ CREATE TABLE IF NOT EXISTS `papers_history` (
     KEY `idx_papers_history_version` (`version`),
     KEY `idx_papers_history_status` (`status`),
     KEY `idx_papers_history_created_at` (`created_at`),
+    KEY `idx_papers_history_paper_created_at` (`paper_id`, `created_at`),
     CONSTRAINT `fk_papers_history_paper_id` FOREIGN KEY (`paper_id`) REFERENCES `papers` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='论文历史版本表';
 """
@@ -324,6 +343,7 @@ CREATE TABLE IF NOT EXISTS `annotations` (
     PRIMARY KEY (`id`),
     KEY `idx_paper_id` (`paper_id`),
     KEY `idx_author_id` (`author_id`),
+    KEY `idx_annotations_paper_created_at` (`paper_id`, `created_at`),
     CONSTRAINT `fk_annotations_paper_id` FOREIGN KEY (`paper_id`) REFERENCES `papers` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='批注表';
 """
@@ -379,11 +399,61 @@ CREATE TABLE IF NOT EXISTS `operation_logs` (
     `status` VARCHAR(16) NOT NULL DEFAULT 'success' COMMENT '操作状态（success/failure）',
     PRIMARY KEY (`id`),
     KEY `idx_user_id` (`user_id`),
-    KEY `idx_operation_time` (`operation_time`)
+    KEY `idx_operation_time` (`operation_time`),
+    KEY `idx_operation_logs_user_time` (`user_id`, `operation_time`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='操作日志表';
 """
 
 
+IMPORT_JOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `import_jobs` (
+    `id` VARCHAR(32) NOT NULL COMMENT '任务ID',
+    `kind` VARCHAR(32) NOT NULL COMMENT '导入类型（users/groups）',
+    `status` VARCHAR(16) NOT NULL DEFAULT 'queued' COMMENT '状态（queued/running/succeeded/failed）',
+    `filename` VARCHAR(255) DEFAULT NULL COMMENT '上传文件名',
+    `params` JSON DEFAULT NULL COMMENT '导入参数',
+    `created_by` VARCHAR(64) DEFAULT NULL COMMENT '提交人（用户类型:自增ID）',
+    `total_rows` INT DEFAULT NULL COMMENT '数据行数（按行数估算）',
+    `processed_rows` INT NOT NULL DEFAULT 0 COMMENT '已处理行数（含失败行）',
+    `failed_rows` INT NOT NULL DEFAULT 0 COMMENT '失败行数',
+    `result` JSON DEFAULT NULL COMMENT '导入结果汇总',
+    `error` TEXT COMMENT '任务失败原因',
+    `started_at` DATETIME DEFAULT NULL COMMENT '开始处理时间',
+    `finished_at` DATETIME DEFAULT NULL COMMENT '结束时间',
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '提交时间',
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最近一次进度更新时间',
+    PRIMARY KEY (`id`),
+    KEY `idx_import_jobs_status_updated` (`status`, `updated_at`),
+    KEY `idx_import_jobs_created_by` (`created_by`, `created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='后台导入任务表';
+"""
+
+
+BLOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `blobs` (
+    `sha256` CHAR(64) NOT NULL COMMENT '文件内容 SHA-256（十六进制）',
+    `size` BIGINT UNSIGNED NOT NULL COMMENT '文件字节数',
+    `ref_count` INT NOT NULL DEFAULT 0 COMMENT '引用数（论文/历史版本/材料/模板/派生缓存）',
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '首次写入时间',
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最近写入/引用变更时间',
+    PRIMARY KEY (`sha256`),
+    KEY `idx_blobs_ref_count_updated` (`ref_count`, `updated_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='内容寻址文件表';
+"""
+
+
+BLOB_DERIVATIVES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `blob_derivatives` (
+    `source_sha256` CHAR(64) NOT NULL COMMENT '源文件 SHA-256',
+    `kind` VARCHAR(32) NOT NULL COMMENT '派生类型（如 pdf）',
+    `result_sha256` CHAR(64) NOT NULL COMMENT '派生结果 SHA-256',
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '生成时间',
+    PRIMARY KEY (`source_sha256`, `kind`),
+    KEY `idx_blob_derivatives_result` (`result_sha256`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='按源文件内容缓存的派生文件';
+"""
+
+
 USER_MESSAGES_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS `user_messages` (
     `id` INT NOT NULL AUTO_INCREMENT COMMENT '消息ID',
@@ -395,16 +465,60 @@ CREATE TABLE IF NOT EXISTS `user_messages` (
     `status` VARCHAR(16) NOT NULL DEFAULT 'unread' COMMENT '状态（unread/read）',
     `received_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '接收时间',
     `metadata` JSON DEFAULT NULL COMMENT '扩展元数据',
+    `ddlid` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.ddlid'))) STORED COMMENT 'DDL通知对应的ddlid（由metadata生成）',
+    `sender_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.sender_id'))) STORED COMMENT '发送者ID（由metadata生成）',
+    `group_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.group_id'))) STORED COMMENT '群组ID（由metadata生成）',
+    `message_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.message_id'))) STORED COMMENT '推送批次ID（由metadata生成）',
     `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '记录创建时间',
     `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '记录更新时间',
     PRIMARY KEY (`id`),
     KEY `idx_user_messages_user_id` (`user_id`),
     KEY `idx_user_messages_status` (`status`),
-    KEY `idx_user_messages_received_time` (`received_time`)
+    KEY `idx_user_messages_received_time` (`received_time`),
+    KEY `idx_user_messages_user_status_time` (`user_id`, `status`, `received_time`),
+    KEY `idx_user_messages_user_time` (`user_id`, `received_time`),
+    KEY `idx_user_messages_source` (`source`),
+    KEY `idx_user_messages_ddlid` (`ddlid`),
+    KEY `idx_user_messages_sender_time` (`sender_id`, `received_time`),
+    KEY `idx_user_messages_group_id` (`group_id`),
+    KEY `idx_user_messages_message_id` (`message_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='用户信息记录表（记录用户接收到的消息）';
 """
 
 
+# 保留 updated_at 原值：该列带 ON UPDATE CURRENT_TIMESTAMP，且用作论文更新时间
+PAPERS_ANNOTATION_COUNT_BACKFILL_SQL = """
+UPDATE `papers` p
+JOIN (SELECT paper_id, COUNT(*) AS cnt FROM `annotations` GROUP BY paper_id) a ON a.paper_id = p.id
+SET p.annotation_count = a.cnt, p.updated_at = p.updated_at
+"""
+
+# 早期推送把客户端传入的 roles[0]（如“教师”“管理员”或自定义角色）写入 metadata.sender_role，
+# 现在按发送者类型（admin/teacher）匹配发送者，这里把旧值规范化：先换算中英文别名，
+# 其余旧值按 sender_id 只出现在 admins 或 teachers 其中一张表来推断，两表都有的无法区分，保持不变
+USER_MESSAGES_SENDER_ROLE_BACKFILL_SQL = (
+    """
+    UPDATE `user_messages`
+    SET `metadata` = JSON_SET(`metadata`, '$.sender_role',
+            IF(LOWER(JSON_UNQUOTE(`metadata`->'$.sender_role')) IN ('admin', '管理员'), 'admin', 'teacher')),
+        `updated_at` = `updated_at`
+    WHERE `sender_id` IS NOT NULL
+      AND LOWER(JSON_UNQUOTE(`metadata`->'$.sender_role')) IN ('admin', '管理员', 'teacher', '教师')
+      AND JSON_UNQUOTE(`metadata`->'$.sender_role') NOT IN ('admin', 'teacher')
+    """,
+    """
+    UPDATE `user_messages` m
+    SET m.`metadata` = JSON_SET(m.`metadata`, '$.sender_role',
+            IF(EXISTS (SELECT 1 FROM `admins` a WHERE a.id = m.sender_id), 'admin', 'teacher')),
+        m.`updated_at` = m.`updated_at`
+    WHERE m.`sender_id` IS NOT NULL
+      AND JSON_UNQUOTE(m.`metadata`->'$.sender_role') NOT IN ('admin', 'teacher')
+      AND (EXISTS (SELECT 1 FROM `admins` a WHERE a.id = m.sender_id)
+           XOR EXISTS (SELECT 1 FROM `teachers` t WHERE t.id = m.sender_id))
+    """,
+)
+
+
 def init_db(database_url: str | None = None) -> None:
     """Create base tables if missing (one-time use)."""
     url = database_url or DEFAULT_DB_URL
@@ -431,6 +545,7 @@ def init_db(database_url: str | None = None) -> None:
                 FILE_RECORDS_TABLE_SQL,
                 GROUPS_TABLE_SQL,
                 GROUP_MEMBERS_TABLE_SQL,
+                GROUP_STATS_TABLE_SQL,
                 PAPERS_TABLE_SQL,
                 PAPERS_HISTORY_TABLE_SQL,
                 PAPER_REVIEWS_TABLE_SQL,
@@ -439,12 +554,15 @@ def init_db(database_url: str | None = None) -> None:
                 TEMPLATES_TABLE_SQL,
                 USER_MESSAGES_TABLE_SQL,
                 OPERATION_LOGS_TABLE_SQL,
+                IMPORT_JOBS_TABLE_SQL,
+                BLOBS_TABLE_SQL,
+                BLOB_DERIVATIVES_TABLE_SQL,
             ):
                 cur.execute(sql)
         print(
-            "Tables ensured: schools, departments, students, teachers, admins, file_records, groups, group_members, "
+            "Tables ensured: schools, departments, students, teachers, admins, file_records, groups, group_members, group_stats, "
             "papers, papers_history, paper_reviews, annotations, ddl_management, templates, "
-            "user_messages, operation_logs"
+            "user_messages, operation_logs, import_jobs"
         )
     finally:
         conn.close()
@@ -554,6 +672,14 @@ TABLE_COLUMN_DEFINITIONS = {
         "created_at": "`created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'",
         "updated_at": "`updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'",
     },
+    "group_stats": {
+        "group_id": "`group_id` VARCHAR(64) NOT NULL COMMENT '群组编号'",
+        "student_count": "`student_count` INT NOT NULL DEFAULT 0 COMMENT '有效学生成员数'",
+        "pending_papers": "`pending_papers` INT NOT NULL DEFAULT 0 COMMENT '待审阅论文数'",
+        "reviewed_papers": "`reviewed_papers` INT NOT NULL DEFAULT 0 COMMENT '已审阅论文数'",
+        "refreshed_at": "`refreshed_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最近一次全量汇总时间'",
+        "updated_at": "`updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'",
+    },
     "group_members": {
         "group_id": "`group_id` VARCHAR(64) NOT NULL COMMENT '群组编号'",
         "member_id": "`member_id` BIGINT UNSIGNED NOT NULL COMMENT '成员ID'",
@@ -576,12 +702,13 @@ TABLE_COLUMN_DEFINITIONS = {
         "status": "`status` VARCHAR(32) NOT NULL COMMENT '状态（uploaded:已上传, processing:处理中, completed:完成, rejected:驳回）'",
         "detail": "`detail` TEXT COMMENT '状态描述'",
         "ddl": "`ddl` DATETIME DEFAULT NULL COMMENT '截止时间'",
-        "oss_key": "`oss_key` VARCHAR(128) NOT NULL COMMENT 'OSS存储键（docx文件）'",
-        "pdf_oss_key": "`pdf_oss_key` VARCHAR(128) NOT NULL COMMENT 'OSS存储键（PDF文件）'",
+        "oss_key": "`oss_key` VARCHAR(255) NOT NULL COMMENT 'OSS存储键（docx文件）'",
+        "pdf_oss_key": "`pdf_oss_key` VARCHAR(255) NOT NULL COMMENT 'OSS存储键（PDF文件）'",
         "submitted_by_name": "`submitted_by_name` VARCHAR(128) DEFAULT NULL COMMENT '提交者姓名'",
         "submitted_by_role": "`submitted_by_role` VARCHAR(64) DEFAULT NULL COMMENT '提交者角色'",
         "operated_by": "`operated_by` VARCHAR(64) DEFAULT NULL COMMENT '操作人'",
         "operated_time": "`operated_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '操作时间'",
+        "annotation_count": "`annotation_count` INT NOT NULL DEFAULT 0 COMMENT '批注数（随批注增删维护）'",
         "created_at": "`created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'",
         "updated_at": "`updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'",
     },
@@ -655,6 +782,11 @@ TABLE_COLUMN_DEFINITIONS = {
         "status": "`status` VARCHAR(16) NOT NULL DEFAULT 'unread' COMMENT '状态（unread/read）'",
         "received_time": "`received_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '接收时间'",
         "metadata": "`metadata` JSON DEFAULT NULL COMMENT '扩展元数据'",
+        # metadata 中常用于查询的字段提升为 STORED 生成列并建索引，写入时由 MySQL 自动维护
+        "ddlid": "`ddlid` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.ddlid'))) STORED COMMENT 'DDL通知对应的ddlid（由metadata生成）'",
+        "sender_id": "`sender_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.sender_id'))) STORED COMMENT '发送者ID（由metadata生成）'",
+        "group_id": "`group_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.group_id'))) STORED COMMENT '群组ID（由metadata生成）'",
+        "message_id": "`message_id` VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(`metadata`, '$.message_id'))) STORED COMMENT '推送批次ID（由metadata生成）'",
         "created_at": "`created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '记录创建时间'",
         "updated_at": "`updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '记录更新时间'",
     },
@@ -721,12 +853,15 @@ TABLE_INDEX_DEFINITIONS = {
         "CREATE UNIQUE INDEX uniq_group_id ON `groups` (group_id)",
         "CREATE INDEX idx_group_name ON `groups` (group_name)",
         "CREATE INDEX idx_teacher_id ON `groups` (teacher_id)",
-        "CREATE INDEX idx_teacher_name ON `groups` (teacher_name)"
+        "CREATE INDEX idx_teacher_name ON `groups` (teacher_name)",
+        "CREATE INDEX idx_groups_created_at ON `groups` (created_at) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "group_members": [
         "CREATE INDEX idx_member_id ON `group_members` (member_id)",
         "CREATE INDEX idx_member_type ON `group_members` (member_type)",
-        "CREATE INDEX idx_group_id ON `group_members` (group_id)"
+        "CREATE INDEX idx_group_id ON `group_members` (group_id)",
+        # 成员列表/人数统计：group_id + member_type + is_active
+        "CREATE INDEX idx_group_members_group_type_active ON `group_members` (group_id, member_type, is_active) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "papers": [
         "CREATE INDEX idx_owner_id ON `papers` (owner_id)",
@@ -734,14 +869,19 @@ TABLE_INDEX_DEFINITIONS = {
         "CREATE INDEX idx_teacher_name ON `papers` (teacher_name)",
         "CREATE INDEX idx_version ON `papers` (version)",
         "CREATE INDEX idx_status ON `papers` (status)",
-        "CREATE INDEX idx_operated_time ON `papers` (operated_time)"
+        "CREATE INDEX idx_operated_time ON `papers` (operated_time)",
+        # 学生论文按状态筛选、按创建时间排序
+        "CREATE INDEX idx_papers_owner_status ON `papers` (owner_id, status) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_papers_owner_created_at ON `papers` (owner_id, created_at) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "papers_history": [
         "CREATE INDEX idx_papers_history_paper_id ON `papers_history` (paper_id)",
         "CREATE INDEX idx_papers_history_teacher_name ON `papers_history` (teacher_name)",
         "CREATE INDEX idx_papers_history_version ON `papers_history` (version)",
         "CREATE INDEX idx_papers_history_status ON `papers_history` (status)",
-        "CREATE INDEX idx_papers_history_created_at ON `papers_history` (created_at)"
+        "CREATE INDEX idx_papers_history_created_at ON `papers_history` (created_at)",
+        # 版本列表：paper_id 过滤 + created_at 排序
+        "CREATE INDEX idx_papers_history_paper_created_at ON `papers_history` (paper_id, created_at) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "paper_reviews": [
         "CREATE INDEX idx_paper_id ON `paper_reviews` (paper_id)",
@@ -750,7 +890,9 @@ TABLE_INDEX_DEFINITIONS = {
     ],
     "annotations": [
         "CREATE INDEX idx_annotations_paper_id ON `annotations` (paper_id)",
-        "CREATE INDEX idx_annotations_author_id ON `annotations` (author_id)"
+        "CREATE INDEX idx_annotations_author_id ON `annotations` (author_id)",
+        # 论文批注列表：paper_id 过滤 + created_at 排序
+        "CREATE INDEX idx_annotations_paper_created_at ON `annotations` (paper_id, created_at) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "ddl_management": [
         "CREATE INDEX idx_teacher_id ON `ddl_management` (teacher_id)",
@@ -765,11 +907,22 @@ TABLE_INDEX_DEFINITIONS = {
     "user_messages": [
         "CREATE INDEX idx_user_messages_user_id ON `user_messages` (user_id)",
         "CREATE INDEX idx_user_messages_status ON `user_messages` (status)",
-        "CREATE INDEX idx_user_messages_received_time ON `user_messages` (received_time)"
+        "CREATE INDEX idx_user_messages_received_time ON `user_messages` (received_time)",
+        # 通知查询：user_id [+ status] 过滤 + received_time 倒序
+        "CREATE INDEX idx_user_messages_user_status_time ON `user_messages` (user_id, status, received_time) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_user_messages_user_time ON `user_messages` (user_id, received_time) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_user_messages_source ON `user_messages` (source) ALGORITHM=INPLACE LOCK=NONE",
+        # metadata 生成列：替代 metadata LIKE 全表扫描
+        "CREATE INDEX idx_user_messages_ddlid ON `user_messages` (ddlid) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_user_messages_sender_time ON `user_messages` (sender_id, received_time) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_user_messages_group_id ON `user_messages` (group_id) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_user_messages_message_id ON `user_messages` (message_id) ALGORITHM=INPLACE LOCK=NONE"
     ],
     "operation_logs": [
         "CREATE INDEX idx_operation_logs_user_id ON `operation_logs` (user_id)",
-        "CREATE INDEX idx_operation_logs_time ON `operation_logs` (operation_time)"
+        "CREATE INDEX idx_operation_logs_time ON `operation_logs` (operation_time)",
+        # 审计日志：按用户筛选 + operation_time 倒序
+        "CREATE INDEX idx_operation_logs_user_time ON `operation_logs` (user_id, operation_time) ALGORITHM=INPLACE LOCK=NONE"
     ],
 }
 
@@ -801,6 +954,7 @@ def sync_schema(database_url: str | None = None) -> None:
                 FILE_RECORDS_TABLE_SQL,
                 GROUPS_TABLE_SQL,
                 GROUP_MEMBERS_TABLE_SQL,
+                GROUP_STATS_TABLE_SQL,
                 PAPERS_TABLE_SQL,
                 PAPERS_HISTORY_TABLE_SQL,
                 PAPER_REVIEWS_TABLE_SQL,
@@ -809,12 +963,18 @@ def sync_schema(database_url: str | None = None) -> None:
                 TEMPLATES_TABLE_SQL,
                 USER_MESSAGES_TABLE_SQL,
                 OPERATION_LOGS_TABLE_SQL,
+                IMPORT_JOBS_TABLE_SQL,
+                BLOBS_TABLE_SQL,
+                BLOB_DERIVATIVES_TABLE_SQL,
             ):
                 cur.execute(sql)
 
         db_name = params["database"]
 
         # Add missing columns
+        # user_messages 的 metadata 生成列（ddlid/sender_id/group_id/message_id）是 STORED 列，
+        # ADD COLUMN 时 MySQL 会按已有 metadata 逐行计算，相当于完成历史数据回填
+        added_columns = set()
         for table, cols in TABLE_COLUMN_DEFINITIONS.items():
             existing = _get_existing_columns(conn, db_name, table)
             for col_name, col_def in cols.items():
@@ -822,12 +982,28 @@ def sync_schema(database_url: str | None = None) -> None:
                     stmt = f"ALTER TABLE `{table}` ADD COLUMN {col_def};"
                     with conn.cursor() as cur:
                         cur.execute(stmt)
+                    added_columns.add((table, col_name))
+
+        # Backfill papers.annotation_count when the column is first added
+        if ("papers", "annotation_count") in added_columns:
+            with conn.cursor() as cur:
+                cur.execute(PAPERS_ANNOTATION_COUNT_BACKFILL_SQL)
+
+        # Normalize legacy user_messages.metadata.sender_role values
+        with conn.cursor() as cur:
+            for sql in USER_MESSAGES_SENDER_ROLE_BACKFILL_SQL:
+                cur.execute(sql)
 
         # Align group_members column definitions (including defaults/comments)
         for col_def in TABLE_COLUMN_DEFINITIONS.get("group_members", {}).values():
             with conn.cursor() as cur:
                 cur.execute(f"ALTER TABLE `group_members` MODIFY COLUMN {col_def};")
 
+        # Widen papers storage keys (blob:// 存储键比旧的 128 字符上限长)
+        for col_name in ("oss_key", "pdf_oss_key"):
+            with conn.cursor() as cur:
+                cur.execute(f"ALTER TABLE `papers` MODIFY COLUMN {TABLE_COLUMN_DEFINITIONS['papers'][col_name]};")
+
         # Align papers and papers_history timestamp defaults
         for table in ("papers", "papers_history"):
             for col_name in ("created_at", "updated_at"):
@@ -877,6 +1053,11 @@ def sync_schema(database_url: str | None = None) -> None:
                         cur.execute(idx_sql)
                     except pymysql.err.InternalError:
                         cur.execute(idx_sql)
+                    except pymysql.err.OperationalError:
+                        # 不支持在线建索引（ALGORITHM=INPLACE LOCK=NONE）时退回默认方式
+                        if "LOCK=NONE" not in idx_sql:
+                            raise
+                        cur.execute(idx_sql.split(" ALGORITHM=")[0])
 
         print("Schema synchronized (added missing columns/indexes if any).")
     finally:
@@ -18,6 +18,12 @@ from fastapi.openapi.docs import (
 
 from app.api.v1.routes import api_router
 from app.config import settings
+from app.async_database import close_async_pool
+from app.core.executor import shutdown_executors
+from app.core.security import warm_up_password_pool
+from app.core.shared_cache import close_shared_cache, init_shared_cache
+from app.database import close_pool, get_pool
+from app.services.import_jobs import recover_interrupted_jobs
 
 from app.middleware import setup_middleware
 from app.static_config import setup_static_files
@@ -31,6 +37,7 @@ openapi_tags = [
 	{"name": "标注", "description": "论文标注创建与查询"},
 	{"name": "管理", "description": "后台管理、模板与审计"},
 	{"name": "用户", "description": "用户创建、更新、导入与删除"},
+	{"name": "任务", "description": "后台导入任务进度与失败行下载"},
 ]
 
 
@@ -69,6 +76,24 @@ setup_static_files(app)
 register_routes(app)
 
 
+@app.on_event("startup")
+def on_startup() -> None:
+	"""预热数据库连接池与 bcrypt 进程池，标记中断的导入任务，开始接收其它 worker 的缓存失效消息。"""
+	get_pool().prefill()
+	warm_up_password_pool()
+	recover_interrupted_jobs()
+	init_shared_cache()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+	"""释放阻塞任务线程池/进程池、数据库连接池与共享缓存连接。"""
+	close_shared_cache()
+	await close_async_pool()
+	shutdown_executors()
+	close_pool()
+
+
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
 	return get_swagger_ui_html(
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""同步连接池（线程池）与 aiomysql 异步连接池的查询吞吐对比
+
+用法：
+    python scripts/bench_async_db.py --requests 2000 --concurrency 200
+    python scripts/bench_async_db.py --sql "SELECT id FROM user_messages WHERE user_id = %s LIMIT 20" --arg 20230001
+
+两条路径执行同一条 SQL：
+- sync：get_connection() 借出 pymysql 连接，在 db 线程池中执行（现有接口的路径）
+- async：get_async_db() 借出 aiomysql 连接，直接在事件循环上 await
+
+未安装 aiomysql 时只运行 sync 路径。
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.async_database import async_db_enabled, close_async_pool, get_async_db
+from app.core.executor import run_blocking, shutdown_executors
+from app.database import close_pool, get_connection, pool_stats
+
+
+def _sync_query(sql: str, args) -> int:
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, args)
+            return len(cur.fetchall())
+    finally:
+        conn.close()
+
+
+async def _async_query(sql: str, args) -> int:
+    agen = get_async_db()
+    db = await agen.__anext__()
+    try:
+        cursor = await db.cursor()
+        await cursor.execute(sql, args)
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return len(rows)
+    finally:
+        await agen.aclose()
+
+
+async def _run(name: str, call, total: int, concurrency: int) -> None:
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(
+        f"[{name}] 请求 {total}，并发 {concurrency}，失败 {errors}，总耗时 {elapsed:.2f}s，"
+        f"吞吐 {total / elapsed:.1f} req/s，"
+        f"p50 {statistics.median(latencies) * 1000:.1f}ms，p95 {p95 * 1000:.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="sync vs async 数据库路径基准测试")
+    parser.add_argument("--requests", type=int, default=1000, help="总请求数")
+    parser.add_argument("--concurrency", type=int, default=100, help="并发请求数")
+    parser.add_argument("--sql", default="SELECT 1", help="要执行的 SQL")
+    parser.add_argument("--arg", action="append", default=None, help="SQL 参数，可重复传入")
+    opts = parser.parse_args()
+
+    args = tuple(opts.arg) if opts.arg else None
+
+    await _run(
+        "sync",
+        lambda: run_blocking("db", _sync_query, opts.sql, args),
+        opts.requests,
+        opts.concurrency,
+    )
+    print(f"  连接池状态：{pool_stats()}")
+
+    if async_db_enabled():
+        await _run("async", lambda: _async_query(opts.sql, args), opts.requests, opts.concurrency)
+    else:
+        print("[async] 未安装 aiomysql 或 ASYNC_DB_ENABLED=false，跳过")
+
+    await close_async_pool()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_executors()
+        close_pool()
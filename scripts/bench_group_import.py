@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""群组/师生关系导入基准：逐行写入（改造前）与整体校验 + 批量写入（改造后）对比
+
+在数据库中临时创建一批带 BENCH 前缀的教师与学生，生成指定行数的导入名单（默认 20000 行），
+依次执行：
+- legacy：逐行 upsert 群组、查教师、查学生、插入两条成员关系（改造前的实现），结束后回滚
+- dry_run：`_save_import_rows(..., dry_run=True)`，只做批量 IN 查询与整体校验
+- bulk：`_save_import_rows(...)`，校验通过后批量 INSERT ... ON DUPLICATE KEY UPDATE 并提交
+
+结束后删除本次创建的全部数据（--keep 保留）。请勿在生产库上运行。
+
+用法：
+    python scripts/bench_group_import.py --rows 20000 --group-size 40
+    python scripts/bench_group_import.py --rows 20000 --skip-legacy
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.v1.endpoints.groups import _save_import_rows
+from app.database import close_pool, get_connection
+from app.services import group_stats
+
+
+def _seed(conn, prefix: str, rows: int, group_size: int) -> list:
+    groups = -(-rows // group_size)
+    teachers = [(f"{prefix}T{g}", f"教师{g}", "!") for g in range(groups)]
+    students = [(f"{prefix}S{i}", f"学生{i}", "!") for i in range(rows)]
+    with conn.cursor() as cur:
+        cur.executemany("INSERT INTO teachers (teacher_id, name, password) VALUES (%s, %s, %s)", teachers)
+        cur.executemany("INSERT INTO students (student_id, name, password) VALUES (%s, %s, %s)", students)
+    conn.commit()
+    return [
+        {
+            "group_id": f"{prefix}G{i // group_size}",
+            "group_name": f"基准群组{i // group_size}",
+            "teacher_id": f"{prefix}T{i // group_size}",
+            "student_id": f"{prefix}S{i}",
+            "student_name": f"学生{i}",
+            "line": i + 2,
+        }
+        for i in range(rows)
+    ]
+
+
+def _legacy_import(conn, import_data: list) -> None:
+    """改造前的逐行写入，执行完回滚，不影响后续对比。"""
+    cur = conn.cursor()
+    try:
+        for item in import_data:
+            cur.execute("""
+                INSERT INTO `groups` (`group_id`, `group_name`, `teacher_id`, `description`)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE `group_name`=VALUES(`group_name`), `teacher_id`=VALUES(`teacher_id`), `description`=VALUES(`description`)
+            """, (item["group_id"], item["group_name"], item["teacher_id"], None))
+            cur.execute("SELECT `id` FROM `teachers` WHERE `teacher_id` = %s", (item["teacher_id"],))
+            teacher_id = cur.fetchone()[0]
+            cur.execute("SELECT `id`, `name` FROM `students` WHERE `student_id` = %s", (item["student_id"],))
+            student_id = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`)
+                VALUES (%s, %s, 'student')
+                ON DUPLICATE KEY UPDATE `is_active`=1
+            """, (item["group_id"], student_id))
+            cur.execute("""
+                INSERT INTO `group_members` (`group_id`, `member_id`, `member_type`)
+                VALUES (%s, %s, 'teacher')
+                ON DUPLICATE KEY UPDATE `is_active`=1
+            """, (item["group_id"], teacher_id))
+        group_stats.refresh_groups(cur, (item["group_id"] for item in import_data))
+    finally:
+        conn.rollback()
+        cur.close()
+
+
+def _cleanup(conn, prefix: str) -> None:
+    like = f"{prefix}%"
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM group_members WHERE group_id LIKE %s", (like,))
+        cur.execute("DELETE FROM group_stats WHERE group_id LIKE %s", (like,))
+        cur.execute("DELETE FROM `groups` WHERE group_id LIKE %s", (like,))
+        cur.execute("DELETE FROM students WHERE student_id LIKE %s", (like,))
+        cur.execute("DELETE FROM teachers WHERE teacher_id LIKE %s", (like,))
+    conn.commit()
+
+
+def _timed(label: str, func, rows: int):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"[{label}] {rows} 行，耗时 {elapsed:.2f}s，{rows / elapsed:.0f} 行/s")
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="群组导入基准")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--group-size", type=int, default=40, help="每个群组的学生数")
+    parser.add_argument("--skip-legacy", action="store_true", help="不运行逐行写入（耗时较长）")
+    parser.add_argument("--keep", action="store_true", help="保留本次创建的数据")
+    args = parser.parse_args()
+
+    # 学号列为 VARCHAR(20)，前缀保持简短
+    prefix = f"B{uuid.uuid4().hex[:6]}"
+    conn = get_connection()
+    try:
+        import_data = _seed(conn, prefix, args.rows, args.group_size)
+        print(f"已创建 {args.rows} 名学生、{-(-args.rows // args.group_size)} 名教师，前缀 {prefix}")
+
+        if not args.skip_legacy:
+            _timed("legacy", lambda: _legacy_import(conn, import_data), args.rows)
+        summary = _timed("dry_run", lambda: _save_import_rows(import_data, [], dry_run=True), args.rows)
+        assert not summary["errors"], summary["errors"][:5]
+        summary = _timed("bulk", lambda: _save_import_rows(import_data, []), args.rows)
+        print(
+            f"群组 {summary['groups']}，学生成员 {summary['student_members']}，"
+            f"教师成员 {summary['teacher_members']}"
+        )
+    finally:
+        if not args.keep:
+            _cleanup(conn, prefix)
+        conn.close()
+        close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""登录高峰时 bcrypt 对接口线程的占用：线程内计算（改造前）与 bcrypt 进程池（改造后）对比
+
+模拟开学登录高峰：同时发起大量登录（未指定 user_type 时每次最多校验三个候选账号），
+并夹杂普通轻量请求（模拟一次 1ms 的数据库查询）。两种模式共用同样大小的接口线程池
+（默认 40，与 FastAPI 同步接口的默认线程数一致）：
+
+- thread：同步接口在接口线程中逐个调用 bcrypt（改造前的 login_user）
+- process：async 接口把候选账号的校验并行交给 bcrypt 进程池，接口线程只用于查库（改造后）
+
+输出登录吞吐/延迟以及普通请求的延迟；普通请求的 p95 反映接口线程是否被 bcrypt 占满。
+不需要数据库，只需要安装 bcrypt。
+
+用法：
+    python scripts/bench_login.py --logins 300 --concurrency 100 --workers 4
+    python scripts/bench_login.py --rounds 12 --candidates 1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from app.config import settings
+from app.core import security
+from app.core.executor import get_executor, shutdown_executors
+
+PASSWORD = "123456Abc!"
+
+
+def _db_query() -> None:
+    time.sleep(0.001)
+
+
+def _login_in_thread(hashes) -> bool:
+    _db_query()
+    return any(security._checkpw(PASSWORD, h) for h in hashes)
+
+
+async def _login_with_pool(loop, api_pool, hashes) -> bool:
+    await loop.run_in_executor(api_pool, _db_query)
+    results = await asyncio.gather(*(security.verify_password_async(PASSWORD, h) for h in hashes))
+    return any(results)
+
+
+def _summary(latencies) -> str:
+    if not latencies:
+        return "无数据"
+    latencies = sorted(latencies)
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    return f"p50 {statistics.median(latencies) * 1000:.1f}ms，p95 {p95 * 1000:.1f}ms"
+
+
+async def _run(mode: str, args, hashes) -> None:
+    loop = asyncio.get_running_loop()
+    api_pool = ThreadPoolExecutor(max_workers=args.api_threads, thread_name_prefix="api")
+    sem = asyncio.Semaphore(args.concurrency)
+    login_latencies, light_latencies = [], []
+    errors = 0
+
+    async def login():
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                if mode == "thread":
+                    ok = await loop.run_in_executor(api_pool, _login_in_thread, hashes)
+                else:
+                    ok = await _login_with_pool(loop, api_pool, hashes)
+                if not ok:
+                    errors += 1
+            except Exception:
+                errors += 1
+            login_latencies.append(time.perf_counter() - start)
+
+    async def light_requests(stop: asyncio.Event):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await loop.run_in_executor(api_pool, _db_query)
+            light_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    stop = asyncio.Event()
+    light_task = asyncio.create_task(light_requests(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await light_task
+    api_pool.shutdown(wait=True)
+
+    print(
+        f"[{mode}] 登录 {args.logins}，并发 {args.concurrency}，失败 {errors}，总耗时 {elapsed:.2f}s，"
+        f"吞吐 {args.logins / elapsed:.1f} 次/s，{_summary(login_latencies)}"
+    )
+    print(f"[{mode}] 普通请求 {len(light_latencies)} 次，{_summary(light_latencies)}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="bcrypt 登录吞吐对比")
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--api-threads", type=int, default=40, help="接口线程数")
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS or 2, help="bcrypt 进程数")
+    parser.add_argument("--max-pending", type=int, default=0, help="进程池排队上限，默认不小于登录并发")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost（gensalt 默认 12）")
+    parser.add_argument("--candidates", type=int, default=3, help="每次登录校验的候选账号数")
+    args = parser.parse_args()
+
+    # 只有最后一个候选账号的密码正确，与未指定 user_type 时的最坏情况一致
+    wrong = bcrypt.hashpw(b"wrong-password", bcrypt.gensalt(args.rounds)).decode()
+    right = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+    hashes = [wrong] * (args.candidates - 1) + [right]
+
+    settings.PASSWORD_HASH_WORKERS = args.workers
+    settings.PASSWORD_HASH_MAX_PENDING = args.max_pending or args.concurrency * args.candidates
+    print(f"CPU {os.cpu_count()}，bcrypt cost {args.rounds}，每次登录 {args.candidates} 次校验")
+
+    asyncio.run(_run("thread", args, hashes))
+    get_executor("bcrypt").warm_up()
+    asyncio.run(_run("process", args, hashes))
+    print(f"bcrypt 进程池统计：{get_executor('bcrypt').stats()}")
+    shutdown_executors()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
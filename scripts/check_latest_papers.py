@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""核对班级学生 / 群组论文接口改写前后的结果是否一致
+
+`GET /groups/{group_id}/students` 与 `GET /groups/{group_id}/papers` 改为在 SQL 中用
+ROW_NUMBER() 直接取每个学生最新的一篇论文。本脚本在一个事务内造一个 500 名学生的群组
+（每人 0~3 篇论文，更新时间各不相同），分别执行旧查询 + 旧的 Python 组装逻辑与新实现，
+逐项比较结果，最后回滚事务，不在库中留下数据。
+
+旧逻辑按学生返回了全部论文（按更新时间倒序），这里取其中第一篇，即“最新一篇”，与新实现比较。
+
+用法：
+    python scripts/check_latest_papers.py
+    python scripts/check_latest_papers.py --students 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql.cursors
+
+from app.api.v1.endpoints.groups import (
+    _build_class_students,
+    _build_group_papers,
+    _fetch_students_latest_paper,
+)
+from app.database import create_connection
+
+# 改写前两个接口共用的查询
+LEGACY_SQL = """
+SELECT
+    s.id as student_id,
+    s.name as student_name,
+    s.student_id as student_number,
+    p.id as paper_id,
+    p.updated_at as paper_update_time,
+    p.oss_key as paper_oss_key,
+    p.pdf_oss_key as paper_pdf_oss_key,
+    COALESCE(p.annotation_count, 0) as annotation_count
+FROM
+    students s
+JOIN
+    group_members gm ON s.id = gm.member_id AND gm.member_type = 'student' AND gm.is_active = 1
+LEFT JOIN
+    papers p ON s.id = p.owner_id
+WHERE
+    gm.group_id = %s
+ORDER BY
+    s.name ASC,
+    p.updated_at DESC
+"""
+
+
+def _fmt(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def legacy_class_students(rows):
+    students = {}
+    for row in rows:
+        student = students.setdefault(row["student_id"], {
+            "student_id": row["student_id"],
+            "student_name": row["student_name"],
+            "student_number": row["student_number"],
+            "papers": [],
+        })
+        if row["paper_id"]:
+            student["papers"].append({
+                "paper_id": row["paper_id"],
+                "paper_update_time": _fmt(row["paper_update_time"]),
+                "annotation_count": row["annotation_count"],
+            })
+    # 旧逻辑保留了全部论文，只取最新一篇比较
+    for student in students.values():
+        student["papers"] = student["papers"][:1]
+    return list(students.values())
+
+
+def legacy_group_papers(rows):
+    papers = {}
+    for row in rows:
+        if row["paper_id"] and row["student_id"] not in papers:
+            papers[row["student_id"]] = {
+                "paper_id": row["paper_id"],
+                "student_id": row["student_id"],
+                "student_name": row["student_name"],
+                "student_number": row["student_number"],
+                "paper_update_time": _fmt(row["paper_update_time"]),
+                "annotation_count": row["annotation_count"],
+                "oss_key": row["paper_oss_key"],
+                "pdf_oss_key": row["paper_pdf_oss_key"],
+            }
+    return list(papers.values())
+
+
+def seed(cursor, group_id: str, student_count: int) -> None:
+    tag = group_id[-8:]
+    base = datetime(2024, 1, 1)
+    cursor.execute(
+        "INSERT INTO `groups` (group_id, group_name) VALUES (%s, %s)",
+        (group_id, f"latest-paper-check-{tag}"),
+    )
+    minute = 0
+    for i in range(student_count):
+        cursor.execute(
+            "INSERT INTO students (student_id, name, password) VALUES (%s, %s, %s)",
+            (f"c{tag}{i:05d}", f"学生{tag}-{i:05d}", "x"),
+        )
+        student_pk = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO group_members (group_id, member_id, member_type) VALUES (%s, %s, 'student')",
+            (group_id, student_pk),
+        )
+        for v in range(random.randint(0, 3)):
+            minute += 1
+            ts = base + timedelta(minutes=minute)
+            cursor.execute(
+                """
+                INSERT INTO papers (owner_id, teacher_id, version, size, status, oss_key, pdf_oss_key,
+                                    annotation_count, created_at, updated_at)
+                VALUES (%s, 0, %s, 1, '已上传', %s, %s, %s, %s, %s)
+                """,
+                (student_pk, f"v{v + 1}", f"k{tag}{i}-{v}", f"p{tag}{i}-{v}",
+                 random.randint(0, 5), ts, ts),
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="班级学生/群组论文新旧实现结果核对")
+    parser.add_argument("--students", type=int, default=500, help="造数的学生人数")
+    opts = parser.parse_args()
+
+    group_id = f"chk-{uuid.uuid4().hex[:12]}"
+    conn = create_connection()
+    try:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            seed(cursor, group_id, opts.students)
+
+            start = time.perf_counter()
+            cursor.execute(LEGACY_SQL, (group_id,))
+            legacy_rows = cursor.fetchall()
+            legacy_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            rows = _fetch_students_latest_paper(cursor, group_id)
+            new_ms = (time.perf_counter() - start) * 1000
+
+        checks = [
+            ("GET /groups/{group_id}/students", legacy_class_students(legacy_rows), _build_class_students(rows)),
+            ("GET /groups/{group_id}/papers", legacy_group_papers(legacy_rows), _build_group_papers(rows)),
+        ]
+        failed = 0
+        for name, expected, actual in checks:
+            ok = expected == actual
+            if not ok:
+                failed += 1
+            print(f"[{'OK' if ok else 'FAIL'}] {name}: {len(actual)} 条")
+            if not ok:
+                for i, (a, b) in enumerate(zip(expected, actual)):
+                    if a != b:
+                        print(f"       第 {i} 条不一致\n       旧: {a}\n       新: {b}")
+                        break
+                else:
+                    print(f"       条数不一致：旧 {len(expected)}，新 {len(actual)}")
+        print(f"\n旧查询 {len(legacy_rows)} 行 {legacy_ms:.1f}ms，新查询 {len(rows)} 行 {new_ms:.1f}ms")
+        return 1 if failed else 0
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""核对共享缓存后端的 TTL、标签失效与跨进程失效广播
+
+对 `memory` 后端以及 Redis 协议后端执行同一组检查：
+- 读写与 TTL 过期
+- 按标签批量失效（如删除论文时清掉该论文的 AI 报告）
+- 两个“worker”（两个独立的后端实例）之间通过 pub/sub 传递失效消息，
+  接收方的身份 / 论文归属 / 列表总数本地缓存随之丢弃
+
+Redis 后端默认使用 fakeredis 作为本地替身（`pip install fakeredis`），
+也可以用 `--redis-url` 指向真实的 Redis 服务；两者都没有时只检查 memory 后端。
+
+用法：
+    python scripts/check_shared_cache.py
+    python scripts/check_shared_cache.py --redis-url redis://127.0.0.1:6379/15
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import count_cache, identity_cache, shared_cache
+from app.core.shared_cache import MemoryCache, RedisCache
+from app.services import paper_acl
+
+
+def check_backend(cache, label: str) -> None:
+    cache.set("k1", {"v": 1}, ttl=1)
+    cache.set("k2", {"v": 2}, tags=["paper:1"])
+    cache.set("k3", {"v": 3}, tags=["paper:1", "paper:2"])
+    cache.set("k4", {"v": 4}, tags=["paper:2"])
+    assert cache.get("k1") == {"v": 1}, "写入后应能读到"
+    time.sleep(1.2)
+    assert cache.get("k1") is None, "超过 TTL 后应过期"
+
+    cache.invalidate_tags("paper:1")
+    assert cache.get("k2") is None and cache.get("k3") is None, "标签失效应删除全部关联键"
+    assert cache.get("k4") == {"v": 4}, "其它标签的键不受影响"
+    cache.delete("k4")
+    assert cache.get("k4") is None
+    print(f"[{label}] TTL / 标签失效 通过，统计：{cache.stats()}")
+
+
+def check_broadcast(make_client, label: str) -> None:
+    """两个后端实例模拟两个 worker：A 广播，B 收到后丢弃本地缓存。"""
+    channel = f"cdai-check:{uuid.uuid4().hex}"
+    worker_a = RedisCache(make_client(), prefix="cdai-check:", channel=channel)
+    worker_b = RedisCache(make_client(), prefix="cdai-check:", channel=channel)
+    received = threading.Event()
+
+    def dispatch(message):
+        # 本进程的两个实例共用 NODE_ID，这里改写来源以模拟另一个 worker 发出的消息
+        shared_cache._dispatch(dict(message, origin="other-worker"))
+        received.set()
+
+    worker_b.start_listener(dispatch)
+    time.sleep(0.5)  # 等待订阅生效
+
+    identity_cache.put("student", 42, {"user_type": "student", "id": 42, "code": "S42", "name": "测试"})
+    paper_acl._cache.put(7, paper_acl.PaperACL(42, 3))
+    before = count_cache.table_versions(["groups"])
+
+    try:
+        for namespace, keys in (("identity", [["student", 42]]), ("paper_acl", [7]), ("count", ["groups"])):
+            received.clear()
+            worker_a.publish({"origin": shared_cache.NODE_ID, "ns": namespace, "keys": keys})
+            assert received.wait(5), f"{namespace} 失效消息未送达"
+    finally:
+        worker_b.close()
+
+    assert identity_cache.get("student", 42) is None, "身份缓存应被远端消息清除"
+    assert paper_acl._cache.get(7) is None, "论文归属缓存应被远端消息清除"
+    assert count_cache.table_versions(["groups"]) != before, "列表总数缓存的表版本应递增"
+    print(f"[{label}] 跨 worker 失效广播 通过，统计：{worker_b.stats()}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="核对共享缓存后端")
+    parser.add_argument("--redis-url", default=None, help="使用真实 Redis 服务而非 fakeredis")
+    args = parser.parse_args()
+
+    check_backend(MemoryCache(max_entries=100), "memory")
+
+    if args.redis_url:
+        import redis
+
+        def make_client():
+            return redis.Redis.from_url(args.redis_url)
+        label = "redis"
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            print("未安装 fakeredis 且未指定 --redis-url，跳过 Redis 后端检查")
+            return 0
+        server = fakeredis.FakeServer()
+
+        def make_client():
+            return fakeredis.FakeRedis(server=server)
+        label = "fakeredis"
+
+    check_backend(RedisCache(make_client(), prefix=f"cdai-check:{uuid.uuid4().hex}:"), label)
+    check_broadcast(make_client, label)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""对各接口的热点查询执行 EXPLAIN，确认都能命中 database_setup.py 中定义的索引
+
+用法：
+    python database_setup.py            # 先同步表结构与索引
+    python scripts/explain_indexes.py
+    python scripts/explain_indexes.py --analyze   # 先 ANALYZE TABLE 刷新统计信息
+
+每条查询输出实际使用的索引（key）、访问类型（type）与 Extra；
+出现全表扫描（type=ALL）或没有命中期望索引时记为 FAIL，脚本以非 0 退出。
+
+注意：表中数据极少时优化器可能认为全表扫描更便宜，结果仅供参考，
+建议在有真实数据量的库上执行。
+"""
+
+import argparse
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql.cursors
+
+from app.database import create_connection
+
+# (接口, SQL, 参数, 期望命中的索引)
+CHECKS = [
+    (
+        "GET /notifications/query (user_id + status)",
+        "SELECT id, user_id, username, title, content, source, status, received_time, metadata "
+        "FROM user_messages WHERE 1=1 AND user_id = %s AND status = %s "
+        "ORDER BY received_time DESC LIMIT 20 OFFSET 0",
+        ("20230001", "unread"),
+        "idx_user_messages_user_status_time",
+    ),
+    (
+        "GET /notifications/received (user_id)",
+        "SELECT id, user_id, username, title, content, source, status, received_time, metadata "
+        "FROM user_messages WHERE 1=1 AND user_id = %s "
+        "ORDER BY received_time DESC LIMIT 20 OFFSET 0",
+        ("20230001",),
+        "idx_user_messages_user_time",
+    ),
+    (
+        "GET /notifications/query (sender_id)",
+        "SELECT id, user_id, username, title, content, source, status, received_time, metadata "
+        "FROM user_messages WHERE 1=1 AND sender_id = %s "
+        "ORDER BY received_time DESC LIMIT 20 OFFSET 0",
+        ("1",),
+        "idx_user_messages_sender_time",
+    ),
+    (
+        "DELETE /papers/ddl/{ddlid} (ddlid)",
+        "DELETE FROM user_messages WHERE ddlid = %s AND source = 'ddl'",
+        ("1",),
+        "idx_user_messages_ddlid",
+    ),
+    (
+        "user_messages by source",
+        "SELECT id FROM user_messages WHERE source = %s ORDER BY id DESC LIMIT 20",
+        ("ddl",),
+        "idx_user_messages_source",
+    ),
+    (
+        "GET /groups/ (student count subquery)",
+        "SELECT COUNT(*) FROM group_members gm "
+        "WHERE gm.group_id = %s AND gm.member_type = 'student' AND gm.is_active = 1",
+        ("G001",),
+        "idx_group_members_group_type_active",
+    ),
+    (
+        "papers by owner + status",
+        "SELECT id, status FROM papers WHERE owner_id = %s AND status = %s",
+        (1, "已上传"),
+        "idx_papers_owner_status",
+    ),
+    (
+        "GET /groups/paper/unuploaded/members (NOT EXISTS 内层探测)",
+        "SELECT 1 FROM papers p WHERE p.owner_id = %s AND p.status IN (%s, %s)",
+        (1, "已上传", "待审阅"),
+        "idx_papers_owner_status",
+    ),
+    (
+        "GET /papers/list (owner_id ORDER BY created_at)",
+        "SELECT id, owner_id, teacher_id, version, oss_key, pdf_oss_key, created_at, updated_at "
+        "FROM papers WHERE owner_id = %s ORDER BY created_at DESC LIMIT 20 OFFSET 0",
+        (1,),
+        "idx_papers_owner_created_at",
+    ),
+    (
+        "GET /papers/{paper_id}/versions",
+        "SELECT version, size, created_at, status FROM papers_history "
+        "WHERE paper_id = %s ORDER BY created_at DESC",
+        (1,),
+        "idx_papers_history_paper_created_at",
+    ),
+    (
+        "GET /annotations/paper",
+        "SELECT id, paper_id, author_id, paragraph_id, coordinates, content, created_at, updated_at "
+        "FROM annotations WHERE paper_id = %s ORDER BY created_at ASC",
+        (1,),
+        "idx_annotations_paper_created_at",
+    ),
+    (
+        "GET /admin/audit/logs",
+        "SELECT id, user_id, username, operation_type, operation_path, operation_params, "
+        "ip_address, operation_time, status FROM operation_logs "
+        "ORDER BY operation_time DESC LIMIT 50 OFFSET 0",
+        None,
+        "idx_operation_logs_time",
+    ),
+    (
+        "GET /admin/audit/logs (cursor)",
+        "SELECT id, user_id, username, operation_type, operation_path, operation_params, "
+        "ip_address, operation_time, status FROM operation_logs "
+        "WHERE (operation_time < %s OR (operation_time = %s AND id < %s)) "
+        "ORDER BY operation_time DESC, id DESC LIMIT 51",
+        ("2030-01-01 00:00:00", "2030-01-01 00:00:00", 1 << 62),
+        "idx_operation_logs_time",
+    ),
+    (
+        "GET /notifications/received (cursor)",
+        "SELECT id, user_id, username, title, content, source, status, received_time, metadata "
+        "FROM user_messages WHERE 1=1 AND user_id = %s "
+        "AND (received_time < %s OR (received_time = %s AND id < %s)) "
+        "ORDER BY received_time DESC, id DESC LIMIT 21",
+        ("20230001", "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1 << 62),
+        "idx_user_messages_user_time",
+    ),
+    (
+        "GET /groups/ (admin, cursor)",
+        "SELECT g.id, g.group_id, g.group_name FROM `groups` g "
+        "WHERE (g.group_id LIKE %s OR g.group_name LIKE %s) "
+        "AND (g.created_at < %s OR (g.created_at = %s AND g.id < %s)) "
+        "ORDER BY g.created_at DESC, g.id DESC LIMIT 21",
+        ("%", "%", "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1 << 30),
+        "idx_groups_created_at",
+    ),
+    (
+        "operation_logs by user_id",
+        "SELECT id, operation_type, operation_time FROM operation_logs "
+        "WHERE user_id = %s ORDER BY operation_time DESC LIMIT 50",
+        ("1",),
+        "idx_operation_logs_user_time",
+    ),
+]
+
+TABLES = ("user_messages", "groups", "group_members", "papers", "papers_history", "annotations", "operation_logs")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="热点查询索引命中检查")
+    parser.add_argument("--analyze", action="store_true", help="执行前先 ANALYZE TABLE")
+    opts = parser.parse_args()
+
+    conn = create_connection()
+    failed = 0
+    try:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            if opts.analyze:
+                for table in TABLES:
+                    cursor.execute(f"ANALYZE TABLE `{table}`")
+                    cursor.fetchall()
+
+            for name, sql, args, expected in CHECKS:
+                cursor.execute(f"EXPLAIN {sql}", args)
+                plan = cursor.fetchall()
+                # 只看第一行（驱动表），子查询/派生表的情况在 Extra 中体现
+                row = plan[0] if plan else {}
+                key = row.get("key")
+                access = row.get("type")
+                ok = access != "ALL" and key == expected
+                if not ok:
+                    failed += 1
+                print(f"[{'OK' if ok else 'FAIL'}] {name}")
+                print(
+                    f"       type={access} key={key} expected={expected} "
+                    f"rows={row.get('rows')} extra={row.get('Extra')}"
+                )
+    finally:
+        conn.close()
+
+    print(f"\n共 {len(CHECKS)} 条，失败 {failed} 条")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
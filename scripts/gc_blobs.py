@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""回收内容寻址存储（doc/blobs）中不再被引用的文件
+
+- 默认删除引用数为 0、且超过 BLOB_GC_GRACE_SECONDS 未被写入的 blob（连同其派生缓存，如转换得到的 PDF），
+  并清理写入中断遗留的临时文件
+- --recount 先按 papers / papers_history / file_records / templates 与派生缓存重算引用数，
+  用于修复手工改库等造成的计数偏差；请在低峰期执行
+- --dry-run 只统计可回收的数量与字节数
+
+可配合 cron 每天执行一次。
+
+用法：
+    python scripts/gc_blobs.py --dry-run
+    python scripts/gc_blobs.py --recount
+    python scripts/gc_blobs.py --grace 3600
+"""
+
+import argparse
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import close_pool
+from app.services import blob_store
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="回收未引用的 blob")
+    parser.add_argument("--grace", type=int, default=None, help="宽限秒数，默认 BLOB_GC_GRACE_SECONDS")
+    parser.add_argument("--recount", action="store_true", help="回收前按引用表重算引用数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    args = parser.parse_args()
+
+    try:
+        if args.recount:
+            counts = blob_store.recount_refs()
+            print(f"已重算引用数：{len(counts)} 个 blob 仍被引用")
+        stats = blob_store.collect_garbage(args.grace, dry_run=args.dry_run)
+        action = "可回收" if args.dry_run else "已回收"
+        print(f"{action} blob {stats['blobs']} 个，共 {stats['bytes']} 字节；清理临时文件 {stats['temp_files']} 个")
+    finally:
+        close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())